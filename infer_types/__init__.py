@@ -1,7 +1,8 @@
 """CLI tool to automatically annotate Python code.
 """
 from ._cli import entrypoint, main
+from ._extractors import Extractor
 
 
-__all__ = ['entrypoint', 'main']
+__all__ = ['entrypoint', 'main', 'Extractor']
 __version__ = '1.0.0'
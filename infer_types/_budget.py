@@ -0,0 +1,51 @@
+"""Time limits for type inference.
+
+Inference is done by astroid deep inside astypes and cannot be interrupted
+cooperatively, so the limit is enforced with SIGALRM. On platforms without
+`signal.setitimer` and outside of the main thread limits are not enforced.
+"""
+from __future__ import annotations
+
+import signal
+import threading
+from contextlib import contextmanager
+from types import FrameType
+from typing import Iterator, NoReturn
+
+
+class BudgetExceeded(BaseException):
+    """Raised when inference takes longer than allowed.
+
+    It is not an Exception subclass, so that broad `except Exception`
+    blocks inside of astroid and astypes don't swallow it.
+    """
+
+
+def can_limit() -> bool:
+    """Check if time limits can be enforced in the current thread.
+    """
+    if not hasattr(signal, 'setitimer'):
+        return False  # pragma: no cover
+    return threading.current_thread() is threading.main_thread()
+
+
+@contextmanager
+def time_limit(seconds: float | None) -> Iterator[None]:
+    """Raise BudgetExceeded if the block runs longer than the given seconds.
+    """
+    if seconds is None or not can_limit():
+        yield
+        return
+    if seconds <= 0:
+        raise BudgetExceeded
+    old_handler = signal.signal(signal.SIGALRM, _raise)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old_handler)
+
+
+def _raise(signum: int, frame: FrameType | None) -> NoReturn:
+    raise BudgetExceeded
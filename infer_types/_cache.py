@@ -0,0 +1,113 @@
+"""Persistent cache of inferred return types for functions.
+
+The key of each function is its fingerprint (see `_dedup`): a hash of its
+normalized source code (comments and formatting do not matter) and of
+the definitions of names it uses from its module, the enclosing class,
+and the inherited signatures of the same method in base classes.
+The key also includes the list of used extractors, the list of allowed types,
+and the scope of modules astroid may load. It doesn't include the file path,
+so the cache can be shared between checkouts in different directories.
+Changes in other functions the body calls do not invalidate the cache.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Iterator, MutableMapping
+
+import astroid
+from astypes import Ass, Type
+
+from ._dedup import get_fingerprint
+from ._fs import write_atomic
+from ._intern import new_type
+from ._scope import Scope
+
+
+# bump it when the key or the stored data format changes
+FORMAT_VERSION = '4'
+
+
+def get_function_key(
+    node: astroid.FunctionDef,
+    names: frozenset[str],
+    allowed_types: frozenset[str] = frozenset(),
+    scope: Scope = Scope(),
+) -> str:
+    """Calculate the cache key for the function.
+    """
+    parts = [
+        FORMAT_VERSION,
+        ','.join(sorted(names)),
+        ','.join(sorted(allowed_types)),
+        ','.join(sorted(scope.allow)),
+        ','.join(sorted(scope.deny)),
+        str(scope.max_depth),
+        get_fingerprint(node),
+    ]
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        digest.update(part.encode('utf8', errors='surrogatepass'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def dump_type(value: Type) -> dict[str, Any]:
+    return dict(
+        name=value.name,
+        module=value._module,
+        args=[dump_type(arg) for arg in value.args],
+        ass=sorted(ass.value for ass in value._ass),
+    )
+
+
+def load_type(data: dict[str, Any]) -> Type:
+    return new_type(
+        data['name'],
+        module=data['module'],
+        args=[load_type(arg) for arg in data['args']],
+        ass={Ass(value) for value in data['ass']},
+    )
+
+
+class FunctionCache(MutableMapping[str, 'Type | None']):
+    """Inferred return types (None if cannot infer) stored in a directory.
+
+    Each entry is a small JSON file named after the key.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def __getitem__(self, key: str) -> Type | None:
+        try:
+            raw = self._get_path(key).read_text(encoding='utf8')
+            data = json.loads(raw)
+        except (OSError, ValueError):
+            raise KeyError(key)
+        if data is None:
+            return None
+        return load_type(data)
+
+    def __setitem__(self, key: str, value: Type | None) -> None:
+        path = self._get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = None if value is None else dump_type(value)
+        write_atomic(path, json.dumps(data))
+
+    def __delitem__(self, key: str) -> None:
+        try:
+            self._get_path(key).unlink()
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for path in self.path.glob('??/*.json'):
+            yield path.stem
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def _get_path(self, key: str) -> Path:
+        return self.path / key[:2] / f'{key}.json'
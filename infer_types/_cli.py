@@ -1,14 +1,41 @@
 from __future__ import annotations
 
+import json
+import os
 import sys
-from argparse import ArgumentParser
-from dataclasses import dataclass
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, replace
+from functools import partial
 from pathlib import Path
-from typing import NoReturn, TextIO
+from typing import (
+    Any, BinaryIO, Callable, Iterable, Iterator, MutableMapping, NoReturn,
+    TextIO,
+)
 
-from ._extractors import extractors
+from astypes import Type
+
+from ._cache import FunctionCache
+from ._discover import DEFAULT_EXCLUDE, Finder
+from ._extractors import get_extractors, get_names
 from ._format import format_code
+from ._fs import write_atomic
+from ._guard import Limits, SkippedFile
 from ._inferno import Inferno
+from ._journal import Journal
+from ._report import (
+    make_report, merge_reports, parse_shard, select_shard, write_report,
+)
+from ._scope import Scope
+from ._snapshot import reset_snapshot, use_snapshot
+from ._stats import Stats, Timing
+from ._stubs import get_stub_path
+from ._transformer import get_encoding
+from ._typeshed import Progress, build_index, get_modules, use_index
+from ._watch import Watcher, forget_module
+from ._workers import WorkerPool, parse_size
 
 
 try:
@@ -18,6 +45,13 @@ except ImportError:
 
 
 TEST_NAMES = frozenset({'tests.py', 'conftest.py'})
+DEFAULT_JOURNAL = Path('.infer-types-journal')
+# the path to pass to read the source code from stdin
+STDIN = Path('-')
+# the options that make no sense when reading from stdin
+FILE_OPTIONS = (
+    'check', 'stubs', 'watch', 'shard', 'journal', 'resume', 'workers', 'max_memory',
+)
 
 
 @dataclass(frozen=True)
@@ -28,44 +62,262 @@ class Config:
     exit_on_failure: bool   # propagate exceptions
     dry: bool               # do not write changes in files
     stream: TextIO          # stdout
+    journal: Journal | None = None  # record processed files
+    check: bool = False     # only report files that would be annotated
+    fail_fast: bool = False  # in check mode, stop on the first such file
+    stubs: Path | None = None  # write `.pyi` stubs into the dir instead
+    roots: tuple[Path, ...] = ()  # the paths passed to the CLI
+
 
+def add_annotations(
+    paths: Iterable[Path],
+    config: Config,
+    inferno: Inferno,
+    threads: int = 1,
+    pool: WorkerPool | None = None,
+) -> None:
+    """Annotate the files, inferring types in threads or worker processes.
 
-def add_annotations(root: Path, config: Config, inferno: Inferno) -> None:
-    if root.is_file():
-        _annotate_file(root, config, inferno)
+    Results are written and reported by the calling thread in the order of paths.
+    Stats from worker processes are merged into the stats of the given Inferno.
+    """
+    journal = config.journal
+    if journal is not None:
+        paths = (path for path in paths if not journal.is_done(path))
+    if pool is not None:
+        with closing(pool.map(paths)) as results:
+            for path, result, stats in results:
+                inferno.stats.merge(stats)
+                if _save_result(path, result, config) and config.fail_fast:
+                    return
         return
-    if config.skip_migrations and root.name == 'migrations':
+    if threads <= 1:
+        for path in paths:
+            if _annotate_file(path, config, inferno) and config.fail_fast:
+                return
         return
-    for path in root.iterdir():
-        add_annotations(path, config, inferno)
+    stubs = config.stubs is not None
+    # files are submitted lazily, so results and discovery don't run far ahead
+    window = 2 * threads
+    pending: deque[tuple[Path, Future[bytes | str | None]]] = deque()
+    with ThreadPoolExecutor(threads, thread_name_prefix='infer-types') as executor:
+        try:
+            for path in paths:
+                future = executor.submit(_process_file, path, inferno, stubs)
+                pending.append((path, future))
+                if len(pending) >= window and _save_next(pending, config):
+                    return
+            while pending:
+                if _save_next(pending, config):
+                    return
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def _save_next(
+    pending: deque[tuple[Path, Future[bytes | str | None]]],
+    config: Config,
+) -> bool:
+    """Save the earliest submitted result, return True if the run should stop.
+    """
+    path, future = pending.popleft()
+    return _save_result(path, future.result(), config) and config.fail_fast
+
+
+def iter_files(
+    roots: Iterable[Path],
+    config: Config,
+    finder: Finder,
+) -> Iterator[Path]:
+    """Recursively find all Python files that should be annotated.
+    """
+    for path in finder.iter_files(roots):
+        if not _is_skipped(path, config):
+            yield path
+
+
+def make_finder(config: Config, exclude: Iterable[str], gitignore: bool) -> Finder:
+    patterns = list(DEFAULT_EXCLUDE)
+    patterns.extend(exclude)
+    if config.skip_migrations:
+        patterns.append('migrations/')
+    if config.skip_tests:
+        patterns.append('tests/')
+    return Finder(exclude=tuple(patterns), gitignore=gitignore)
 
 
-def _annotate_file(path: Path, config: Config, inferno: Inferno) -> None:
+def filter_source(
+    source: bytes,
+    path: Path | None,
+    config: Config,
+    inferno: Inferno,
+) -> bytes:
+    """Get the source code with annotations added, without touching the filesystem.
+
+    The path, if known, is used to calculate the module name and to skip tests.
+    """
+    if path is None:
+        path = Path('<stdin>')
+    elif _is_skipped(path, config):
+        return source
+    try:
+        new_source = inferno.rewrite(path, source)
+    except SkippedFile:
+        return source
+    if config.format:
+        new_source = _format_source(new_source)
+    return new_source
+
+
+def watch_annotations(
+    watcher: Watcher,
+    batches: Iterable[list[Path]],
+    config: Config,
+    inferno: Inferno,
+) -> None:
+    """Annotate files from each batch of modified files as they come.
+    """
+    for paths in batches:
+        for path in paths:
+            if _is_skipped(path, config):
+                continue
+            forget_module(path)
+            _annotate_file(path, config, inferno)
+            watcher.mark(path)
+
+
+def _is_skipped(path: Path, config: Config) -> bool:
     if path.suffix != '.py':
-        return
+        return True
     if config.skip_tests:
         if path.name.startswith('test_'):
-            return
+            return True
         if path.name in TEST_NAMES:
-            return
+            return True
         if 'tests' in path.parts:
-            return
-    new_source = inferno.transform(path)
+            return True
+    return False
+
+
+def _annotate_file(path: Path, config: Config, inferno: Inferno) -> bool:
+    result = _process_file(path, inferno, stubs=config.stubs is not None)
+    return _save_result(path, result, config)
+
+
+def _process_file(path: Path, inferno: Inferno, stubs: bool) -> bytes | str | None:
+    """Get the new content of the file, or the stub, or None if skipped.
+
+    Nothing is written here, so it can be called from worker threads and processes.
+    """
+    try:
+        if stubs:
+            return inferno.make_stub(path)
+        return inferno.rewrite(path)
+    except SkippedFile:
+        return None  # recorded in stats and reported at the end
+
+
+@contextmanager
+def _worker_session(
+    options: dict[str, Any],
+    stubs: bool,
+    typeshed_index: Path | None,
+    snapshot: Path | None,
+) -> Iterator[Callable[[Path], tuple[bytes | str | None, Stats]]]:
+    """Prepare a worker process to annotate files, see WorkerPool.
+    """
+    if typeshed_index:
+        use_index(typeshed_index)
+    if snapshot:
+        use_snapshot(snapshot)
+    inferno = Inferno(**options)
+
+    def annotate(path: Path) -> tuple[bytes | str | None, Stats]:
+        # stats of each file are sent to the main process separately
+        current = replace(inferno, stats=Stats())
+        return _process_file(path, current, stubs), current.stats
+
+    try:
+        yield annotate
+    finally:
+        reset_snapshot()
+
+
+def _save_result(path: Path, result: bytes | str | None, config: Config) -> bool:
+    """Write the result, return True if in check mode and the file has changed.
+    """
+    if result is None:
+        return False
+    if isinstance(result, str):
+        _write_stub(path, result, config)
+        return False
+    if config.check:
+        if result == path.read_bytes():
+            return False
+        print(path, file=config.stream)
+        return True
     if config.format:
-        new_source = format_code(new_source)
+        result = _format_source(result)
     if not config.dry:
-        path.write_text(new_source)
+        write_atomic(path, result)
+        # in dry mode, nothing is done that could be resumed later
+        if config.journal is not None:
+            config.journal.record(path, result)
     print(path, file=config.stream)
+    return False
+
+
+def _format_source(source: bytes) -> bytes:
+    encoding = get_encoding(source)
+    return format_code(source.decode(encoding)).encode(encoding)
 
 
-def main(argv: list[str], stream: TextIO) -> int:
+def _write_source(stream: TextIO, source: bytes) -> None:
+    """Write the source code as is, or decoded if the stream accepts only text.
+    """
+    buffer = getattr(stream, 'buffer', None)
+    if buffer is None:
+        stream.write(source.decode(get_encoding(source)))
+        return
+    stream.flush()
+    buffer.write(source)
+    buffer.flush()
+
+
+def _write_stub(path: Path, stub: str, config: Config) -> None:
+    assert config.stubs is not None
+    stub_path = get_stub_path(path, config.roots, config.stubs)
+    if config.journal is not None and not config.dry:
+        config.journal.record(path, path.read_bytes())
+    try:
+        if stub_path.read_text() == stub:
+            return
+    except OSError:
+        pass
+    if not config.dry:
+        stub_path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(stub_path, stub)
+    print(stub_path, file=config.stream)
+
+
+def main(argv: list[str], stream: TextIO, stdin: BinaryIO | None = None) -> int:
+    if argv and argv[0] == 'merge':
+        return merge(argv[1:], stream)
+    if argv and argv[0] == 'index':
+        return build_typeshed_index(argv[1:], stream)
     parser = ArgumentParser()
     parser.add_argument(
-        'dir', type=Path, default=Path(),
-        help='path to the directory with the source code to analyze',
+        'dir', type=Path, nargs='+',
+        help='paths to the directories or files with the source code to analyze, '
+        'or `-` to read the source from stdin and write the result into stdout',
+    )
+    parser.add_argument(
+        '--stdin-filename', type=Path,
+        help='with `-`, the path of the file the source comes from',
     )
     parser.add_argument(
-        '--only', nargs='*', choices=sorted(name for name, _ in extractors),
+        '--only', nargs='*', choices=get_names(),
         help='list of extractors to run (all by default)',
     )
     parser.add_argument(
@@ -84,6 +336,14 @@ def main(argv: list[str], stream: TextIO) -> int:
         '--skip-migrations', action='store_true',
         help='skip Django migration files',
     )
+    parser.add_argument(
+        '--exclude', action='append', default=[],
+        help='skip files and directories matching the gitignore-style pattern',
+    )
+    parser.add_argument(
+        '--no-gitignore', action='store_true',
+        help='do not skip files listed in .gitignore',
+    )
     parser.add_argument(
         '--no-imports', action='store_true',
         help='do not write annotations requiring imports',
@@ -104,6 +364,10 @@ def main(argv: list[str], stream: TextIO) -> int:
         '--exit-on-failure', action='store_true',
         help='do not suppress exceptions during inference',
     )
+    parser.add_argument(
+        '--traceback-rate', type=float, default=1.,
+        help='fraction of suppressed failures to log with traceback (default: 1)',
+    )
     parser.add_argument(
         '--pdb', action='store_true',
         help='start debugger on failure',
@@ -112,7 +376,140 @@ def main(argv: list[str], stream: TextIO) -> int:
         '--dry', action='store_true',
         help='do not modify any files',
     )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='show how much time each extractor took',
+    )
+    parser.add_argument(
+        '--check', action='store_true',
+        help='do not modify files, fail if any annotations can be added',
+    )
+    parser.add_argument(
+        '--fail-fast', action='store_true',
+        help='with --check, stop on the first file that can be annotated',
+    )
+    parser.add_argument(
+        '--stubs', type=Path,
+        help='write .pyi stubs into the directory instead of modifying files',
+    )
+    parser.add_argument(
+        '--threads', type=int, default=1,
+        help='infer types in that many threads (default: 1)',
+    )
+    parser.add_argument(
+        '--workers', type=int,
+        help='infer types in up to that many processes (default: CPU count '
+        'if --max-memory is specified)',
+    )
+    parser.add_argument(
+        '--max-memory', type=_memory_size,
+        help='keep the memory of worker processes under the limit, like 4G',
+    )
+    parser.add_argument(
+        '--watch', action='store_true',
+        help='keep running and annotate files when they are modified',
+    )
+    parser.add_argument(
+        '--shard', type=_shard,
+        help='annotate only the K-th of N size-balanced parts of the files (K/N)',
+    )
+    parser.add_argument(
+        '--report', type=Path,
+        help='write a JSON report of the run into the given file',
+    )
+    parser.add_argument(
+        '--cache-dir', type=Path,
+        help='directory to cache inferred types between runs',
+    )
+    parser.add_argument(
+        '--source-root', type=Path,
+        help='directory relative to which module names are calculated',
+    )
+    parser.add_argument(
+        '--journal', type=Path,
+        help=f'record processed files into the file (default: {DEFAULT_JOURNAL})',
+    )
+    parser.add_argument(
+        '--resume', action='store_true',
+        help='skip files recorded in the journal and not modified since then',
+    )
+    parser.add_argument(
+        '--function-budget', type=float,
+        help='max seconds each extractor may spend on one function',
+    )
+    parser.add_argument(
+        '--file-budget', type=float,
+        help='max seconds to spend on inference for one file',
+    )
+    parser.add_argument(
+        '--typeshed-index', type=Path,
+        help='path to the precompiled typeshed index (built if missing or outdated, '
+        'see `infer_types index`)',
+    )
+    parser.add_argument(
+        '--infer-allow', action='append', default=[], metavar='PACKAGE',
+        help='let inference load only modules from these packages',
+    )
+    parser.add_argument(
+        '--infer-deny', action='append', default=[], metavar='PACKAGE',
+        help='do not let inference load modules from these packages',
+    )
+    parser.add_argument(
+        '--max-import-depth', type=int,
+        help='do not let inference load modules more imports away from the files',
+    )
+    parser.add_argument(
+        '--max-file-bytes', type=int,
+        help='skip files bigger than that',
+    )
+    parser.add_argument(
+        '--max-file-lines', type=int,
+        help='skip files with more lines',
+    )
+    parser.add_argument(
+        '--max-file-functions', type=int,
+        help='skip files with more functions and methods',
+    )
+    parser.add_argument(
+        '--include-generated', action='store_true',
+        help='do not skip generated files (like `_pb2.py`) and minified code',
+    )
+    parser.add_argument(
+        '--loose-generated-markers', action='store_true',
+        help='also skip files with comments like "generated by" or "do not edit" '
+        'anywhere in the header',
+    )
+    parser.add_argument(
+        '--no-dedup', action='store_true',
+        help='infer each function separately, even if an identical one was inferred',
+    )
+    parser.add_argument(
+        '--snapshot', type=Path,
+        help='path to the snapshot of methods inherited from external classes',
+    )
     args = parser.parse_args(argv)
+    filter_mode = STDIN in args.dir
+    if filter_mode:
+        if len(args.dir) > 1:
+            parser.error('`-` cannot be combined with other paths')
+        for name in FILE_OPTIONS:
+            if getattr(args, name):
+                parser.error(f'--{name.replace("_", "-")} cannot be used with `-`')
+    elif args.stdin_filename:
+        parser.error('--stdin-filename can be used only with `-`')
+    if args.check and args.stubs is not None:
+        # stubs are not compared with the ones on disk, `--dry` can be used instead
+        parser.error('--check cannot be combined with --stubs')
+    use_processes = bool(args.workers or args.max_memory)
+    if use_processes and args.threads > 1:
+        parser.error('--threads cannot be combined with worker processes')
+    if args.typeshed_index:
+        use_index(args.typeshed_index, progress=_make_progress(sys.stderr))
+    if args.snapshot:
+        use_snapshot(args.snapshot)
+    journal = None
+    if args.journal or args.resume:
+        journal = Journal.open(args.journal or DEFAULT_JOURNAL, resume=args.resume)
     config = Config(
         dry=args.dry,
         exit_on_failure=args.exit_on_failure or args.pdb,
@@ -120,24 +517,208 @@ def main(argv: list[str], stream: TextIO) -> int:
         skip_migrations=args.skip_migrations,
         skip_tests=args.skip_tests,
         stream=stream,
+        journal=journal,
+        check=args.check,
+        fail_fast=args.fail_fast,
+        stubs=args.stubs,
+        roots=tuple(args.dir),
     )
-    inferno = Inferno(
+    cache: MutableMapping[str, Type | None] | None = None
+    if args.cache_dir:
+        cache = FunctionCache(args.cache_dir / 'functions')
+    elif args.watch:
+        cache = {}
+    options: dict[str, Any] = dict(
         safe=not config.exit_on_failure,
         imports=not args.no_imports,
         methods=not args.no_methods,
         functions=not args.no_functions,
         assumptions=not args.no_assumptions,
-        allowed_types=args.allowed_types,
-        only=args.only,
+        allowed_types=frozenset(args.allowed_types or ()),
+        only=frozenset(args.only or ()),
+        function_budget=args.function_budget,
+        file_budget=args.file_budget,
+        cache=cache,
+        source_root=args.source_root,
+        traceback_rate=args.traceback_rate,
+        scope=Scope(
+            allow=tuple(args.infer_allow),
+            deny=tuple(args.infer_deny),
+            max_depth=args.max_import_depth,
+        ),
+        dedup=not args.no_dedup,
+        limits=Limits(
+            max_bytes=args.max_file_bytes,
+            max_lines=args.max_file_lines,
+            max_functions=args.max_file_functions,
+            skip_generated=not args.include_generated,
+            loose_markers=args.loose_generated_markers,
+        ),
     )
+    inferno = Inferno(**options)
+    if filter_mode:
+        if stdin is None:
+            stdin = sys.stdin.buffer
+        try:
+            new_source = filter_source(stdin.read(), args.stdin_filename, config, inferno)
+        finally:
+            reset_snapshot()
+        _write_source(stream, new_source)
+        # keep stdout clean for the source code
+        _print_summaries(args, inferno, sys.stderr)
+        return 0
+    finder = make_finder(config, args.exclude, gitignore=not args.no_gitignore)
+    paths: Iterable[Path] = iter_files(args.dir, config, finder)
+    if args.shard:
+        paths = select_shard(paths, *args.shard)
+    pool = None
+    if use_processes:
+        session = partial(
+            _worker_session, options, args.stubs is not None,
+            args.typeshed_index, args.snapshot,
+        )
+        workers = args.workers or os.cpu_count() or 1
+        pool = WorkerPool(session, workers=workers, max_memory=args.max_memory)
     try:
-        add_annotations(args.dir, config, inferno)
+        add_annotations(paths, config, inferno, threads=args.threads, pool=pool)
+        if args.watch:
+            watcher = Watcher(args.dir, finder=finder)
+            try:
+                watch_annotations(watcher, watcher, config, inferno)
+            except KeyboardInterrupt:
+                pass
     except Exception:  # pragma: no cover
         if args.pdb:
             pdb.post_mortem()
         raise
+    finally:
+        if journal is not None:
+            journal.close()
+        reset_snapshot()
+    if pool is not None and (pool.recycled or pool.killed):
+        print(
+            f'restarted {pool.recycled + pool.killed} workers '
+            f'to stay within the memory limit', file=stream,
+        )
+    _print_summaries(args, inferno, stream)
+    if args.check and inferno.stats.annotations:
+        return 1
     return 0
 
 
+def merge(argv: list[str], stream: TextIO) -> int:
+    """Combine reports from multiple shards into one.
+    """
+    parser = ArgumentParser(prog='infer_types merge')
+    parser.add_argument(
+        'reports', type=Path, nargs='+',
+        help='paths to the reports produced with `--report`',
+    )
+    parser.add_argument(
+        '--output', type=Path,
+        help='write the merged report into the file instead of stdout',
+    )
+    args = parser.parse_args(argv)
+    report = merge_reports(args.reports)
+    if args.output:
+        write_report(args.output, report)
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True), file=stream)
+    return 0
+
+
+def build_typeshed_index(argv: list[str], stream: TextIO) -> int:
+    """Build the index used by `--typeshed-index` ahead of time.
+    """
+    parser = ArgumentParser(prog='infer_types index')
+    parser.add_argument('path', type=Path, help='where to write the index')
+    parser.add_argument(
+        '--all', action='store_true',
+        help='also index stubs of installed third-party packages',
+    )
+    args = parser.parse_args(argv)
+    modules = get_modules(stdlib=not args.all)
+    methods = build_index(args.path, modules, progress=_make_progress(stream))
+    print(f'indexed {methods} methods from {len(modules)} modules', file=stream)
+    return 0
+
+
+def _make_progress(stream: TextIO) -> Progress:
+    def progress(done: int, total: int) -> None:
+        # report every 10%, building the whole index takes minutes
+        if done % max(total // 10, 1) == 0 or done == total:
+            print(f'indexing typeshed stubs: {done}/{total} modules', file=stream)
+    return progress
+
+
+def _memory_size(value: str) -> int:
+    try:
+        return parse_size(value)
+    except ValueError as exc:
+        raise ArgumentTypeError(str(exc))
+
+
+def _shard(value: str) -> tuple[int, int]:
+    try:
+        return parse_shard(value)
+    except ValueError as exc:
+        raise ArgumentTypeError(str(exc))
+
+
+def _print_summaries(args: Namespace, inferno: Inferno, stream: TextIO) -> None:
+    _print_skipped_summary(inferno, stream)
+    _print_budget_summary(inferno, stream)
+    _print_failures_summary(inferno, stream)
+    if args.profile:
+        _print_profile(inferno, stream)
+    if args.report:
+        shard = '/'.join(map(str, args.shard)) if args.shard else ''
+        write_report(args.report, make_report(inferno.stats, shard=shard))
+
+
+def _print_skipped_summary(inferno: Inferno, stream: TextIO) -> None:
+    skipped = inferno.stats.skipped
+    if not skipped:
+        return
+    print(f'skipped {len(skipped)} files:', file=stream)
+    for path, reason in sorted(skipped.items()):
+        print(f'  {path}: {reason}', file=stream)
+
+
+def _print_budget_summary(inferno: Inferno, stream: TextIO) -> None:
+    budget_files = inferno.stats.budget_files
+    if not budget_files:
+        return
+    print(f'time budget exceeded in {len(budget_files)} files:', file=stream)
+    for path, count in sorted(budget_files.items()):
+        print(f'  {path}: {count} times', file=stream)
+
+
+def _print_failures_summary(inferno: Inferno, stream: TextIO) -> None:
+    groups = inferno.stats.failure_groups
+    if not groups:
+        return
+    total = sum(groups.values())
+    print(f'inference failed {total} times, {len(groups)} unique errors:', file=stream)
+    print(f'  {"count":>6}  {"exception":<24}  origin', file=stream)
+    rows = sorted(groups.items(), key=lambda item: (-item[1], item[0]))
+    for (error_type, origin), count in rows:
+        print(f'  {count:>6}  {error_type:<24}  {origin}', file=stream)
+
+
+def _print_profile(inferno: Inferno, stream: TextIO) -> None:
+    timings = inferno.stats.timings
+    print('time spent in extractors:', file=stream)
+    print(f'  {"extractor":<16}  {"calls":>8}  {"total":>8}  {"load":>8}', file=stream)
+    for extractor in get_extractors(inferno.only):
+        timing = timings.get(extractor.name, Timing())
+        name = extractor.name + (' (plugin)' if extractor.plugin else '')
+        print(
+            f'  {name:<16}  {timing.calls:>8}'
+            f'  {timing.seconds:>7.3f}s  {timing.load:>7.3f}s',
+            file=stream,
+        )
+
+
 def entrypoint() -> NoReturn:
     sys.exit(main(sys.argv[1:], sys.stdout))
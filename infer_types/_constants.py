@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from types import MappingProxyType
 
-from astypes import Type
+from ._intern import new_type
 
 
 KNOWN_NAMES = MappingProxyType({
@@ -15,7 +15,7 @@ KNOWN_NAMES = MappingProxyType({
 REMOVE_PREFIXES = ('as_', 'to_', 'get_')
 BOOL_PREFIXES = ('is_', 'has_', 'should_', 'can_', 'will_', 'supports_')
 
-t = Type.new
+t = new_type
 tself = t('Self', module='typing')
 # https://docs.python.org/3/reference/datamodel.html
 MAGIC_METHODS = MappingProxyType(dict(
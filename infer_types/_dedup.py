@@ -0,0 +1,139 @@
+"""Share inferred types between structurally identical functions.
+
+Vendored copies of libraries and generated code contain many functions
+that are the same up to formatting and comments. The fingerprint of a function
+is a hash of its normalized source code and of everything the inference
+of its return type depends on inside of the module:
+
++ for each name the function uses but doesn't define itself, the absolute
+  name of the imported definition, or the statement that defines it;
++ for methods, the enclosing class, if the method refers to it
+  (using `self`, `cls`, `super`, or `__class__`);
++ for methods, the resolved base classes and the return annotations
+  of the same method in them.
+
+Relative imports are resolved, so `from .models import helper` in two
+packages refers to two different definitions. A module-level statement that
+itself depends on other names (a function, a class, `x = helper()`) is bound
+to the module it is defined in, so such functions are shared only inside
+of that module.
+
+Functions with the same fingerprint get the same return type, no matter
+in which file they are. Like for the persistent cache, the content of called
+functions and imported modules is not a part of the fingerprint.
+"""
+from __future__ import annotations
+
+import hashlib
+from functools import lru_cache
+from typing import Iterator
+
+import astroid
+
+from ._mro import get_class_info
+
+
+# names that refer to the enclosing class in methods
+CLASS_REFS = frozenset({'super', '__class__'})
+
+
+def get_fingerprint(node: astroid.FunctionDef) -> str:
+    """Calculate the hash of the function and its resolution context.
+    """
+    parts = [node.as_string()]
+    cls_node = node.parent if isinstance(node.parent, astroid.ClassDef) else None
+    refs_class = False
+    for name_node, stmts in _get_free_names(node, parts):
+        if cls_node is not None and _is_first_arg(node, stmts):
+            refs_class = True
+        if name_node.name in CLASS_REFS:
+            refs_class = True
+    if cls_node is not None:
+        parts.extend(_get_class_context(cls_node, node, refs_class))
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        digest.update(part.encode('utf8', errors='surrogatepass'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _get_free_names(
+    node: astroid.NodeNG,
+    parts: list[str],
+) -> Iterator[tuple[astroid.Name, list[astroid.NodeNG]]]:
+    """Add definitions of names used in the node to parts.
+
+    Names defined inside of the node are yielded with their definitions.
+    """
+    seen: set[str] = set()
+    for name_node in node.nodes_of_class(astroid.Name):
+        name = name_node.name
+        if name in seen:
+            continue
+        seen.add(name)
+        scope, stmts = name_node.lookup(name)
+        if scope.root() is not node.root():
+            parts.append(f'{scope.root().name}.{name}')
+            continue
+        if _is_inside(scope, node):
+            yield name_node, stmts
+            continue
+        parts.append(name)
+        parts.extend(_get_definition(stmt, name) for stmt in stmts)
+
+
+def _get_definition(stmt: astroid.NodeNG, name: str) -> str:
+    if isinstance(stmt, astroid.ImportFrom):
+        module = stmt.modname
+        if stmt.level:
+            try:
+                module = stmt.root().relative_to_absolute_name(module, stmt.level)
+            except astroid.TooManyLevelsError:
+                return f'{stmt.root().name}:{_get_source(stmt)}'
+        return f'from {module} import {stmt.real_name(name)}'
+    if isinstance(stmt, astroid.Import):
+        return f'import {stmt.real_name(name)}'
+    stmt = stmt.statement()
+    source = _get_source(stmt)
+    # the definition may mean different things in different modules
+    if next(stmt.nodes_of_class(astroid.Name), None) is not None:
+        return f'{stmt.root().name}:{source}'
+    return source
+
+
+def _get_class_context(
+    cls_node: astroid.ClassDef,
+    node: astroid.FunctionDef,
+    refs_class: bool,
+) -> list[str]:
+    parts = [_get_source(cls_node) if refs_class else cls_node.name]
+    if refs_class:
+        list(_get_free_names(cls_node, parts))
+    for base in cls_node.bases:
+        parts.append(base.as_string())
+        list(_get_free_names(base, parts))
+    for parent in get_class_info(cls_node).members.get(node.name, ()):
+        if parent is node or not isinstance(parent, astroid.FunctionDef):
+            continue
+        returns = parent.returns.as_string() if parent.returns else ''
+        parts.append(f'{parent.qname()} -> {returns}')
+    return parts
+
+
+@lru_cache(maxsize=256)
+def _get_source(node: astroid.NodeNG) -> str:
+    # the same classes and imports are used by many functions
+    return node.as_string()
+
+
+def _is_inside(scope: astroid.NodeNG, node: astroid.FunctionDef) -> bool:
+    while scope is not None:
+        if scope is node:
+            return True
+        scope = scope.parent
+    return False
+
+
+def _is_first_arg(node: astroid.FunctionDef, stmts: list[astroid.NodeNG]) -> bool:
+    args = node.args.posonlyargs + node.args.args
+    return bool(args) and any(stmt is args[0] for stmt in stmts)
@@ -0,0 +1,193 @@
+"""Find Python files to annotate.
+
+Directories are walked with `os.scandir`, and excluded directories are pruned
+before descending into them. Exclude patterns use the `.gitignore` syntax.
+`.gitignore` files inside of the walked directories are respected,
+as well as the ones in their parent directories up to the root
+of the git repository.
+"""
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+DEFAULT_EXCLUDE = (
+    '.bzr/',
+    '.direnv/',
+    '.eggs/',
+    '.git/',
+    '.hg/',
+    '.mypy_cache/',
+    '.nox/',
+    '.pytest_cache/',
+    '.svn/',
+    '.tox/',
+    '.venv/',
+    '.venvs/',
+    '__pycache__/',
+    '__pypackages__/',
+    '_build/',
+    'build/',
+    'dist/',
+    'node_modules/',
+    'venv/',
+    '*.egg-info/',
+)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A single gitignore-style pattern.
+    """
+    regex: re.Pattern[str]
+    base: str           # the directory the pattern is relative to
+    anchored: bool      # match the path relative to base instead of the name
+    dir_only: bool      # match only directories
+    negate: bool        # re-include the matched path
+    prefix: str = ''    # the path of base relative to the directory of the pattern
+
+    @classmethod
+    def parse(cls, line: str, base: str, prefix: str = '') -> Rule | None:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            return None
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        anchored = '/' in line
+        line = line.lstrip('/')
+        if not line:
+            return None
+        return cls(
+            regex=_translate(line),
+            base=os.path.join(base, ''),
+            anchored=anchored,
+            dir_only=dir_only,
+            negate=negate,
+            prefix=prefix,
+        )
+
+    def matches(self, path: str, name: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if not self.anchored:
+            return self.regex.match(name) is not None
+        if not path.startswith(self.base):
+            return False
+        rel_path = self.prefix + path[len(self.base):].replace(os.sep, '/')
+        return self.regex.match(rel_path) is not None
+
+
+@dataclass(frozen=True)
+class Finder:
+    exclude: tuple[str, ...] = DEFAULT_EXCLUDE  # gitignore-style patterns
+    gitignore: bool = True                      # respect .gitignore files
+
+    def iter_files(self, roots: Iterable[Path]) -> Iterator[Path]:
+        """Lazily yield all Python files in the given directories.
+
+        Paths to files are yielded as is, even if they are not Python files.
+        """
+        for root in roots:
+            if root.is_file():
+                yield root
+                continue
+            base = str(root)
+            parsed = [Rule.parse(pattern, base) for pattern in self.exclude]
+            rules = [rule for rule in parsed if rule]
+            if self.gitignore:
+                rules.extend(_read_parent_gitignores(base))
+            yield from self._walk(base, rules)
+
+    def _walk(self, path: str, rules: list[Rule]) -> Iterator[Path]:
+        if self.gitignore:
+            rules = rules + _read_gitignore(path)
+        with os.scandir(path) as entries_iter:
+            entries = sorted(entries_iter, key=lambda entry: entry.name)
+        for entry in entries:
+            is_dir = entry.is_dir()
+            if _is_ignored(rules, entry.path, entry.name, is_dir):
+                continue
+            if is_dir:
+                yield from self._walk(entry.path, rules)
+            elif entry.name.endswith('.py'):
+                yield Path(entry.path)
+
+
+def _is_ignored(rules: list[Rule], path: str, name: str, is_dir: bool) -> bool:
+    # the last matching rule wins
+    for rule in reversed(rules):
+        if rule.matches(path, name, is_dir):
+            return not rule.negate
+    return False
+
+
+def _read_gitignore(
+    path: str,
+    base: str | None = None,
+    prefix: str = '',
+) -> list[Rule]:
+    try:
+        with open(os.path.join(path, '.gitignore'), encoding='utf8') as stream:
+            lines = stream.readlines()
+    except OSError:
+        return []
+    rules = [Rule.parse(line, base or path, prefix) for line in lines]
+    return [rule for rule in rules if rule]
+
+
+def _read_parent_gitignores(root: str) -> list[Rule]:
+    """Read `.gitignore` files in parents of the root up to the repository root.
+
+    Patterns are applied to paths under the root in the form they are walked.
+    Nothing is read if the root is not inside of a git repository.
+    """
+    abs_root = os.path.abspath(root)
+    path = abs_root
+    found: list[list[Rule]] = []
+    while not os.path.exists(os.path.join(path, '.git')):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return []
+        path = parent
+        prefix = os.path.relpath(abs_root, path).replace(os.sep, '/') + '/'
+        found.append(_read_gitignore(path, base=root, prefix=prefix))
+    # patterns in deeper directories win
+    return [rule for rules in reversed(found) for rule in rules]
+
+
+def _translate(pattern: str) -> re.Pattern[str]:
+    """Convert gitignore glob into regex. Unlike fnmatch, `*` doesn't match `/`.
+    """
+    result = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            result.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            result.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            result.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            result.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            chars = pattern[i + 1:end].replace('\\', '\\\\')
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            result.append(f'[{chars}]')
+            i = end + 1
+        else:
+            result.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile(''.join(result) + r'\Z')
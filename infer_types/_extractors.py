@@ -1,45 +1,204 @@
 from __future__ import annotations
 
-import ast
 import builtins
+import threading
+import time
 from collections import deque
-from typing import Callable, Iterator
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from importlib.metadata import EntryPoint, entry_points
+from logging import getLogger
+from typing import Callable, Iterable, Iterator
 
 import astroid
-import typeshed_client
 from astypes import Ass, Type, get_type
 from astypes._helpers import conv_node_to_type
 
+from ._budget import BudgetExceeded, time_limit
 from ._constants import (
     BOOL_PREFIXES, KNOWN_NAMES, MAGIC_METHODS, REMOVE_PREFIXES,
 )
+from ._intern import intern, merge, new_type, union
+from ._mro import get_class_info
+from ._snapshot import get_snapshot
+from ._stats import Timing
+from ._typeshed import get_return_type as get_typeshed_return_type
 
 
-Extractor = Callable[[astroid.FunctionDef], Type]
-extractors: list[tuple[str, Extractor]] = []
+logger = getLogger(__name__)
 
-UNKNOWN_TYPE = Type.new('')
 
+ENTRY_POINTS_GROUP = 'infer_types.extractors'
+ExtractFunc = Callable[[astroid.FunctionDef], Type]
+Predicate = Callable[[astroid.FunctionDef], bool]
 
-def register(name: str) -> Callable[[Extractor], Extractor]:
-    def callback(extractor: Extractor) -> Extractor:
-        extractors.append((name, extractor))
-        return extractor
+UNKNOWN_TYPE = new_type('')
+NONE_TYPE = new_type('None')
+ITERATOR_TYPE = new_type('Iterator', module='typing')
+# the type of literals of each Python type, as returned by astypes
+_const_types: dict[type, Type | None] = {}
+
+
+@dataclass(frozen=True)
+class Extractor:
+    """A heuristic to infer the return type of a function.
+
+    Plugins provide instances of it as entry points in the
+    `infer_types.extractors` group.
+    """
+    name: str
+    extract: ExtractFunc  # returns UNKNOWN_TYPE if cannot infer the type
+    priority: int = 100   # extractors with lower priority are tried first
+    cost: float = 1.      # relative estimated time, cheaper are tried first
+    # a cheap check returning False if the extractor surely cannot infer the type
+    applies: Predicate | None = None
+    # names of all types the extractor can infer, None if it can be any type
+    types: frozenset[str] | None = None
+    plugin: bool = False  # loaded from an entry point
+
+    def can_produce(self, allowed_types: frozenset[str]) -> bool:
+        return self.types is None or not self.types.isdisjoint(allowed_types)
+
+
+# built-in extractors
+extractors: list[Extractor] = []
+# plugin extractors, loaded lazily when first used
+_plugins: dict[str, Extractor] = {}
+_plugins_lock = threading.Lock()
+
+
+def register(
+    name: str,
+    priority: int,
+    cost: float = 1.,
+    applies: Predicate | None = None,
+    types: Iterable[str] | None = None,
+) -> Callable[[ExtractFunc], ExtractFunc]:
+    """Register a built-in extractor.
+    """
+    def callback(extract: ExtractFunc) -> ExtractFunc:
+        extractors.append(Extractor(
+            name=name,
+            extract=extract,
+            priority=priority,
+            cost=cost,
+            applies=applies,
+            types=None if types is None else frozenset(types),
+        ))
+        return extract
     return callback
 
 
+def get_names() -> list[str]:
+    """Names of all built-in and plugin extractors, without loading plugins.
+    """
+    names = {extractor.name for extractor in extractors}
+    names.update(entry_point.name for entry_point in _get_entry_points())
+    return sorted(names)
+
+
+def get_extractors(
+    names: frozenset[str],
+    timings: dict[str, Timing] | None = None,
+) -> list[Extractor]:
+    """Get the extractors with the given names (all if empty) in order to run.
+
+    Plugins are loaded only if selected. If timings is specified,
+    the time spent on loading each plugin is added into it.
+    """
+    selected = [ext for ext in extractors if not names or ext.name in names]
+    for entry_point in _get_entry_points():
+        if names and entry_point.name not in names:
+            continue
+        extractor = _plugins.get(entry_point.name)
+        if extractor is None:
+            with _plugins_lock:
+                extractor = _plugins.get(entry_point.name)
+                if extractor is None:
+                    extractor = _load_plugin(entry_point, timings)
+                    _plugins[entry_point.name] = extractor
+        selected.append(extractor)
+    selected.sort(key=lambda ext: (ext.priority, ext.cost))
+    return selected
+
+
+@lru_cache(maxsize=None)
+def _get_entry_points() -> tuple[EntryPoint, ...]:
+    all_entry_points = entry_points()
+    group: Iterable[EntryPoint]
+    if hasattr(all_entry_points, 'select'):
+        group = all_entry_points.select(group=ENTRY_POINTS_GROUP)
+    else:  # pragma: no cover
+        group = all_entry_points.get(ENTRY_POINTS_GROUP, ())
+    builtin_names = {extractor.name for extractor in extractors}
+    result = []
+    for entry_point in group:
+        if entry_point.name in builtin_names:
+            logger.warning(f'plugin {entry_point.name} shadows a built-in extractor')
+            continue
+        result.append(entry_point)
+    return tuple(result)
+
+
+def _load_plugin(
+    entry_point: EntryPoint,
+    timings: dict[str, Timing] | None,
+) -> Extractor:
+    start = time.perf_counter()
+    extractor = entry_point.load()
+    if not isinstance(extractor, Extractor):
+        raise TypeError(f'plugin {entry_point.name} is not an Extractor')
+    extractor = replace(extractor, name=entry_point.name, plugin=True)
+    if timings is not None:
+        timing = timings.setdefault(extractor.name, Timing())
+        timing.load += time.perf_counter() - start
+    return extractor
+
+
 def get_return_type(
     func_node: astroid.FunctionDef,
     names: frozenset[str],
+    budget: float | None = None,
+    timeouts: list[str] | None = None,
+    allowed_types: frozenset[str] = frozenset(),
+    timings: dict[str, Timing] | None = None,
 ) -> Type | None:
     """
     Recursively walk the given body, find all return stmts,
     and infer their type. The result is a union of these types.
+
+    If budget is specified, each extractor may spend at most that many seconds
+    on the function. Extractors that exceed it are skipped
+    and their names are added into timeouts.
+
+    If allowed_types is specified, None may be returned instead of a type
+    that is not in the list.
+
+    If timings is specified, the time spent in each extractor is added into it.
     """
-    for name, extractor in extractors:
-        if names and name not in names:
+    selected = get_extractors(names, timings)
+    if allowed_types:
+        # The first inferred type is the result, even if it is not allowed.
+        # So, only the extractors in the end that cannot produce an allowed
+        # type are safe to skip.
+        while selected and not selected[-1].can_produce(allowed_types):
+            selected.pop()
+    for extractor in selected:
+        if extractor.applies is not None and not extractor.applies(func_node):
             continue
-        ret_type = extractor(func_node)
+        start = time.perf_counter()
+        try:
+            with time_limit(budget):
+                ret_type = extractor.extract(func_node)
+        except BudgetExceeded:
+            if timeouts is not None:
+                timeouts.append(extractor.name)
+            continue
+        finally:
+            if timings is not None:
+                timing = timings.setdefault(extractor.name, Timing())
+                timing.calls += 1
+                timing.seconds += time.perf_counter() - start
         if not ret_type.unknown:
             return ret_type
     return None
@@ -58,30 +217,43 @@ def walk(func_node: astroid.FunctionDef) -> Iterator[astroid.NodeNG]:
         yield node
 
 
-@register(name='astypes')
+@register(name='astypes', priority=10, cost=3.)
 def _extract_astypes(func_node: astroid.FunctionDef) -> Type:
-    result = UNKNOWN_TYPE
+    types = []
+    unknown = False
     for node in walk(func_node):
         if isinstance(node, astroid.Yield):
             return UNKNOWN_TYPE
         if not isinstance(node, astroid.Return):
             continue
-        # bare return
-        if node.value is None:
-            result = result.merge(Type.new('None'))
-            continue
-        node_type = get_type(node.value)
+        node_type = _get_return_value_type(node.value)
         if node_type is None:
-            result = result.add_ass(Ass.ALL_RETURNS_SAME)
+            unknown = True
         else:
-            result = result.merge(node_type)
+            types.append(node_type)
+    ass = (Ass.ALL_RETURNS_SAME,) if unknown else ()
+    result = union(types, ass=ass)
     if result.unknown:
         return UNKNOWN_TYPE
     if _has_implicit_return(func_node):
-        return result.merge(Type.new('None'))
+        return merge(result, NONE_TYPE)
     return result
 
 
+def _get_return_value_type(node: astroid.NodeNG | None) -> Type | None:
+    # bare return
+    if node is None:
+        return NONE_TYPE
+    # the type of a literal doesn't depend on the context, infer it only once
+    if isinstance(node, astroid.Const):
+        key = type(node.value)
+        if key not in _const_types:
+            node_type = get_type(node)
+            _const_types[key] = None if node_type is None else intern(node_type)
+        return _const_types[key]
+    return get_type(node)
+
+
 def _has_implicit_return(func_node: astroid.FunctionDef) -> bool:
     if not func_node.body:
         return False
@@ -91,64 +263,98 @@ def _has_implicit_return(func_node: astroid.FunctionDef) -> bool:
     return not node.orelse
 
 
-@register(name='inherit')
-def _extract_inherit_method(func_node: astroid.FunctionDef) -> Type:
+def _get_class(func_node: astroid.FunctionDef) -> astroid.ClassDef | None:
     for node in func_node.node_ancestors():
         if isinstance(node, astroid.ClassDef):
-            cls_node = node
-            break
-    else:
+            return node
+    return None
+
+
+def _can_inherit(func_node: astroid.FunctionDef) -> bool:
+    cls_node = _get_class(func_node)
+    if cls_node is None:
+        return False
+    # everything that `object` has is a magic method
+    if func_node.name.startswith('__') and func_node.name.endswith('__'):
+        return True
+    # other definitions in the class itself, like overloads
+    if len(cls_node.locals.get(func_node.name, ())) > 1:
+        return True
+    for base in cls_node.bases:
+        if not isinstance(base, astroid.Name) or base.name != 'object':
+            return True
+    return False
+
+
+@register(name='inherit', priority=20, cost=2., applies=_can_inherit)
+def _extract_inherit_method(func_node: astroid.FunctionDef) -> Type:
+    cls_node = _get_class(func_node)
+    if cls_node is None:
         return UNKNOWN_TYPE
-    for parent in cls_node.getattr(func_node.name):
-        if isinstance(parent, astroid.BoundMethod):
-            parent = parent._proxied
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        # definitions in the class itself go first
+        for parent in cls_node.locals.get(func_node.name, ()):
+            if isinstance(parent, astroid.FunctionDef):
+                return_type = _get_method_type(parent)
+                if return_type is not None:
+                    return return_type
+        found, return_type = snapshot.lookup(cls_node, func_node.name)
+        if found:
+            return return_type or UNKNOWN_TYPE
+    for parent in get_class_info(cls_node).members.get(func_node.name, ()):
         if not isinstance(parent, astroid.FunctionDef):
             continue
-        qname: str = parent.qname()
-        mod_name, cls_name, func_name = qname.rsplit('.', maxsplit=2)
-        assert func_name == func_node.name
-
-        # extract type from the return type annotation
-        return_type = conv_node_to_type(mod_name, parent.returns)
+        return_type = _get_method_type(parent)
         if return_type is not None:
-            return return_type
+            break
+    else:
+        return_type = None
+    if snapshot is not None:
+        snapshot.record(cls_node, func_node.name, _get_method_type)
+    return return_type or UNKNOWN_TYPE
 
-        # extract type from typeshed
-        module = typeshed_client.get_stub_names(mod_name)
-        if module is None:
-            continue
-        child_nodes = module[cls_name].child_nodes
-        if child_nodes is None:
-            continue
-        try:
-            method_def = child_nodes[func_name]
-        except KeyError:
-            continue
-        if not isinstance(method_def.ast, ast.FunctionDef):
-            continue
-        type_node = method_def.ast.returns
-        return_type = conv_node_to_type(mod_name, type_node)
-        if return_type is not None:
-            return return_type
-    return UNKNOWN_TYPE
 
+def _get_method_type(func_node: astroid.FunctionDef) -> Type | None:
+    """Get the return type of the method from its annotation or typeshed.
+    """
+    qname: str = func_node.qname()
+    mod_name, cls_name, func_name = qname.rsplit('.', maxsplit=2)
+
+    # extract type from the return type annotation
+    return_type = conv_node_to_type(mod_name, func_node.returns)
+    if return_type is not None:
+        return intern(return_type)
+
+    # extract type from typeshed
+    return_type = get_typeshed_return_type(mod_name, cls_name, func_name)
+    if return_type is not None:
+        return intern(return_type)
+    return None
 
-@register(name='magic')
+
+@register(
+    name='magic',
+    priority=30,
+    cost=.1,
+    applies=lambda func_node: func_node.name in MAGIC_METHODS,
+    types={t.name for t in MAGIC_METHODS.values()},
+)
 def _extract_magic_method(func_node: astroid.FunctionDef) -> Type:
     if not func_node.is_method():
         return UNKNOWN_TYPE
     return MAGIC_METHODS.get(func_node.name, UNKNOWN_TYPE)
 
 
-@register(name='yield')
+@register(name='yield', priority=40, types={'Iterator'})
 def _extract_yield(func_node: astroid.FunctionDef) -> Type:
     for node in walk(func_node):
         if isinstance(node, (astroid.Yield, astroid.YieldFrom)):
-            return Type.new('Iterator', module='typing')
+            return ITERATOR_TYPE
     return UNKNOWN_TYPE
 
 
-@register(name='none')
+@register(name='none', priority=50, types={'None'})
 def _extract_no_return(func_node: astroid.FunctionDef) -> Type:
     # ignore empty methods, they can be there for base class signatures
     if isinstance(func_node.parent, astroid.ClassDef):
@@ -169,10 +375,15 @@ def _extract_no_return(func_node: astroid.FunctionDef) -> Type:
             return UNKNOWN_TYPE
         if isinstance(node, astroid.Return) and node.value is not None:
             return UNKNOWN_TYPE
-    return Type.new('None')
+    return NONE_TYPE
 
 
-@register(name='name')
+@register(
+    name='name',
+    priority=60,
+    cost=.1,
+    types={'bool', 'datetime', *dir(builtins), *KNOWN_NAMES.values()},
+)
 def _extract_from_name(func_node: astroid.FunctionDef) -> Type:
     """Try to guess the return type based on the function name.
     """
@@ -183,9 +394,9 @@ def _extract_from_name(func_node: astroid.FunctionDef) -> Type:
         if name.startswith(prefix):
             name = name[len(prefix):]
     if name.startswith(BOOL_PREFIXES):
-        return Type.new('bool')
+        return new_type('bool')
     if name.endswith('_at'):
-        return Type.new('datetime', module='datetime')
+        return new_type('datetime', module='datetime')
     if hasattr(builtins, name):
-        return Type.new(name)
-    return Type.new(KNOWN_NAMES.get(name, ''))
+        return new_type(name)
+    return new_type(KNOWN_NAMES.get(name, ''))
@@ -0,0 +1,75 @@
+"""Safe file operations for files shared between concurrent processes.
+
+Files are never modified in place. The new content is written into
+a temporary file with a unique name and then atomically renamed,
+so readers see either the old or the new content. File locks are used
+only to avoid doing the same expensive work twice, never for reading.
+"""
+from __future__ import annotations
+
+import os
+import stat
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+
+def get_tmp_path(path: Path) -> Path:
+    """Get a unique path for a temporary file in the same directory.
+
+    The name is unique across processes, threads, and hosts sharing the directory.
+    """
+    return path.with_name(f'.{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp')
+
+
+def write_atomic(path: Path, content: str | bytes) -> None:
+    """Write the file content so that it is never left half-written.
+
+    The content is written into a temporary file in the same directory
+    which then replaces the original file, keeping its permissions.
+    Symlinks are followed, so the file they point to is replaced.
+    If the file already has the same content, it is not touched at all.
+    Text is encoded as UTF-8, bytes are written as is.
+    """
+    path = path.resolve()
+    if isinstance(content, str):
+        content = content.encode('utf8')
+    try:
+        if path.read_bytes() == content:
+            return
+    except OSError:
+        pass
+    tmp_path = get_tmp_path(path)
+    try:
+        tmp_path.write_bytes(content)
+        if path.exists():
+            os.chmod(tmp_path, stat.S_IMODE(path.stat().st_mode))
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on the file (created if missing) inside the block.
+
+    On platforms without `fcntl`, the lock does nothing.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('a') as stream:
+        if fcntl is None:  # pragma: no cover
+            yield
+            return
+        fcntl.flock(stream.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(stream.fileno(), fcntl.LOCK_UN)
@@ -10,10 +10,16 @@ class FSig:
     name: str
     args: str
     return_type: Type
+    module: str = ''    # the module of the function, names from it need no import
 
     @property
     def imports(self) -> frozenset[str]:
-        return self.return_type.imports
+        if not self.module:
+            return self.return_type.imports
+        own = f'from {self.module} import '
+        return frozenset(
+            stmt for stmt in self.return_type.imports if not stmt.startswith(own)
+        )
 
     @property
     def annotation(self) -> str:
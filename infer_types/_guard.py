@@ -0,0 +1,114 @@
+"""Skip files that are too expensive to annotate before parsing them.
+
+Parsing and inference time grows with the file size, and a few huge files
+(generated protobuf modules, fixture tables, minified code) can take longer
+than the rest of the project. Such files are rarely worth annotating:
+generated files are overwritten on the next generation anyway.
+
+All checks work on the raw bytes of the file, without tokenizing it.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+
+# suffixes of modules produced by code generators
+GENERATED_SUFFIXES = ('_pb2.py', '_pb2_grpc.py')
+# markers that code generators put into the header of generated files:
+# `@generated` anywhere, "DO NOT EDIT" (as in "Code generated by X. DO NOT EDIT.")
+# only in the comments at the very start of the file
+GENERATED_MARKER = re.compile(rb'@generated')
+HEADER_MARKER = re.compile(rb'DO NOT EDIT')
+# markers that are also used by humans, recognized only if asked for
+LOOSE_MARKERS = re.compile(
+    rb'^[ \t]*#.*?(do not edit|auto-?generated|generated by)',
+    re.IGNORECASE | re.MULTILINE,
+)
+# how many bytes from the file start to search for the markers
+HEADER_SIZE = 2048
+# lines longer than that are not written by humans
+MINIFIED_LINE_LENGTH = 2000
+# the file is minified if more than that share of its bytes are on long lines
+MINIFIED_SHARE = .5
+FUNCTION_DEF = re.compile(rb'^[ \t]*(?:async[ \t]+)?def[ \t]', re.MULTILINE)
+
+
+class SkippedFile(Exception):
+    """The file is not annotated because it doesn't pass the limits.
+    """
+
+    def __init__(self, path: Path, reason: str) -> None:
+        self.path = path
+        self.reason = reason
+        super().__init__(f'{path}: {reason}')
+
+
+@dataclass(frozen=True)
+class Limits:
+    max_bytes: int | None = None        # max file size
+    max_lines: int | None = None        # max number of lines in the file
+    max_functions: int | None = None    # max number of functions and methods
+    skip_generated: bool = False        # skip files produced by code generators
+    loose_markers: bool = False         # also trust any "generated by"-like comment
+
+    def get_reason(self, path: Path, source: bytes) -> str | None:
+        """Get the reason why the file should not be annotated, if any.
+        """
+        if self.max_bytes is not None and len(source) > self.max_bytes:
+            return f'{len(source)} bytes, the limit is {self.max_bytes}'
+        if self.max_lines is not None:
+            lines = source.count(b'\n') + 1
+            if lines > self.max_lines:
+                return f'{lines} lines, the limit is {self.max_lines}'
+        if self.max_functions is not None:
+            functions = len(FUNCTION_DEF.findall(source))
+            if functions > self.max_functions:
+                return f'{functions} functions, the limit is {self.max_functions}'
+        if self.skip_generated:
+            return get_generated_reason(path, source, loose=self.loose_markers)
+        return None
+
+
+def get_generated_reason(
+    path: Path,
+    source: bytes,
+    loose: bool = False,
+) -> str | None:
+    """Detect if the file was produced by a code generator or minified.
+
+    If loose, comments like "generated by" or "do not edit" anywhere
+    in the header are enough. They are often written by humans as well,
+    so it is not the default.
+    """
+    if path.name.endswith(GENERATED_SUFFIXES):
+        return 'generated file name'
+    header = source[:HEADER_SIZE]
+    match = GENERATED_MARKER.search(header)
+    if match is None:
+        match = HEADER_MARKER.search(_get_comments(header))
+    if match is None and loose:
+        match = LOOSE_MARKERS.search(header)
+    if match is not None:
+        marker = match.group(match.lastindex or 0).decode('ascii').lower()
+        return f'generated file marker "{marker}"'
+    long_bytes = sum(
+        len(line) for line in source.splitlines()
+        if len(line) > MINIFIED_LINE_LENGTH
+    )
+    # a long string constant in a hand-written module doesn't make it minified
+    if long_bytes > len(source) * MINIFIED_SHARE:
+        return 'minified code'
+    return None
+
+
+def _get_comments(header: bytes) -> bytes:
+    # the comment lines at the start of the file, before any code or docstring
+    lines = []
+    for line in header.splitlines():
+        line = line.strip()
+        if line and not line.startswith(b'#'):
+            break
+        lines.append(line)
+    return b'\n'.join(lines)
@@ -1,14 +1,28 @@
 from __future__ import annotations
 
+import math
+import threading
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from functools import partial
+from importlib.util import decode_source
 from logging import getLogger
 from pathlib import Path
-from typing import Iterator
+from typing import Iterator, MutableMapping
 
 import astroid
+from astypes import Type
 
+from ._cache import get_function_key
+from ._dedup import get_fingerprint
 from ._extractors import get_return_type
 from ._fsig import FSig
+from ._guard import Limits, SkippedFile
+from ._modules import count_parses, parse_module
+from ._scope import Scope, limit_scope, mark_root
+from ._stats import BudgetHit, Failure, Stats
+from ._stubs import make_stub
 from ._transformer import (
     InsertImport, InsertReturnType, Transformation, Transformer,
 )
@@ -19,6 +33,12 @@ logger = getLogger(__name__)
 
 @dataclass(frozen=True)
 class Inferno:
+    """Infer return types of functions and add them into the source code.
+
+    The same instance can be used from multiple threads at once. Stats of each
+    call are collected separately and merged into `stats` when it finishes.
+    Time limits set by `function_budget` are enforced only in the main thread.
+    """
     safe: bool = False
     imports: bool = True
     methods: bool = True
@@ -26,27 +46,163 @@ class Inferno:
     assumptions: bool = True
     only: frozenset[str] = field(default_factory=frozenset)
     allowed_types: frozenset[str] = field(default_factory=frozenset)
+    function_budget: float | None = None  # max seconds per function per extractor
+    file_budget: float | None = None      # max seconds per file
+    stats: Stats = field(default_factory=Stats, compare=False)
+    # reuse inferred types for functions whose source didn't change
+    cache: MutableMapping[str, Type | None] | None = field(default=None, compare=False)
+    source_root: Path | None = None  # used to calculate module names
+    traceback_rate: float = 1.  # fraction of failures to log with traceback
+    scope: Scope = field(default_factory=Scope)  # modules astroid may load
+    limits: Limits = field(default_factory=Limits)  # files too expensive to annotate
+    dedup: bool = True  # infer structurally identical functions only once
+    # inferred types for fingerprints of functions seen in this run
+    fingerprints: dict[str, Type | None] = field(default_factory=dict, compare=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False,
+    )
+    _local: threading.local = field(
+        default_factory=threading.local, init=False, repr=False, compare=False,
+    )
 
     def transform(self, path: Path) -> str:
-        source = path.read_text()
+        """Get the source code of the file with annotations added.
+        """
+        return decode_source(self.rewrite(path))
+
+    def rewrite(self, path: Path, source: bytes | None = None) -> bytes:
+        """Like transform but returns the raw bytes to write into the file.
+
+        Encoding and line endings of the original file are preserved.
+        If the source is passed, it is used instead of reading the file,
+        and the path is used only to get the module name.
+        Raises SkippedFile if the file doesn't pass the limits.
+        """
+        with self._collect_stats() as stats:
+            with count_parses(stats.parses), limit_scope(self.scope):
+                return self._transform(path, source)
+
+    def make_stub(self, path: Path) -> str:
+        """Generate the content of a `.pyi` stub file for the module.
+
+        Raises SkippedFile if the file doesn't pass the limits.
+        """
+        with self._collect_stats() as stats:
+            with count_parses(stats.parses), limit_scope(self.scope):
+                _, root = self._parse(path)
+                deadline = self._get_deadline()
+                return make_stub(root, partial(self._get_stub_sig, path, deadline))
+
+    @contextmanager
+    def _collect_stats(self) -> Iterator[Stats]:
+        stats = Stats()
+        self._local.stats = stats
+        try:
+            yield stats
+        finally:
+            self._local.stats = None
+            with self._lock:
+                self.stats.merge(stats)
+
+    @property
+    def _stats(self) -> Stats:
+        # stats of the current call in this thread
+        stats = getattr(self._local, 'stats', None)
+        return self.stats if stats is None else stats
+
+    def _get_stub_sig(
+        self,
+        path: Path,
+        deadline: float | None,
+        node: astroid.FunctionDef,
+    ) -> FSig | None:
+        if isinstance(node.parent, astroid.ClassDef):
+            if not self.methods:
+                return None
+        elif not self.functions:
+            return None
+        try:
+            sig = self._infer_sig(path, node, deadline)
+        except Exception as exc:
+            if not self.safe:
+                raise
+            self._record_failure(Failure.from_exception(path, node.lineno, exc))
+            return None
+        if sig is None or (not self.imports and sig.imports):
+            return None
+        self._stats.annotations += 1
+        return sig
+
+    def _parse(
+        self,
+        path: Path,
+        source: bytes | None = None,
+    ) -> tuple[bytes, astroid.Module]:
+        reuse = source is None
+        if source is None:
+            source = path.read_bytes()
+        reason = self.limits.get_reason(path, source)
+        if reason is not None:
+            self._stats.skipped[path] = reason
+            raise SkippedFile(path, reason)
+        root, reused = parse_module(
+            decode_source(source), path, self.source_root, reuse=reuse,
+        )
+        mark_root(root)
+        if reused:
+            self._stats.reused += 1
+        self._stats.files += 1
+        return source, root
+
+    def _get_deadline(self) -> float | None:
+        if self.file_budget is None:
+            return None
+        return time.monotonic() + self.file_budget
+
+    def _transform(self, path: Path, source: bytes | None) -> bytes:
+        source, root = self._parse(path, source)
         tr = Transformer(source)
-        root = astroid.parse(source, path=str(path))
+        deadline = self._get_deadline()
         for node in root.body:
+            if deadline is not None and time.monotonic() >= deadline:
+                self._stats.budget_hits.append(BudgetHit(path, node.lineno, 'file'))
+                break
             try:
-                transforms = list(self._get_transforms_for_node(node))
-            except Exception:
+                transforms = list(self._get_transforms_for_node(path, node, deadline))
+            except Exception as exc:
                 if not self.safe:
                     raise
-                logger.exception(f'failed inference for {path}:{node.lineno}')
+                self._record_failure(Failure.from_exception(path, node.lineno, exc))
                 continue
             for transform in transforms:
+                if isinstance(transform, InsertReturnType):
+                    self._stats.annotations += 1
                 tr.add(transform)
         return tr.apply()
 
-    def _get_transforms_for_node(self, node: astroid.NodeNG) -> Iterator[Transformation]:
+    def _record_failure(self, failure: Failure) -> None:
+        # failures are counted across all threads for sampling
+        with self._lock:
+            count = self.stats.add_failure(failure)
+        # log traceback for the first failure in each group and then sample
+        rate = self.traceback_rate
+        if math.ceil(count * rate) != math.ceil((count - 1) * rate):
+            logger.exception(f'failed inference for {failure.path}:{failure.lineno}')
+        else:
+            logger.debug(
+                'failed inference for %s:%s: %s: %s',
+                failure.path, failure.lineno, failure.error_type, failure.error,
+            )
+
+    def _get_transforms_for_node(
+        self,
+        path: Path,
+        node: astroid.NodeNG,
+        deadline: float | None,
+    ) -> Iterator[Transformation]:
         # infer return type for function
         if self.functions and isinstance(node, astroid.FunctionDef):
-            sig = self._infer_sig(node)
+            sig = self._infer_sig(path, node, deadline)
             if sig is not None:
                 if not self.imports and sig.imports:
                     return
@@ -60,7 +216,7 @@ class Inferno:
             for subnode in node.body:
                 if not isinstance(subnode, astroid.FunctionDef):
                     continue
-                sig = self._infer_sig(subnode)
+                sig = self._infer_sig(path, subnode, deadline)
                 if sig is None:
                     continue
                 if not self.imports and sig.imports:
@@ -69,10 +225,15 @@ class Inferno:
                     yield InsertImport(node, import_stmt)
                 yield InsertReturnType(subnode, sig.annotation)
 
-    def _infer_sig(self, node: astroid.FunctionDef) -> FSig | None:
+    def _infer_sig(
+        self,
+        path: Path,
+        node: astroid.FunctionDef,
+        deadline: float | None,
+    ) -> FSig | None:
         if node.returns is not None:
             return None
-        return_type = get_return_type(node, names=self.only)
+        return_type = self._get_return_type(path, node, deadline)
         if return_type is None:
             return None
         if not self.assumptions and return_type.assumptions:
@@ -83,4 +244,78 @@ class Inferno:
             name=node.name,
             args=node.args.as_string(),
             return_type=return_type,
+            module=node.root().name,
+        )
+
+    def _get_return_type(
+        self,
+        path: Path,
+        node: astroid.FunctionDef,
+        deadline: float | None,
+    ) -> Type | None:
+        if not self.dedup:
+            return self._get_cached_return_type(path, node, deadline)
+        fingerprint = get_fingerprint(node)
+        try:
+            return_type = self.fingerprints[fingerprint]
+        except KeyError:
+            pass
+        else:
+            self._stats.deduplicated += 1
+            return return_type
+        hits = len(self._stats.budget_hits)
+        return_type = self._get_cached_return_type(path, node, deadline)
+        # do not share incomplete results
+        if len(self._stats.budget_hits) == hits:
+            self.fingerprints[fingerprint] = return_type
+        return return_type
+
+    def _get_cached_return_type(
+        self,
+        path: Path,
+        node: astroid.FunctionDef,
+        deadline: float | None,
+    ) -> Type | None:
+        if self.cache is None:
+            return self._infer_return_type(path, node, deadline)
+        key = get_function_key(node, self.only, self.allowed_types, self.scope)
+        try:
+            return_type = self.cache[key]
+        except KeyError:
+            pass
+        else:
+            self._stats.cache_hits += 1
+            return return_type
+        hits = len(self._stats.budget_hits)
+        return_type = self._infer_return_type(path, node, deadline)
+        # do not cache incomplete results
+        if len(self._stats.budget_hits) == hits:
+            self.cache[key] = return_type
+        return return_type
+
+    def _infer_return_type(
+        self,
+        path: Path,
+        node: astroid.FunctionDef,
+        deadline: float | None,
+    ) -> Type | None:
+        budget = self.function_budget
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._stats.budget_hits.append(BudgetHit(path, node.lineno, 'file'))
+                return None
+            if budget is None or remaining < budget:
+                budget = remaining
+        timeouts: list[str] = []
+        return_type = get_return_type(
+            node,
+            names=self.only,
+            budget=budget,
+            timeouts=timeouts,
+            allowed_types=self.allowed_types,
+            timings=self._stats.timings,
         )
+        for name in timeouts:
+            self._stats.budget_hits.append(BudgetHit(path, node.lineno, name))
+        return return_type
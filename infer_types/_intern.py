@@ -0,0 +1,172 @@
+"""Interning of Type values.
+
+The same few types (`int`, `str`, `None`, `Iterator`...) are inferred
+over and over again. Interning makes all structurally equal types share
+a single instance, and then the results of merging them can be memoized.
+
+Interned types are shared, so they must never be mutated.
+New types are added under a lock, lookups don't need it.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Hashable, Iterable, Tuple
+
+from astypes import Ass, Type
+from astypes._type import UNION
+
+
+Key = Tuple[Hashable, ...]
+
+# the max number of interned types, new types are not interned after that
+MAX_SIZE = 10_000
+# types that are supertypes of any type
+TOP_TYPES = frozenset({'Any', 'object'})
+
+_lock = threading.Lock()
+_interned: dict[Key, Type] = {}
+# the id of each interned type and its key, interned types are never collected
+_keys: dict[int, Key] = {}
+# union of two interned types (by their ids)
+_merged: dict[tuple[int, int], Type] = {}
+
+
+def get_key(value: Type) -> Key:
+    """Get a hashable representation of the type structure.
+    """
+    key = _keys.get(id(value))
+    if key is not None:
+        return key
+    return (
+        value.name,
+        value._module,
+        tuple(get_key(arg) for arg in value._args),
+        frozenset(value._ass),
+    )
+
+
+def intern(value: Type) -> Type:
+    """Get the shared instance of the type structurally equal to the given one.
+    """
+    if id(value) in _keys:
+        return value
+    key = get_key(value)
+    interned = _interned.get(key)
+    if interned is not None:
+        return interned
+    # another thread might be interning an equal type right now
+    with _lock:
+        interned = _interned.get(key)
+        if interned is not None:
+            return interned
+        if len(_interned) >= MAX_SIZE:
+            return value
+        _interned[key] = value
+        _keys[id(value)] = key
+    return value
+
+
+def new_type(
+    name: str, *,
+    args: Iterable[Type] = (),
+    ass: Iterable[Ass] = (),
+    module: str = '',
+) -> Type:
+    """Like Type.new but returns an interned type.
+    """
+    args = [intern(arg) for arg in args]
+    return intern(Type.new(name, args=args, ass=set(ass), module=module))
+
+
+def merge(left: Type, right: Type) -> Type:
+    """Like Type.merge but memoized for interned types.
+    """
+    left = intern(left)
+    right = intern(right)
+    pair = (id(left), id(right))
+    result = _merged.get(pair)
+    if result is None:
+        result = intern(left.merge(right))
+        if id(left) in _keys and id(right) in _keys:
+            _merged[pair] = result
+    return result
+
+
+def union(values: Iterable[Type], ass: Iterable[Ass] = ()) -> Type:
+    """Get a union of all the types, the same as merging them one by one.
+
+    Merging one by one rebuilds the union on each step and checks the new type
+    against all its members, which is quadratic. Here, the same steps are replayed
+    on a list of the union members, the members are checked using a set of their
+    keys, and the union is built once. The given assumptions are added
+    to the result if it is known.
+    """
+    result = new_type('')
+    members: list[Type] = []
+    keys: set[Key] = set()
+    names: set[str] = set()
+    union_ass: set[Ass] = set()
+    for value in values:
+        if value.unknown:
+            continue
+        value = intern(value)
+        if not members:
+            # the result is not a union yet, merging it is cheap
+            result = merge(result, value)
+            if result.is_union:
+                members = list(result._args)
+                keys = {get_key(member)[:3] for member in members}
+                names = {member.name for member in members}
+                union_ass = set(result._ass)
+            continue
+
+        # the new type is a subtype of one of the members (or of the whole union)
+        if names & TOP_TYPES:
+            continue
+        if value.is_union:
+            if list(map(get_key, value._args)) == list(map(get_key, members)):
+                continue
+        elif get_key(value)[:3] in keys:
+            continue
+        elif value.name == 'int' and 'float' in names:
+            continue
+
+        # the new type is a supertype of the whole union
+        parts = value._args if value.is_union else [value]
+        if any(part.name in TOP_TYPES for part in parts):
+            result = value
+            members = list(value._args)
+            if members:
+                keys = {get_key(member)[:3] for member in members}
+                names = {member.name for member in members}
+                union_ass = set(value._ass)
+            continue
+
+        members.extend(parts)
+        keys.update(get_key(part)[:3] for part in parts)
+        names.update(part.name for part in parts)
+        if value.is_union:
+            union_ass.update(value._ass)
+    if members:
+        result = new_type(UNION, args=members, ass=union_ass)
+    if result.unknown:
+        return result
+    return _add_ass(result, set(ass))
+
+
+def _add_ass(value: Type, ass: set[Ass]) -> Type:
+    if ass <= value._ass:
+        return value
+    return intern(Type.new(
+        value.name,
+        args=list(value._args),
+        ass=value._ass | ass,
+        module=value._module,
+    ))
+
+
+def clear() -> None:
+    with _lock:
+        _merged.clear()
+        _keys.clear()
+        _interned.clear()
@@ -0,0 +1,59 @@
+"""Keep track of processed files to resume interrupted runs.
+
+The journal is a text file where each line is `<content hash> <path>`.
+Lines are appended and flushed as soon as a file is processed,
+so the journal survives the process being killed at any moment.
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TextIO
+
+
+@dataclass
+class Journal:
+    path: Path
+    _done: dict[str, str] = field(default_factory=dict)
+    _stream: TextIO | None = None
+
+    @classmethod
+    def open(cls, path: Path, resume: bool) -> Journal:
+        """Open the journal, loading the progress of the previous run if resuming.
+        """
+        journal = cls(path)
+        if resume and path.exists():
+            for line in path.read_text(encoding='utf8').splitlines():
+                digest, sep, file_path = line.partition(' ')
+                # the last line might be incomplete if the process was killed
+                if sep and len(digest) == 32:
+                    journal._done[file_path] = digest
+        journal._stream = path.open('a' if resume else 'w', encoding='utf8')
+        return journal
+
+    def is_done(self, path: Path) -> bool:
+        """Check if the file is processed and wasn't modified since then.
+        """
+        digest = self._done.get(str(path))
+        if digest is None:
+            return False
+        return digest == get_digest(path.read_bytes())
+
+    def record(self, path: Path, content: bytes) -> None:
+        """Mark the file with the given (new) content as processed.
+        """
+        digest = get_digest(content)
+        self._done[str(path)] = digest
+        assert self._stream is not None, 'journal is not open'
+        self._stream.write(f'{digest} {path}\n')
+        self._stream.flush()
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+def get_digest(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
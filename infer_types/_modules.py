@@ -0,0 +1,111 @@
+"""Integration with the astroid modules cache.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import astroid
+
+
+# parsing of modules with the same name is serialized, see `parse_module`
+_parse_locks = tuple(threading.Lock() for _ in range(64))
+# counts of parsed modules for the current thread, see `count_parses`
+_local = threading.local()
+_counting_lock = threading.Lock()
+_counting_threads = 0  # how many threads are inside `count_parses` right now
+
+
+def get_module_name(path: Path, source_root: Path | None = None) -> str | None:
+    """Get the dotted name under which the file can be imported.
+
+    If the source root isn't specified, the name is calculated from the package
+    structure (directories with `__init__.py`), and None is returned for files
+    that are not in a package.
+    """
+    path = Path(os.path.abspath(path))
+    if source_root is not None:
+        try:
+            parts = list(path.relative_to(os.path.abspath(source_root)).parts)
+        except ValueError:
+            return None
+        parts[-1] = path.stem
+    else:
+        parts = [path.stem]
+        parent = path.parent
+        while (parent / '__init__.py').exists():
+            parts.insert(0, parent.name)
+            parent = parent.parent
+        if len(parts) == 1:
+            return None
+    if parts[-1] == '__init__':
+        parts.pop()
+    if not parts or not all(part.isidentifier() for part in parts):
+        return None
+    return '.'.join(parts)
+
+
+def parse_module(
+    source: str,
+    path: Path,
+    source_root: Path | None = None,
+    reuse: bool = True,
+) -> tuple[astroid.Module, bool]:
+    """Parse the module and register it in the astroid cache.
+
+    If the module is already parsed and registered (because it was imported
+    while inferring types in another module), reuse it. The second returned value
+    is True if the module was taken from the cache. Set `reuse` to False
+    if the source may differ from the file content, like unsaved editor buffers.
+
+    Threads parsing the same module wait for each other, so that all of them
+    get the same tree. The lock is striped: unrelated modules are parsed in parallel.
+    """
+    file_name = os.path.abspath(path)
+    mod_name = get_module_name(path, source_root)
+    if mod_name is None:
+        return astroid.parse(source, path=file_name), False
+    cache = astroid.MANAGER.astroid_cache
+    with _parse_locks[hash(mod_name) % len(_parse_locks)]:
+        cached = cache.get(mod_name)
+        if reuse and cached is not None and cached.file == file_name:
+            return cached, True
+        module = astroid.parse(source, module_name=mod_name, path=file_name)
+        cache[mod_name] = module
+    return module, False
+
+
+@contextmanager
+def count_parses(counts: dict[str, int]) -> Iterator[None]:
+    """Count how many times each file gets parsed by astroid inside the block.
+
+    Only modules parsed by the current thread are counted.
+    """
+    global _counting_threads
+    old_counts = getattr(_local, 'counts', None)
+    _local.counts = counts
+    with _counting_lock:
+        if _counting_threads == 0:
+            astroid.MANAGER.register_transform(astroid.Module, _count)
+        _counting_threads += 1
+    try:
+        yield
+    finally:
+        with _counting_lock:
+            _counting_threads -= 1
+            if _counting_threads == 0:
+                astroid.MANAGER.unregister_transform(astroid.Module, _count)
+        _local.counts = old_counts
+
+
+def _count(module: astroid.Module) -> None:
+    counts = getattr(_local, 'counts', None)
+    if counts is None:
+        return
+    # skip modules generated by astroid brain plugins
+    if not module.file or module.file.startswith('<'):
+        return
+    counts[module.file] = counts.get(module.file, 0) + 1
@@ -0,0 +1,79 @@
+"""Cache of resolved ancestors and inherited methods for classes.
+
+Resolving ancestors of a class requires inferring all its bases,
+and astroid does it again on every attribute lookup. The cache is keyed
+by the class node and weakly references it, so it lives as long as
+astroid keeps the module in its cache. Ancestors of a class are shared
+with all its subclasses.
+
+Cache hits don't take any locks. Resolution takes a single reentrant lock:
+it recurses into base classes, so separate locks for each class could
+be taken by two threads in different orders and deadlock.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from weakref import WeakKeyDictionary
+
+import astroid
+
+
+@dataclass(frozen=True)
+class ClassInfo:
+    ancestors: tuple[astroid.ClassDef, ...]
+    # definitions of each name in the class and its ancestors, in MRO order
+    members: dict[str, list[astroid.NodeNG]] = field(default_factory=dict)
+
+
+_cache: WeakKeyDictionary[astroid.ClassDef, ClassInfo] = WeakKeyDictionary()
+# placeholder for classes being resolved, protects from inheritance cycles
+_RESOLVING = ClassInfo(ancestors=())
+_lock = threading.RLock()
+
+
+def get_class_info(cls_node: astroid.ClassDef) -> ClassInfo:
+    """Get ancestors and members of the class, resolving them only once.
+    """
+    info = _cache.get(cls_node)
+    if info is not None and info is not _RESOLVING:
+        return info
+    with _lock:
+        # only the thread holding the lock can see the placeholder here,
+        # and only for an inheritance cycle
+        info = _cache.get(cls_node)
+        if info is not None:
+            return info
+        _cache[cls_node] = _RESOLVING
+        try:
+            info = _resolve(cls_node)
+        except BaseException:
+            del _cache[cls_node]
+            raise
+        _cache[cls_node] = info
+    return info
+
+
+def clear_cache() -> None:
+    """Forget all resolved classes, for instance, when source files change.
+    """
+    with _lock:
+        _cache.clear()
+
+
+def _resolve(cls_node: astroid.ClassDef) -> ClassInfo:
+    # the same order as in `ClassDef.ancestors(recurs=True)`
+    ancestors: list[astroid.ClassDef] = []
+    seen = {cls_node}
+    for base in cls_node.ancestors(recurs=False):
+        for ancestor in (base, *get_class_info(base).ancestors):
+            if ancestor in seen:
+                continue
+            seen.add(ancestor)
+            ancestors.append(ancestor)
+
+    members: dict[str, list[astroid.NodeNG]] = {}
+    for node in (cls_node, *ancestors):
+        for name, defs in node.locals.items():
+            members.setdefault(name, []).extend(defs)
+    return ClassInfo(ancestors=tuple(ancestors), members=members)
@@ -0,0 +1,132 @@
+"""Split a run into shards and combine their machine-readable reports.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Iterable
+
+from ._stats import Stats
+
+
+TOTALS = (
+    'files', 'annotations', 'failures', 'budget_hits',
+    'parses', 'duplicate_parses', 'skipped', 'deduplicated',
+)
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse `K/N` into (K, N) where 1 <= K <= N.
+    """
+    index, sep, count = value.partition('/')
+    if not sep or not index.isdigit() or not count.isdigit():
+        raise ValueError(f'shard must be in the format K/N, got {value!r}')
+    shard = (int(index), int(count))
+    if not 1 <= shard[0] <= shard[1]:
+        raise ValueError(f'shard index must be between 1 and {count}')
+    return shard
+
+
+def select_shard(paths: Iterable[Path], index: int, count: int) -> list[Path]:
+    """Pick files for the given shard (1-based index).
+
+    Files are distributed greedily, the biggest first, into the least loaded
+    shard. The result depends only on the file paths and sizes,
+    so every node running the same tree gets the same partitioning.
+    """
+    sized = sorted(((path.stat().st_size, str(path)), path) for path in paths)
+    sized.reverse()
+    loads = [0] * count
+    selected = []
+    for (size, _), path in sized:
+        target = min(range(count), key=loads.__getitem__)
+        loads[target] += size
+        if target == index - 1:
+            selected.append(path)
+    selected.sort()
+    return selected
+
+
+def make_report(stats: Stats, shard: str = '') -> dict[str, Any]:
+    """Convert stats of the run into a JSON-serializable report.
+    """
+    failures = [asdict(failure) for failure in stats.failures]
+    budget_hits = [asdict(hit) for hit in stats.budget_hits]
+    for record in failures + budget_hits:
+        record['path'] = str(record['path'])
+    return dict(
+        shard=shard,
+        totals=dict(
+            files=stats.files,
+            annotations=stats.annotations,
+            failures=len(failures),
+            budget_hits=len(budget_hits),
+            parses=sum(stats.parses.values()),
+            duplicate_parses=len(stats.duplicate_parses),
+            skipped=len(stats.skipped),
+            deduplicated=stats.deduplicated,
+        ),
+        failures=failures,
+        failure_groups=group_failures(failures),
+        budget_hits=budget_hits,
+        skipped=[
+            dict(path=str(path), reason=reason)
+            for path, reason in stats.skipped.items()
+        ],
+    )
+
+
+def group_failures(failures: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Group failures by exception type and origin, most common first.
+    """
+    groups: dict[tuple[str, str], dict[str, Any]] = {}
+    for failure in failures:
+        key = (failure['error_type'], failure['origin'])
+        group = groups.get(key)
+        if group is None:
+            group = dict(
+                error_type=failure['error_type'],
+                origin=failure['origin'],
+                count=0,
+                example=f"{failure['path']}:{failure['lineno']}",
+            )
+            groups[key] = group
+        group['count'] += 1
+    return sorted(
+        groups.values(),
+        key=lambda group: (-group['count'], group['error_type'], group['origin']),
+    )
+
+
+def write_report(path: Path, report: dict[str, Any]) -> None:
+    path.write_text(json.dumps(report, indent=2, sort_keys=True))
+
+
+def merge_reports(paths: Iterable[Path]) -> dict[str, Any]:
+    """Combine reports from all shards into one.
+    """
+    totals = dict.fromkeys(TOTALS, 0)
+    failures: list[dict[str, Any]] = []
+    budget_hits: list[dict[str, Any]] = []
+    skipped: list[dict[str, Any]] = []
+    shards = []
+    for path in paths:
+        report = json.loads(path.read_text())
+        shards.append(report['shard'])
+        for name in TOTALS:
+            totals[name] += report['totals'].get(name, 0)
+        failures.extend(report['failures'])
+        budget_hits.extend(report['budget_hits'])
+        skipped.extend(report.get('skipped', ()))
+    failures.sort(key=lambda r: (r['path'], r['lineno']))
+    budget_hits.sort(key=lambda r: (r['path'], r['lineno']))
+    skipped.sort(key=lambda r: r['path'])
+    return dict(
+        shard=','.join(shards),
+        totals=totals,
+        failures=failures,
+        failure_groups=group_failures(failures),
+        budget_hits=budget_hits,
+        skipped=skipped,
+    )
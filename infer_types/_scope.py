@@ -0,0 +1,151 @@
+"""Limit which modules astroid may load while inferring types.
+
+Inferring a single call can make astroid load a big part of a framework.
+Modules out of the scope are not loaded, and names imported from them
+are treated as unknown. Modules that are already loaded are always used.
+
+The depth of a module is how many imports away it is from the files being
+annotated. Modules imported directly by these files have depth 1.
+"""
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+import astroid
+from astroid.exceptions import AstroidImportError
+from astroid.manager import AstroidManager
+
+
+# modules that astroid cannot work without
+ALWAYS_ALLOWED = frozenset({'builtins'})
+IMPORT_NODES = (astroid.Import, astroid.ImportFrom)
+
+InferFunc = Callable[..., Iterator[Any]]
+
+
+@dataclass(frozen=True)
+class Scope:
+    allow: tuple[str, ...] = ()     # packages that may be loaded, all if empty
+    deny: tuple[str, ...] = ()      # packages that may not be loaded
+    max_depth: int | None = None    # max depth of loaded modules
+
+    def allows(self, mod_name: str) -> bool:
+        """Check if the module may be loaded, regardless of its depth.
+        """
+        if mod_name in ALWAYS_ALLOWED:
+            return True
+        if _matches(mod_name, self.deny):
+            return False
+        if self.allow and not _matches(mod_name, self.allow):
+            return False
+        return True
+
+    @property
+    def unlimited(self) -> bool:
+        return not self.allow and not self.deny and self.max_depth is None
+
+
+# depth of modules loaded by astroid, missing for the files being annotated
+_depths: dict[str, int] = {}
+# the scope and the depth of the module importing another module right now,
+# for the current thread
+_local = threading.local()
+_patch_lock = threading.Lock()
+_patched_threads = 0  # how many threads are inside `limit_scope` right now
+_originals: dict[Any, Any] = {}
+
+
+@contextmanager
+def limit_scope(scope: Scope) -> Iterator[None]:
+    """Prevent astroid from loading modules out of the scope inside the block.
+
+    Astroid is patched while at least one thread is inside the block,
+    and the patched functions check the scope of the thread calling them.
+    """
+    global _patched_threads
+    if scope.unlimited:
+        yield
+        return
+    old_scope = getattr(_local, 'scope', None)
+    _local.scope = scope
+    with _patch_lock:
+        if _patched_threads == 0:
+            _patch()
+        _patched_threads += 1
+    try:
+        yield
+    finally:
+        with _patch_lock:
+            _patched_threads -= 1
+            if _patched_threads == 0:
+                _unpatch()
+        _local.scope = old_scope
+
+
+def _patch() -> None:
+    original_load = AstroidManager.ast_from_module_name
+    _originals[AstroidManager] = original_load
+    for cls in IMPORT_NODES:
+        _originals[cls] = cls._infer
+
+    def ast_from_module_name(
+        manager: AstroidManager,
+        modname: str | None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> astroid.Module:
+        scope: Scope | None = getattr(_local, 'scope', None)
+        if scope is None or modname is None or modname in manager.astroid_cache:
+            return original_load(manager, modname, *args, **kwargs)
+        importer_depth = getattr(_local, 'importer_depth', None)
+        depth = 1 if importer_depth is None else importer_depth + 1
+        if not scope.allows(modname):
+            raise AstroidImportError(f'module {modname} is out of the inference scope')
+        if scope.max_depth is not None and depth > scope.max_depth:
+            raise AstroidImportError(f'module {modname} is too deep ({depth})')
+        module = original_load(manager, modname, *args, **kwargs)
+        _depths[module.name] = min(depth, _depths.get(module.name, depth))
+        return module
+
+    def make_infer(original: InferFunc) -> InferFunc:
+        # modules imported by the statement are one import away from its module
+        def infer(node: astroid.NodeNG, *args: Any, **kwargs: Any) -> Iterator[Any]:
+            results = original(node, *args, **kwargs)
+            depth = _depths.get(node.root().name, 0)
+            while True:
+                old_depth = getattr(_local, 'importer_depth', None)
+                _local.importer_depth = depth
+                try:
+                    result = next(results)
+                except StopIteration:
+                    return
+                finally:
+                    _local.importer_depth = old_depth
+                yield result
+        return infer
+
+    AstroidManager.ast_from_module_name = ast_from_module_name  # type: ignore
+    for cls in IMPORT_NODES:
+        cls._infer = make_infer(_originals[cls])
+
+
+def _unpatch() -> None:
+    AstroidManager.ast_from_module_name = _originals.pop(AstroidManager)  # type: ignore
+    for cls in IMPORT_NODES:
+        cls._infer = _originals.pop(cls)
+
+
+def mark_root(module: astroid.Module) -> None:
+    """Mark the module as being annotated, so it has zero depth.
+    """
+    _depths.pop(module.name, None)
+
+
+def _matches(mod_name: str, packages: tuple[str, ...]) -> bool:
+    for package in packages:
+        if mod_name == package or mod_name.startswith(f'{package}.'):
+            return True
+    return False
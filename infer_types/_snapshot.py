@@ -0,0 +1,377 @@
+"""Snapshot of methods inherited from third-party and stdlib classes.
+
+To find the annotation of an inherited method, astroid has to infer
+the bases of the class, which means parsing the modules where they are
+defined and all their ancestors. The snapshot stores the result,
+so the next run can resolve it without touching these modules at all:
+
++ "bases": how the base is imported in the project -> class qualified name.
++ "classes": for each class, its module, ancestors, names of the methods,
+  and the types that the `inherit` extractor got for them.
++ "modules": the file, its mtime, and the package version for each module.
+  If any of them changed, the snapshot entries of the module are not used.
+
+Only classes defined outside of the project are stored.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import sysconfig
+import threading
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+import astroid
+from astypes import Type
+
+from ._cache import dump_type, load_type
+from ._fs import file_lock, write_atomic
+from ._mro import get_class_info
+
+
+# bump it when the stored data format changes
+FORMAT_VERSION = 1
+# the base class of classes without explicit bases
+OBJECT = 'builtins.object'
+
+GetMethodType = Callable[[astroid.FunctionDef], 'Type | None']
+_snapshot: Snapshot | None = None
+
+
+class Snapshot:
+    """Resolved methods of external classes, stored in a JSON file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.changed = False
+        # updates from multiple threads are serialized, lookups are not
+        self._lock = threading.RLock()
+        # results of checking that modules didn't change, for the current run
+        self._valid: dict[str, bool] = {}
+        data = self._read()
+        self._bases: dict[str, str] = data['bases']
+        self._classes: dict[str, dict[str, Any]] = data['classes']
+        self._modules: dict[str, dict[str, Any]] = data['modules']
+
+    def save(self) -> None:
+        """Write the snapshot on disk if it has changed.
+
+        Other processes might have updated the snapshot since it was loaded.
+        Their changes are merged in, and modules checked by this process win.
+        """
+        with self._lock:
+            if self.changed:
+                self._save()
+
+    def _save(self) -> None:
+        with file_lock(self.path.with_name(f'{self.path.name}.lock')):
+            data = self._read()
+            data['bases'].update(self._bases)
+            replaced = set()
+            for mod_name, state in self._modules.items():
+                if not self._valid.get(mod_name) and mod_name in data['modules']:
+                    continue
+                if data['modules'].get(mod_name) != state:
+                    replaced.add(mod_name)
+                    data['modules'][mod_name] = state
+            # drop classes recorded for another version of the module
+            for qname, info in list(data['classes'].items()):
+                if info['module'] in replaced:
+                    del data['classes'][qname]
+            for qname, info in self._classes.items():
+                self._merge_class(data, qname, info)
+            write_atomic(self.path, json.dumps(data, sort_keys=True))
+        self.changed = False
+
+    def _read(self) -> dict[str, Any]:
+        empty = dict(version=FORMAT_VERSION, bases={}, classes={}, modules={})
+        try:
+            data = json.loads(self.path.read_text(encoding='utf8'))
+        except (OSError, ValueError):
+            return empty
+        if data.get('version') != FORMAT_VERSION:
+            return empty
+        return data
+
+    def _merge_class(
+        self,
+        data: dict[str, Any],
+        qname: str,
+        info: dict[str, Any],
+    ) -> None:
+        mod_name = info['module']
+        if data['modules'].get(mod_name) != self._modules.get(mod_name):
+            return
+        other = data['classes'].get(qname)
+        if other is None or other['module'] != mod_name:
+            data['classes'][qname] = info
+            return
+        # both processes saw the same version of the module
+        returns = {**other['returns'], **info['returns']}
+        data['classes'][qname] = {**info, 'returns': returns}
+
+    def lookup(self, cls_node: astroid.ClassDef, name: str) -> tuple[bool, Type | None]:
+        """Find the type of the method inherited from external classes.
+
+        The first returned value is False if the snapshot doesn't have
+        all the required information. The method definitions in the class
+        itself are not checked.
+        """
+        names = _get_base_names(cls_node)
+        if names is None:
+            return False, None
+        bases = []
+        for base_name in names:
+            qname = self._bases.get(base_name)
+            if qname is None:
+                return False, None
+            bases.append(qname)
+        for qname in _iter_ancestors(bases, self._classes):
+            info = self._classes.get(qname)
+            if info is None or not self._is_valid(info['module']):
+                return False, None
+            if name not in info['methods']:
+                continue
+            returns = info['returns']
+            if name not in returns:
+                return False, None
+            if returns[name] is not None:
+                return True, load_type(returns[name])
+        return True, None
+
+    def record(
+        self,
+        cls_node: astroid.ClassDef,
+        name: str,
+        get_method_type: GetMethodType,
+    ) -> None:
+        """Remember the method for all external bases of the class.
+        """
+        with self._lock:
+            self._record(cls_node, name, get_method_type)
+
+    def _record(
+        self,
+        cls_node: astroid.ClassDef,
+        name: str,
+        get_method_type: GetMethodType,
+    ) -> None:
+        names = _get_base_names(cls_node)
+        if names is None:
+            return
+        base_nodes = _infer_bases(cls_node)
+        if base_nodes is None or len(base_nodes) != len(names):
+            return
+        if not all(_is_external(base_node) for base_node in base_nodes):
+            return
+        for base_name, base_node in zip(names, base_nodes):
+            self._set(self._bases, base_name, base_node.qname())
+            ancestors = get_class_info(base_node).ancestors
+            for node in (base_node, *ancestors):
+                self._record_class(node, name, get_method_type)
+
+    def _record_class(
+        self,
+        cls_node: astroid.ClassDef,
+        name: str,
+        get_method_type: GetMethodType,
+    ) -> None:
+        qname = cls_node.qname()
+        info = self._classes.get(qname)
+        if info is None or not self._is_valid(info['module']):
+            module = cls_node.root()
+            self._record_module(module)
+            ancestors = get_class_info(cls_node).ancestors
+            info = dict(
+                module=module.name,
+                ancestors=[ancestor.qname() for ancestor in ancestors],
+                methods=sorted(
+                    method for method, defs in cls_node.locals.items()
+                    if any(isinstance(node, astroid.FunctionDef) for node in defs)
+                ),
+                returns={},
+            )
+            self._set(self._classes, qname, info)
+        if name not in info['methods'] or name in info['returns']:
+            return
+        return_type = None
+        for node in cls_node.locals[name]:
+            if isinstance(node, astroid.FunctionDef):
+                return_type = get_method_type(node)
+                if return_type is not None:
+                    break
+        info['returns'][name] = None if return_type is None else dump_type(return_type)
+        self.changed = True
+
+    def _record_module(self, module: astroid.Module) -> None:
+        if self._is_valid(module.name):
+            return
+        # the module has changed, forget everything recorded for it
+        for qname, info in list(self._classes.items()):
+            if info['module'] == module.name:
+                del self._classes[qname]
+        self._modules[module.name] = _get_module_state(module.name, module.file)
+        self._valid[module.name] = True
+        self.changed = True
+
+    def _is_valid(self, mod_name: str) -> bool:
+        valid = self._valid.get(mod_name)
+        if valid is None:
+            state = self._modules.get(mod_name)
+            valid = False
+            if state is not None:
+                valid = state == _get_module_state(mod_name, state['file'])
+            self._valid[mod_name] = valid
+        return valid
+
+    def _set(self, mapping: dict[str, Any], key: str, value: Any) -> None:
+        if mapping.get(key) != value:
+            mapping[key] = value
+            self.changed = True
+
+
+def use_snapshot(path: Path) -> Snapshot:
+    """Load the snapshot and use it for the rest of the process.
+    """
+    global _snapshot
+    _snapshot = Snapshot(path)
+    return _snapshot
+
+
+def get_snapshot() -> Snapshot | None:
+    return _snapshot
+
+
+def reset_snapshot() -> None:
+    """Save the snapshot in use and stop using it.
+    """
+    global _snapshot
+    if _snapshot is not None:
+        _snapshot.save()
+    _snapshot = None
+
+
+def _get_base_names(cls_node: astroid.ClassDef) -> list[str] | None:
+    """Get the names under which all bases of the class are imported.
+
+    Names are resolved without inference, using only imports
+    of the module. None is returned if any of the bases is not imported.
+    """
+    if not cls_node.bases:
+        return [OBJECT]
+    names = []
+    for base in cls_node.bases:
+        name = _get_import_name(base)
+        if name is None:
+            return None
+        names.append(name)
+    return names
+
+
+def _get_import_name(node: astroid.NodeNG) -> str | None:
+    attrs = []
+    while isinstance(node, astroid.Attribute):
+        attrs.append(node.attrname)
+        node = node.expr
+    if not isinstance(node, astroid.Name):
+        return None
+    _, assignments = node.lookup(node.name)
+    if len(assignments) != 1:
+        return None
+    stmt = assignments[0]
+    if isinstance(stmt, astroid.ImportFrom):
+        if stmt.level:
+            return None
+        prefix = f'{stmt.modname}.{stmt.real_name(node.name)}'
+    elif isinstance(stmt, astroid.Import):
+        prefix = stmt.real_name(node.name)
+    elif isinstance(stmt, astroid.ClassDef) and stmt.root().name == 'builtins':
+        prefix = stmt.qname()
+    else:
+        return None
+    return '.'.join([prefix, *reversed(attrs)])
+
+
+def _infer_bases(cls_node: astroid.ClassDef) -> list[astroid.ClassDef] | None:
+    if not cls_node.bases:
+        bases = list(cls_node.ancestors(recurs=False))
+        return bases if len(bases) == 1 else None
+    result = []
+    for base in cls_node.bases:
+        try:
+            inferred = base.inferred()
+        except astroid.InferenceError:
+            return None
+        if len(inferred) != 1 or not isinstance(inferred[0], astroid.ClassDef):
+            return None
+        result.append(inferred[0])
+    return result
+
+
+def _iter_ancestors(
+    bases: list[str],
+    classes: dict[str, dict[str, Any]],
+) -> Iterable[str]:
+    # the same order as in `ClassDef.ancestors(recurs=True)`
+    seen = set()
+    for base in bases:
+        info = classes.get(base)
+        ancestors = info['ancestors'] if info is not None else []
+        for qname in (base, *ancestors):
+            if qname not in seen:
+                seen.add(qname)
+                yield qname
+
+
+def _is_external(cls_node: astroid.ClassDef) -> bool:
+    """Check if the class is defined in stdlib or installed packages.
+    """
+    file = cls_node.root().file
+    if not file or file.startswith('<'):
+        return True
+    return os.path.abspath(file).startswith(_get_external_paths())
+
+
+@lru_cache(maxsize=None)
+def _get_external_paths() -> tuple[str, ...]:
+    paths = sysconfig.get_paths()
+    names = ('stdlib', 'platstdlib', 'purelib', 'platlib')
+    return tuple(os.path.join(paths[name], '') for name in names if name in paths)
+
+
+def _get_module_state(mod_name: str, file: str | None) -> dict[str, Any]:
+    mtime = None
+    if file and not file.startswith('<'):
+        try:
+            mtime = os.stat(file).st_mtime_ns
+        except OSError:
+            mtime = None
+    return dict(file=file, mtime=mtime, version=_get_version(mod_name))
+
+
+@lru_cache(maxsize=None)
+def _get_version(mod_name: str) -> str:
+    """Get the version of the distribution providing the module.
+
+    For stdlib and modules without distribution, the Python version is used.
+    """
+    top_name = mod_name.partition('.')[0]
+    for dist_name in _get_distributions().get(top_name, ()):
+        try:
+            return metadata.version(dist_name)
+        except metadata.PackageNotFoundError:  # pragma: no cover
+            continue
+    return sys.version
+
+
+@lru_cache(maxsize=None)
+def _get_distributions() -> dict[str, list[str]]:
+    get_distributions = getattr(metadata, 'packages_distributions', None)
+    if get_distributions is None:  # pragma: no cover
+        return {}
+    return dict(get_distributions())
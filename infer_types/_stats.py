@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+MAX_ERROR_SIZE = 200
+
+
+@dataclass(frozen=True)
+class BudgetHit:
+    """Inference for the node was aborted because it took too long.
+    """
+    path: Path
+    lineno: int
+    scope: str  # the extractor name or "file"
+
+
+@dataclass(frozen=True)
+class Failure:
+    """Inference for the node failed with an exception (in safe mode).
+    """
+    path: Path
+    lineno: int
+    error: str          # the exception message, truncated
+    error_type: str     # the exception class name
+    origin: str         # where the exception was raised, `module:line`
+
+    @classmethod
+    def from_exception(cls, path: Path, lineno: int, exc: BaseException) -> Failure:
+        tb = exc.__traceback__
+        origin = ''
+        if tb is not None:
+            while tb.tb_next is not None:
+                tb = tb.tb_next
+            module = tb.tb_frame.f_globals.get('__name__', '')
+            origin = f'{module}:{tb.tb_lineno}'
+        return cls(
+            path=path,
+            lineno=lineno,
+            error=str(exc)[:MAX_ERROR_SIZE],
+            error_type=type(exc).__name__,
+            origin=origin,
+        )
+
+    @property
+    def group(self) -> tuple[str, str]:
+        return (self.error_type, self.origin)
+
+
+@dataclass
+class Timing:
+    """Time spent in an extractor.
+    """
+    calls: int = 0          # how many times the extractor was called
+    seconds: float = 0.     # the total time of all calls
+    load: float = 0.        # the time spent on loading the plugin
+
+
+@dataclass
+class Stats:
+    """Information about a run collected by Inferno.
+    """
+    files: int = 0          # how many files were transformed
+    annotations: int = 0    # how many return type annotations were added
+    reused: int = 0         # how many files were already parsed when imported
+    cache_hits: int = 0     # how many functions were taken from the cache
+    deduplicated: int = 0   # how many functions got the type of an identical function
+    parses: dict[str, int] = field(default_factory=dict)  # times each module parsed
+    budget_hits: list[BudgetHit] = field(default_factory=list)
+    failures: list[Failure] = field(default_factory=list)
+    # how many failures there are for each (exception type, origin)
+    failure_groups: dict[tuple[str, str], int] = field(default_factory=dict)
+    timings: dict[str, Timing] = field(default_factory=dict)  # for each extractor
+    skipped: dict[Path, str] = field(default_factory=dict)  # file -> why not parsed
+
+    def merge(self, other: Stats) -> None:
+        """Add the stats collected separately, like in another thread.
+        """
+        self.files += other.files
+        self.annotations += other.annotations
+        self.reused += other.reused
+        self.cache_hits += other.cache_hits
+        self.deduplicated += other.deduplicated
+        for name, count in other.parses.items():
+            self.parses[name] = self.parses.get(name, 0) + count
+        self.budget_hits.extend(other.budget_hits)
+        self.failures.extend(other.failures)
+        for group, count in other.failure_groups.items():
+            self.failure_groups[group] = self.failure_groups.get(group, 0) + count
+        for name, timing in other.timings.items():
+            total = self.timings.setdefault(name, Timing())
+            total.calls += timing.calls
+            total.seconds += timing.seconds
+            total.load += timing.load
+        self.skipped.update(other.skipped)
+
+    def add_failure(self, failure: Failure) -> int:
+        """Record the failure and return how many failures its group has.
+        """
+        self.failures.append(failure)
+        count = self.failure_groups.get(failure.group, 0) + 1
+        self.failure_groups[failure.group] = count
+        return count
+
+    @property
+    def budget_files(self) -> dict[Path, int]:
+        """Files that hit a time budget and how many times.
+        """
+        result: dict[Path, int] = {}
+        for hit in self.budget_hits:
+            result[hit.path] = result.get(hit.path, 0) + 1
+        return result
+
+    @property
+    def duplicate_parses(self) -> dict[str, int]:
+        """Modules that were parsed more than once.
+        """
+        return {name: count for name, count in self.parses.items() if count > 1}
@@ -0,0 +1,151 @@
+"""Generate `.pyi` stub files with inferred signatures.
+
+The stub has all top-level functions, classes, methods, and variables
+of the module. Existing annotations are preserved, and missing return types
+are filled in with inferred ones where possible. Imports are copied from
+the module and merged with imports required for inferred types.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import astroid
+
+from ._fsig import FSig
+
+
+GetSig = Callable[[astroid.FunctionDef], 'FSig | None']
+INDENT = '    '
+ANY_IMPORT = 'from typing import Any'
+
+
+def make_stub(root: astroid.Module, get_sig: GetSig) -> str:
+    """Generate the content of a stub file for the module.
+    """
+    imports: set[str] = set()
+    blocks: list[list[str]] = []
+    for node in root.body:
+        lines = list(_render(node, get_sig, imports, indent=''))
+        if lines:
+            blocks.append(lines)
+    result = _merge_imports(imports)
+    for i, lines in enumerate(blocks):
+        # separate imports and classes with an empty line
+        if result and (i == 0 or _is_class(lines) or _is_class(blocks[i - 1])):
+            result.append('')
+        result.extend(lines)
+    return ''.join(f'{line}\n' for line in result)
+
+
+def get_stub_path(path: Path, roots: Iterable[Path], output: Path) -> Path:
+    """Get the path to the stub file in the output directory.
+
+    The stub is placed relative to the first root containing the file.
+    """
+    for root in roots:
+        if root.is_dir() and root in path.parents:
+            path = path.relative_to(root)
+            break
+    else:
+        path = Path(path.name)
+    return output / path.with_suffix('.pyi')
+
+
+def _merge_imports(imports: Iterable[str]) -> list[str]:
+    """Deduplicate import statements and merge imports from the same module.
+    """
+    plain: set[str] = set()
+    names: dict[str, set[str]] = {}
+    for stmt in imports:
+        if not stmt.startswith('from ') or '(' in stmt:
+            plain.add(stmt)
+            continue
+        module, _, imported = stmt[len('from '):].partition(' import ')
+        names.setdefault(module, set()).update(
+            name.strip() for name in imported.split(',')
+        )
+    result = sorted(plain)
+    for module, module_names in sorted(names.items()):
+        result.append(f'from {module} import {", ".join(sorted(module_names))}')
+    return result
+
+
+def _is_class(lines: list[str]) -> bool:
+    return any(line.startswith('class ') for line in lines)
+
+
+def _render(
+    node: astroid.NodeNG,
+    get_sig: GetSig,
+    imports: set[str],
+    indent: str,
+) -> Iterator[str]:
+    if isinstance(node, (astroid.Import, astroid.ImportFrom)):
+        if not indent and getattr(node, 'modname', '') != '__future__':
+            imports.add(node.as_string())
+        return
+    if isinstance(node, astroid.FunctionDef):
+        yield from _render_function(node, get_sig, imports, indent)
+        return
+    if isinstance(node, astroid.ClassDef):
+        yield from _render_class(node, get_sig, imports, indent)
+        return
+    if isinstance(node, astroid.AnnAssign):
+        if isinstance(node.target, astroid.AssignName):
+            yield f'{indent}{node.target.name}: {node.annotation.as_string()}'
+        return
+    if isinstance(node, astroid.Assign):
+        for target in node.targets:
+            if isinstance(target, astroid.AssignName):
+                imports.add(ANY_IMPORT)
+                yield f'{indent}{target.name}: Any'
+
+
+def _render_function(
+    node: astroid.FunctionDef,
+    get_sig: GetSig,
+    imports: set[str],
+    indent: str,
+) -> Iterator[str]:
+    if node.decorators is not None:
+        for decorator in node.decorators.nodes:
+            yield f'{indent}@{decorator.as_string()}'
+    returns = ''
+    if node.returns is not None:
+        returns = f' -> {node.returns.as_string()}'
+    else:
+        sig = get_sig(node)
+        if sig is not None:
+            imports.update(sig.imports)
+            returns = f' -> {sig.annotation}'
+    prefix = 'async def' if isinstance(node, astroid.AsyncFunctionDef) else 'def'
+    yield f'{indent}{prefix} {node.name}({node.args.as_string()}){returns}: ...'
+
+
+def _render_class(
+    node: astroid.ClassDef,
+    get_sig: GetSig,
+    imports: set[str],
+    indent: str,
+) -> Iterator[str]:
+    if node.decorators is not None:
+        for decorator in node.decorators.nodes:
+            yield f'{indent}@{decorator.as_string()}'
+    bases = [base.as_string() for base in node.bases]
+    # astroid removes metaclass from keywords
+    metaclass = getattr(node, '_metaclass', None)
+    if metaclass is not None:
+        bases.append(f'metaclass={metaclass.as_string()}')
+    bases.extend(keyword.as_string() for keyword in node.keywords or ())
+    header = f'{indent}class {node.name}'
+    if bases:
+        header += f'({", ".join(bases)})'
+    body: list[str] = []
+    for subnode in node.body:
+        body.extend(_render(subnode, get_sig, imports, indent + INDENT))
+    if not body:
+        yield f'{header}: ...'
+        return
+    yield f'{header}:'
+    yield from body
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import codecs
 import tokenize
 from dataclasses import dataclass, field
 from functools import cached_property
@@ -69,8 +70,12 @@ class InsertReturnType(Transformation):
 @dataclass(frozen=True)
 class Transformer:
     """Insert snippets of text into the source code.
+
+    The source code is kept as bytes. Snippets are encoded using the encoding
+    of the file (PEP 263) and inserted at byte offsets, so the rest
+    of the file, including line endings, stays exactly as it was.
     """
-    source: str
+    source: bytes
     _transforms: list[Transformation] = field(default_factory=list)
 
     def add(self, transform: Transformation) -> None:
@@ -78,17 +83,46 @@ class Transformer:
         """
         self._transforms.append(transform)
 
-    def apply(self) -> str:
+    def apply(self) -> bytes:
         """Apply all pending transformations and return the transformed source code.
         """
         self._transforms.sort(key=lambda t: t.position, reverse=True)
-        lines = self.source.splitlines(keepends=True)
-        for transform in self._transforms:
+        inserts = []
+        for index, transform in enumerate(self._transforms):
             lineno, col = transform.pick_position(self)
-            lineno -= 1
-            line = lines[lineno]
-            lines[lineno] = line[:col] + transform.as_str() + line[col:]
-        return ''.join(lines)
+            text = transform.as_str().replace('\n', self.newline)
+            offset = self._get_offset(lineno, col)
+            # snippets added later at the same position go first
+            inserts.append((offset, -index, text.encode(self._codec)))
+        inserts.sort()
+        view = memoryview(self.source)
+        chunks: list[bytes | memoryview] = []
+        start = 0
+        for offset, _, chunk in inserts:
+            chunks.append(view[start:offset])
+            chunks.append(chunk)
+            start = offset
+        chunks.append(view[start:])
+        return b''.join(chunks)
+
+    @cached_property
+    def encoding(self) -> str:
+        """The source code encoding, from the encoding cookie or BOM.
+        """
+        return get_encoding(self.source)
+
+    @cached_property
+    def newline(self) -> str:
+        """The line ending used in the file, judging by the first line.
+        """
+        if not self._lines:
+            return '\n'
+        line = self._lines[0]
+        if line.endswith(b'\r\n'):
+            return '\r\n'
+        if line.endswith(b'\r'):
+            return '\r'
+        return '\n'
 
     @cached_property
     def colons(self) -> tuple[tuple[int, int], ...]:
@@ -100,7 +134,49 @@ class Transformer:
                 result.append(token.start)
         return tuple(result)
 
+    @property
+    def _codec(self) -> str:
+        # the BOM is already in the source, don't add it for every snippet
+        if self.encoding == 'utf-8-sig':
+            return 'utf-8'
+        return self.encoding
+
+    def _get_offset(self, lineno: int, col: int) -> int:
+        """Convert the line number and the column in characters into byte offset.
+        """
+        if lineno > len(self._lines):
+            return len(self.source)
+        offset = self._offsets[lineno - 1]
+        line = self._lines[lineno - 1]
+        # columns on the first line do not include BOM
+        if lineno == 1 and line.startswith(codecs.BOM_UTF8):
+            line = line[len(codecs.BOM_UTF8):]
+            offset += len(codecs.BOM_UTF8)
+        if line.isascii():
+            return offset + col
+        return offset + len(line.decode(self._codec)[:col].encode(self._codec))
+
+    @cached_property
+    def _lines(self) -> list[bytes]:
+        return self.source.splitlines(keepends=True)
+
+    @cached_property
+    def _offsets(self) -> list[int]:
+        offsets = []
+        offset = 0
+        for line in self._lines:
+            offsets.append(offset)
+            offset += len(line)
+        return offsets
+
     @cached_property
     def _tokens(self) -> tuple[tokenize.TokenInfo, ...]:
-        lines = self.source.encode('utf8').splitlines(keepends=True)
-        return tuple(tokenize.tokenize(iter(lines).__next__))
+        return tuple(tokenize.tokenize(iter(self._lines).__next__))
+
+
+def get_encoding(source: bytes) -> str:
+    """Detect the encoding of Python source code as the interpreter does.
+    """
+    lines = iter(source.splitlines(keepends=True)[:2])
+    encoding, _ = tokenize.detect_encoding(lambda: next(lines, b''))
+    return encoding
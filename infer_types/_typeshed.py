@@ -0,0 +1,247 @@
+"""Precompiled index of return type annotations for methods in typeshed.
+
+Resolving a method in typeshed at runtime means parsing and evaluating
+the whole stub module. The index stores only what the `inherit` extractor
+needs, `(module, class, method) -> annotation`, in a flat file that is
+memory-mapped on load. The file is an open-addressing hash table:
+
+    magic | version | slots count | slots (offsets of records) | records
+
+Each record is `module<TAB>class<TAB>method<TAB>annotation<LF>`.
+Each indexed module also has a record with empty class and method names,
+so that methods of modules missing in the index are still resolved
+by parsing their stubs at runtime.
+
+By default, only the standard library stubs bundled with typeshed_client
+are indexed. Parsing and evaluating all of them takes a few minutes,
+so the index should be built once ahead of time (`infer_types index`).
+The version is the version of typeshed_client (and so of the bundled
+stubs) and of Python the index was built with. An index built
+with another version is rebuilt on load.
+"""
+from __future__ import annotations
+
+import ast
+import mmap
+import struct
+import sys
+import zlib
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import typeshed_client
+from astypes import Type
+from astypes._helpers import conv_node_to_type
+
+from ._fs import file_lock, get_tmp_path
+
+
+MAGIC = b'ITTSIDX3'
+# the common part of magic for all formats of the index
+MAGIC_PREFIX = MAGIC[:-1]
+VERSION_SIZE = 32
+SLOT = struct.Struct('<I')
+HEADER_SIZE = len(MAGIC) + VERSION_SIZE + SLOT.size
+
+_index: TypeshedIndex | None = None
+
+# called with the number of processed and of all modules while building the index
+Progress = Callable[[int, int], None]
+
+
+class TypeshedIndex:
+    """Read-only view of the index file.
+    """
+    __slots__ = ('_mm', '_slots')
+
+    def __init__(self, path: Path) -> None:
+        with path.open('rb') as stream:
+            self._mm = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f'{path} is not a typeshed index')
+        (self._slots,) = SLOT.unpack_from(self._mm, HEADER_SIZE - SLOT.size)
+
+    def get(self, mod_name: str, cls_name: str, func_name: str) -> str | None:
+        """Get the source of the return type annotation for the method.
+        """
+        if not self._slots:
+            return None
+        key = _make_key(mod_name, cls_name, func_name)
+        slot = zlib.crc32(key) % self._slots
+        for _ in range(self._slots):
+            (offset,) = SLOT.unpack_from(self._mm, HEADER_SIZE + slot * SLOT.size)
+            if offset == 0:
+                return None
+            end = offset + len(key)
+            if self._mm[offset:end] == key:
+                line_end = self._mm.find(b'\n', end)
+                return self._mm[end:line_end].decode()
+            slot = (slot + 1) % self._slots
+        return None
+
+    def has_module(self, mod_name: str) -> bool:
+        """Check if the methods of the module were indexed.
+        """
+        return self.get(mod_name, '', '') is not None
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def get_modules(stdlib: bool = True) -> list[str]:
+    """Get names of modules with stubs, only of the standard library by default.
+    """
+    typeshed = typeshed_client.get_search_context().typeshed
+    modules = []
+    for name, path in typeshed_client.get_all_stub_files():
+        if stdlib and typeshed not in path.parents:
+            continue
+        modules.append(name)
+    return modules
+
+
+def build_index(
+    path: Path,
+    modules: Iterable[str] | None = None,
+    progress: Progress | None = None,
+) -> int:
+    """Build the index for the given modules (standard library by default).
+
+    Returns the number of indexed methods.
+    """
+    if modules is None:
+        modules = get_modules()
+    modules = list(modules)
+    records = []
+    for method, annotation in _iter_methods(modules, progress):
+        records.append(_make_key(*method) + annotation.encode() + b'\n')
+    methods = sum(1 for record in records if not record.endswith(b'\t\t\t\n'))
+    n_slots = len(records) * 2
+    slots = [0] * n_slots
+    offset = HEADER_SIZE + n_slots * SLOT.size
+    for record in records:
+        key = record[:record.rindex(b'\t') + 1]
+        slot = zlib.crc32(key) % n_slots
+        while slots[slot]:
+            slot = (slot + 1) % n_slots
+        slots[slot] = offset
+        offset += len(record)
+
+    tmp_path = get_tmp_path(path)
+    try:
+        with tmp_path.open('wb') as stream:
+            stream.write(MAGIC)
+            stream.write(get_version())
+            stream.write(SLOT.pack(n_slots))
+            stream.write(b''.join(SLOT.pack(slot) for slot in slots))
+            stream.writelines(records)
+        tmp_path.replace(path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return methods
+
+
+def use_index(path: Path, progress: Progress | None = None) -> TypeshedIndex:
+    """Load the index from the given path, building it first if missing or outdated.
+
+    The loaded index is used by `get_return_type` for the rest of the process.
+    """
+    global _index
+    reset_index()
+    if _needs_build(path):
+        # let only one of concurrent processes build the index
+        with file_lock(path.with_name(f'{path.name}.lock')):
+            if _needs_build(path):
+                build_index(path, progress=progress)
+    _index = TypeshedIndex(path)
+    return _index
+
+
+def get_version() -> bytes:
+    """Get the version of the stubs and Python to store in the index header.
+    """
+    version = '{} py{}.{}'.format(typeshed_client.__version__, *sys.version_info)
+    return version.encode().ljust(VERSION_SIZE, b'\0')[:VERSION_SIZE]
+
+
+def reset_index() -> None:
+    """Stop using the loaded index, fall back to parsing stubs at runtime.
+    """
+    global _index
+    if _index is not None:
+        _index.close()
+    _index = None
+
+
+def get_return_type(mod_name: str, cls_name: str, func_name: str) -> Type | None:
+    """Get the return type of the method as declared in typeshed.
+    """
+    if _index is not None and _index.has_module(mod_name):
+        annotation = _index.get(mod_name, cls_name, func_name)
+        if annotation is None:
+            return None
+        type_node = ast.parse(annotation, mode='eval').body
+        return conv_node_to_type(mod_name, type_node)
+
+    module = typeshed_client.get_stub_names(mod_name)
+    if module is None:
+        return None
+    cls_info = module.get(cls_name)
+    if cls_info is None or cls_info.child_nodes is None:
+        return None
+    method_def = cls_info.child_nodes.get(func_name)
+    if method_def is None:
+        return None
+    if not isinstance(method_def.ast, ast.FunctionDef):
+        return None
+    return conv_node_to_type(mod_name, method_def.ast.returns)
+
+
+def _needs_build(path: Path) -> bool:
+    # the index is missing, has an old format, or was built by another version
+    try:
+        with path.open('rb') as stream:
+            header = stream.read(len(MAGIC) + VERSION_SIZE)
+    except FileNotFoundError:
+        return True
+    # files that are not an index at all are rejected by TypeshedIndex
+    if not header.startswith(MAGIC_PREFIX):
+        return False
+    return header != MAGIC + get_version()
+
+
+def _make_key(mod_name: str, cls_name: str, func_name: str) -> bytes:
+    return f'{mod_name}\t{cls_name}\t{func_name}\t'.encode()
+
+
+def _iter_methods(
+    modules: list[str],
+    progress: Progress | None = None,
+) -> Iterator[tuple[tuple[str, str, str], str]]:
+    for done, mod_name in enumerate(modules):
+        if progress is not None:
+            progress(done, len(modules))
+        names = typeshed_client.get_stub_names(mod_name)
+        path = typeshed_client.get_stub_file(mod_name)
+        if names is None or path is None:
+            continue
+        # the marker of an indexed module
+        yield (mod_name, '', ''), ''
+        source = path.read_text(encoding='utf8')
+        for cls_name, cls_info in names.items():
+            if not isinstance(cls_info.ast, ast.ClassDef):
+                continue
+            for func_name, func_info in (cls_info.child_nodes or {}).items():
+                if not isinstance(func_info.ast, ast.FunctionDef):
+                    continue
+                returns = func_info.ast.returns
+                if returns is None:
+                    continue
+                annotation = ast.get_source_segment(source, returns)
+                if annotation is None:
+                    continue
+                yield (mod_name, cls_name, func_name), ' '.join(annotation.split())
+    if progress is not None:
+        progress(len(modules), len(modules))
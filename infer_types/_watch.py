@@ -0,0 +1,80 @@
+"""Detect modified Python files by polling their modification time.
+"""
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+import astroid
+
+from ._discover import Finder
+from ._mro import clear_cache
+
+
+@dataclass
+class Watcher:
+    roots: list[Path]
+    finder: Finder = field(default_factory=Finder)
+    interval: float = .2    # seconds between polls
+    debounce: float = .05   # wait for this long without changes before reporting
+    _mtimes: dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._mtimes = self._scan()
+
+    def __iter__(self) -> Iterator[list[Path]]:
+        """Infinitely yield batches of modified files.
+        """
+        while True:
+            time.sleep(self.interval)
+            changed = self.changes()
+            if not changed:
+                continue
+            # wait for the editor to finish writing all files
+            while True:
+                time.sleep(self.debounce)
+                more = self.changes()
+                if not more:
+                    break
+                changed.extend(path for path in more if path not in changed)
+            yield changed
+
+    def changes(self) -> list[Path]:
+        """Get the list of files created or modified since the last call.
+        """
+        mtimes = self._scan()
+        changed = [
+            Path(path) for path, mtime in mtimes.items()
+            if self._mtimes.get(path) != mtime
+        ]
+        self._mtimes = mtimes
+        return changed
+
+    def mark(self, path: Path) -> None:
+        """Remember the current state of the file modified by us.
+        """
+        self._mtimes[str(path)] = path.stat().st_mtime_ns
+
+    def _scan(self) -> dict[str, int]:
+        result: dict[str, int] = {}
+        for path in self.finder.iter_files(self.roots):
+            name = str(path)
+            try:
+                result[name] = os.stat(name).st_mtime_ns
+            except FileNotFoundError:
+                continue
+        return result
+
+
+def forget_module(path: Path) -> None:
+    """Drop the file from astroid cache so that importers see the new version.
+    """
+    clear_cache()
+    cache = astroid.MANAGER.astroid_cache
+    file_name = os.path.abspath(path)
+    for name, module in list(cache.items()):
+        if module.file == file_name:
+            del cache[name]
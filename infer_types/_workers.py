@@ -0,0 +1,332 @@
+"""Annotate files in worker processes within a memory budget.
+
+Astroid keeps every parsed module in memory, and how much memory a file
+needs is hard to predict. Instead of a fixed number of workers, the pool
+watches the memory (RSS) of its workers:
+
++ It starts with one worker and starts more only if the memory
+  of all workers plus the memory of a fresh worker fits into the budget.
++ A worker that used more than its share of the budget (split between
+  the workers running right now) after a file is stopped and replaced
+  by a fresh one when needed.
++ If the workers together cross the budget while busy, the biggest one
+  is killed and its file is retried later by a fresh worker. If it fails
+  again, the file is skipped.
++ Files are processed from the biggest to the smallest, fresh workers
+  take the biggest files left, and used workers take the smallest ones.
++ Results are yielded in the order of files. Results that wait for
+  an earlier file are kept in the main process, so when there are too many
+  of them, no other files are started until the earliest one is done.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import pickle
+import sys
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Generator, Iterable, Iterator
+
+from ._stats import Stats
+
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+
+# how often to check the memory of busy workers, in seconds
+POLL_INTERVAL = .5
+# how many times a file may be retried after its worker was killed
+MAX_RETRIES = 1
+# how many results may wait in the main process for an earlier file to finish
+MAX_WAITING = 64
+SIZE_SUFFIXES = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+SKIPPED_REASON = 'the worker exceeded the memory limit'
+
+Task = Callable[[Path], 'tuple[Any, Stats]']
+# called in each worker, returns the context in which the worker runs tasks
+Session = Callable[[], ContextManager[Task]]
+
+
+def parse_size(value: str) -> int:
+    """Parse the memory size like `512M` or `8G` into bytes.
+    """
+    value = value.strip().upper()
+    if value.endswith('B'):
+        value = value[:-1]
+    suffix = value[-1:] if value[-1:] in SIZE_SUFFIXES else ''
+    number = value[:len(value) - len(suffix)]
+    try:
+        size = float(number) * SIZE_SUFFIXES[suffix]
+    except ValueError:
+        raise ValueError(f'invalid memory size: {value!r}')
+    if size <= 0:
+        raise ValueError('memory size must be positive')
+    return int(size)
+
+
+def get_rss(pid: int | None = None) -> int | None:
+    """Get the resident memory of the process in bytes.
+
+    Outside of Linux, only the peak memory of the current process is known.
+    """
+    try:
+        with open(f'/proc/{pid or "self"}/statm', 'rb') as stream:
+            pages = int(stream.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        if pid is not None or resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+@dataclass
+class Worker:
+    process: multiprocessing.process.BaseProcess
+    conn: Connection
+    rss: int = 0                # the last known memory usage
+    done: int = 0               # how many files the worker has processed
+    job: Job | None = None      # the file the worker is processing right now
+
+    @property
+    def fresh(self) -> bool:
+        return self.done == 0
+
+
+@dataclass(order=True)
+class Job:
+    size: int
+    index: int
+    path: Path = field(compare=False)
+    retries: int = field(default=0, compare=False)
+
+
+class WorkerPool:
+    """Processes running tasks for files within the memory budget.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        workers: int,
+        max_memory: int | None = None,
+    ) -> None:
+        self.session = session
+        self.max_workers = max(workers, 1)
+        self.max_memory = max_memory
+        self.workers: list[Worker] = []
+        self.recycled = 0       # how many workers were replaced
+        self.killed = 0         # how many workers were killed while busy
+        # the memory of a fresh worker, measured on the first report
+        self._baseline: int | None = None
+        self._context = _get_context()
+
+    def map(
+        self, paths: Iterable[Path],
+    ) -> Generator[tuple[Path, Any, Stats], None, None]:
+        """Run the task for each file, yield results in the order of paths.
+
+        The result is None for files skipped because of the memory limit.
+        """
+        jobs = [
+            Job(size=_get_size(path), index=index, path=path)
+            for index, path in enumerate(paths)
+        ]
+        pending = deque(sorted(jobs, reverse=True))
+        finished: dict[int, tuple[Path, Any, Stats]] = {}
+        next_index = 0
+        try:
+            while next_index < len(jobs):
+                blocker = next_index if len(finished) >= MAX_WAITING else None
+                self._dispatch(pending, blocker)
+                for job, result, stats in self._collect(pending):
+                    finished[job.index] = (job.path, result, stats)
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop all workers.
+        """
+        for worker in list(self.workers):
+            self._stop(worker, kill=worker.job is not None)
+
+    def _dispatch(self, pending: deque[Job], blocker: int | None = None) -> None:
+        """Send pending files to idle workers.
+
+        If the blocker is specified, only the file with that index may start.
+        """
+        while pending:
+            blocking_job = None
+            if blocker is not None:
+                blocking_job = next((j for j in pending if j.index == blocker), None)
+                if blocking_job is None:
+                    return
+            worker = self._get_idle_worker()
+            if worker is None:
+                return
+            if blocking_job is not None:
+                job = blocking_job
+                pending.remove(job)
+            else:
+                job = pending.popleft() if worker.fresh else pending.pop()
+            worker.job = job
+            worker.conn.send(job.path)
+
+    def _get_idle_worker(self) -> Worker | None:
+        idle = [worker for worker in self.workers if worker.job is None]
+        if idle:
+            # fresh workers first, so they get the biggest files
+            idle.sort(key=lambda worker: worker.done)
+            return idle[0]
+        if len(self.workers) >= self.max_workers:
+            return None
+        if self.workers and not self._can_grow():
+            return None
+        return self._start()
+
+    def _can_grow(self) -> bool:
+        if self.max_memory is None:
+            return True
+        if self._baseline is None:
+            return False
+        used = sum(worker.rss for worker in self.workers)
+        return used + self._baseline <= self.max_memory
+
+    def _collect(self, pending: deque[Job]) -> Iterator[tuple[Job, Any, Stats]]:
+        busy: dict[Any, Worker] = {
+            worker.conn: worker for worker in self.workers if worker.job is not None
+        }
+        timeout = None if self.max_memory is None else POLL_INTERVAL
+        for conn in wait(list(busy), timeout=timeout):
+            worker = busy[conn]
+            job = worker.job
+            assert job is not None
+            try:
+                status, payload, stats, rss = worker.conn.recv()
+            except (EOFError, OSError):
+                # the worker died, probably killed by the OS for using too much memory
+                self._stop(worker, kill=True)
+                yield from self._retry(job, pending)
+                continue
+            worker.job = None
+            worker.done += 1
+            worker.rss = rss
+            if worker.done == 1:
+                self._baseline = min(rss, self._baseline or rss)
+            if status == 'error':
+                raise payload
+            yield job, payload, stats
+            if self._is_too_big(worker):
+                self.recycled += 1
+                self._stop(worker)
+        if self.max_memory is not None:
+            yield from self._enforce_budget(pending)
+
+    def _is_too_big(self, worker: Worker) -> bool:
+        if self.max_memory is None:
+            return False
+        # the share of the workers running right now, not of all allowed workers,
+        # so the only worker running can use the whole budget
+        if worker.rss > self.max_memory / len(self.workers):
+            return True
+        return sum(w.rss for w in self.workers) > self.max_memory
+
+    def _enforce_budget(self, pending: deque[Job]) -> Iterator[tuple[Job, Any, Stats]]:
+        assert self.max_memory is not None
+        busy = [worker for worker in self.workers if worker.job is not None]
+        for worker in busy:
+            worker.rss = get_rss(worker.process.pid) or worker.rss
+        if sum(worker.rss for worker in self.workers) <= self.max_memory:
+            return
+        # killing the only busy worker would not let others make progress
+        if len(busy) < 2:
+            return
+        worker = max(busy, key=lambda worker: worker.rss)
+        job = worker.job
+        assert job is not None
+        self.killed += 1
+        self._stop(worker, kill=True)
+        yield from self._retry(job, pending)
+
+    def _retry(self, job: Job, pending: deque[Job]) -> Iterator[tuple[Job, Any, Stats]]:
+        if job.retries >= MAX_RETRIES:
+            stats = Stats()
+            stats.skipped[job.path] = SKIPPED_REASON
+            yield job, None, stats
+            return
+        job.retries += 1
+        # the biggest first, to be taken by a fresh worker
+        pending.appendleft(job)
+
+    def _start(self) -> Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self.session, child_conn),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = Worker(process=process, conn=parent_conn)
+        self.workers.append(worker)
+        return worker
+
+    def _stop(self, worker: Worker, kill: bool = False) -> None:
+        self.workers.remove(worker)
+        if kill:
+            worker.process.kill()
+        else:
+            try:
+                worker.conn.send(None)
+            except OSError:  # pragma: no cover
+                worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+
+
+def _run_worker(session: Session, conn: Connection) -> None:
+    with session() as task:
+        while True:
+            path = conn.recv()
+            if path is None:
+                return
+            try:
+                result, stats = task(path)
+            except Exception as exc:
+                conn.send(('error', _make_picklable(exc), Stats(), get_rss() or 0))
+                continue
+            conn.send(('ok', result, stats, get_rss() or 0))
+
+
+def _make_picklable(exc: Exception) -> Exception:
+    try:
+        pickle.dumps(exc)
+    except Exception:
+        message = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+        return RuntimeError(message)
+    return exc
+
+
+def _get_context() -> Any:
+    # fork is much faster to start and workers inherit the loaded modules
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context('spawn')  # pragma: no cover
+
+
+def _get_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
@@ -0,0 +1,97 @@
+import time
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from infer_types import _extractors, main
+from infer_types._budget import BudgetExceeded, time_limit
+from infer_types._extractors import Extractor
+from infer_types._inferno import Inferno
+
+
+GIVEN = """
+    def f1():
+        return 1
+
+    class A:
+        def f2(self):
+            return 2
+"""
+
+
+def _slow_extractor(func_node):
+    while True:
+        time.sleep(.001)
+
+
+@pytest.fixture
+def slow(monkeypatch):
+    extractors = [Extractor('slow', _slow_extractor, priority=0)] + _extractors.extractors
+    monkeypatch.setattr(_extractors, 'extractors', extractors)
+
+
+def test_time_limit():
+    with pytest.raises(BudgetExceeded):
+        with time_limit(.01):
+            _slow_extractor(None)
+    with pytest.raises(BudgetExceeded):
+        with time_limit(0):
+            pass
+    with time_limit(None):
+        pass
+    with time_limit(1):
+        pass
+
+
+def test_function_budget(tmp_path: Path, slow):
+    path = tmp_path / 'example.py'
+    path.write_text(dedent(GIVEN))
+    inferno = Inferno(function_budget=.01)
+    result = inferno.transform(path)
+    assert 'def f1() -> int' in result
+    assert 'def f2(self) -> int' in result
+    hits = inferno.stats.budget_hits
+    assert [(hit.lineno, hit.scope) for hit in hits] == [(2, 'slow'), (6, 'slow')]
+    assert inferno.stats.budget_files == {path: 2}
+
+
+def test_file_budget(tmp_path: Path, slow):
+    path = tmp_path / 'example.py'
+    path.write_text(dedent(GIVEN))
+    inferno = Inferno(file_budget=.01)
+    result = inferno.transform(path)
+    assert 'def f1() -> int' in result
+    assert 'def f2(self):' in result
+    hits = inferno.stats.budget_hits
+    assert [(hit.lineno, hit.scope) for hit in hits] == [(2, 'slow'), (5, 'file')]
+
+
+def test_file_budget_for_methods(tmp_path: Path, slow):
+    path = tmp_path / 'example.py'
+    path.write_text(dedent("""
+        class A:
+            def f1(self):
+                return 1
+
+            def f2(self):
+                return 2
+    """))
+    inferno = Inferno(file_budget=.01)
+    result = inferno.transform(path)
+    assert 'def f1(self) -> int' in result
+    assert 'def f2(self):' in result
+    hits = inferno.stats.budget_hits
+    assert [(hit.lineno, hit.scope) for hit in hits] == [(3, 'slow'), (6, 'file')]
+
+
+def test_cli_summary(tmp_path: Path, slow):
+    path = tmp_path / 'example.py'
+    path.write_text(dedent(GIVEN))
+    stream = StringIO()
+    code = main([str(tmp_path), '--function-budget', '.01'], stream)
+    assert code == 0
+    stdout = stream.getvalue()
+    assert 'time budget exceeded in 1 files:' in stdout
+    assert f'{path}: 2 times' in stdout
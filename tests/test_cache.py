@@ -0,0 +1,167 @@
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+import astroid
+import pytest
+from astypes import Ass, Type
+
+from infer_types import main
+from infer_types._cache import (
+    FunctionCache, dump_type, get_function_key, load_type,
+)
+from infer_types._inferno import Inferno
+from infer_types._scope import Scope
+from infer_types._watch import forget_module
+
+
+def _get_key(
+    source: str,
+    names=frozenset(),
+    scope: Scope = Scope(),
+) -> str:
+    module = astroid.parse(dedent(source))
+    node = module.body[-1]
+    if isinstance(node, astroid.ClassDef):
+        node = node.body[0]
+    return get_function_key(node, names, scope=scope)
+
+
+def test_function_key():
+    source = """
+        def f(x):
+            return x  # comment
+    """
+    key = _get_key(source)
+    assert _get_key(source.replace('# comment', '')) == key
+    assert _get_key(source.replace('x  #', '(x)  #')) == key
+    assert _get_key(source.replace('x  #', 'x + 1  #')) != key
+    assert _get_key('X = 1\n' + dedent(source)) == key
+    assert _get_key(source, names=frozenset({'astypes'})) != key
+    assert _get_key(source, scope=Scope(deny=('django',))) != key
+    assert _get_key(source, scope=Scope(allow=('myproject',))) != key
+    assert _get_key(source, scope=Scope(max_depth=2)) != key
+    scope = Scope(deny=('django', 'celery'))
+    assert _get_key(source, scope=scope) == _get_key(
+        source, scope=Scope(deny=('celery', 'django')),
+    )
+
+
+def test_function_key_depends_on_globals():
+    source = """
+        X = 1
+
+        def f():
+            return X
+    """
+    key = _get_key(source)
+    assert _get_key(source.replace('X = 1', 'X = "a"')) != key
+    assert _get_key(source.replace('X = 1', 'Y = 1')) != key
+
+
+def test_function_key_depends_on_base():
+    source = """
+        class A:
+            def f(self) -> int:
+                pass
+
+        class B(A):
+            def f(self):
+                pass
+    """
+    key = _get_key(source)
+    assert _get_key(source.replace('def f(self) -> int', 'def f(self) -> str')) != key
+    # the base class is defined in the same module, so it is a part of the key
+    assert _get_key(source.replace('    pass\n\n', '    return 1\n\n')) != key
+    assert _get_key('def g():\n    return 1\n' + dedent(source)) == key
+
+
+@pytest.mark.parametrize('value', [
+    Type.new('int'),
+    Type.new('Iterator', module='typing'),
+    Type.new('dict', args=[Type.new('str'), Type.new('int')]),
+    Type.new('int', ass={Ass.ALL_RETURNS_SAME, Ass.NO_COMP_OVERLOAD}),
+])
+def test_dump_load_type(value: Type):
+    assert load_type(dump_type(value)) == value
+
+
+def test_function_cache(tmp_path: Path):
+    cache = FunctionCache(tmp_path / 'cache')
+    assert len(cache) == 0
+    with pytest.raises(KeyError):
+        cache['ab']
+    cache['abcd'] = Type.new('int')
+    cache['efgh'] = None
+    assert cache['abcd'] == Type.new('int')
+    assert cache['efgh'] is None
+    assert sorted(cache) == ['abcd', 'efgh']
+    assert len(cache) == 2
+    del cache['abcd']
+    assert 'abcd' not in cache
+    with pytest.raises(KeyError):
+        del cache['abcd']
+    (tmp_path / 'cache' / 'ef' / 'efgh.json').write_text('{')
+    assert 'efgh' not in cache
+
+
+def test_inferno_uses_cache(tmp_path: Path):
+    path = tmp_path / 'example.py'
+    path.write_text(dedent("""
+        def f(x):
+            return len(x)
+
+        def g(x):
+            return x
+    """))
+    cache = FunctionCache(tmp_path / 'cache')
+    inferno = Inferno(cache=cache)
+    first = inferno.transform(path)
+    assert len(cache) == 2
+    assert inferno.stats.cache_hits == 0
+
+    inferno = Inferno(cache=cache)
+    assert inferno.transform(path) == first
+    assert inferno.stats.cache_hits == 2
+
+    # results inferred with another scope are not reused
+    inferno = Inferno(cache=cache, scope=Scope(deny=('json',)))
+    inferno.transform(path)
+    assert inferno.stats.cache_hits == 0
+
+
+def test_cache_global_changed(tmp_path: Path):
+    source = 'X = 1\n\ndef f():\n    return X\n'
+    path = tmp_path / 'example.py'
+    path.write_text(source)
+    cache = FunctionCache(tmp_path / 'cache')
+    assert 'def f() -> int:' in Inferno(cache=cache).transform(path)
+
+    path.write_text(source.replace('X = 1', 'X = "a"'))
+    forget_module(path)
+    inferno = Inferno(cache=cache)
+    assert 'def f() -> str:' in inferno.transform(path)
+    assert inferno.stats.cache_hits == 0
+
+
+def test_cache_shared_between_checkouts(tmp_path: Path):
+    cache = FunctionCache(tmp_path / 'cache')
+    for name in ('a', 'b'):
+        path = tmp_path / name / 'example.py'
+        path.parent.mkdir()
+        path.write_text('def f(x):\n    return len(x)\n')
+        inferno = Inferno(cache=cache, dedup=False)
+        inferno.transform(path)
+    assert len(cache) == 1
+    assert inferno.stats.cache_hits == 1
+
+
+def test_cli_cache_dir(tmp_path: Path):
+    source_dir = tmp_path / 'source'
+    source_dir.mkdir()
+    path = source_dir / 'example.py'
+    path.write_text('def f(x):\n    return len(x)\n')
+    cache_dir = tmp_path / 'cache'
+    code = main([str(source_dir), '--cache-dir', str(cache_dir), '--dry'], StringIO())
+    assert code == 0
+    assert len(FunctionCache(cache_dir / 'functions')) == 1
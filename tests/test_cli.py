@@ -1,7 +1,9 @@
-from io import StringIO
+from io import BytesIO, StringIO, TextIOWrapper
 from pathlib import Path
 from textwrap import dedent
 
+import pytest
+
 from infer_types import main
 
 
@@ -329,3 +331,108 @@ def test_allowed_types(tmp_path: Path):
     code = main([str(tmp_path), '--allowed-types', 'bool'], stream)
     assert code == 0
     assert source_file.read_text() == dedent(expected)
+
+
+def test_multiple_paths_and_exclude(tmp_path: Path):
+    # prepare files and dirs
+    source_dir1 = tmp_path / 'source1'
+    source_dir2 = tmp_path / 'source2'
+    generated_dir = source_dir2 / 'generated'
+    generated_dir.mkdir(parents=True)
+    source_dir1.mkdir()
+    source_file1 = source_dir1 / 'example.py'
+    source_file2 = source_dir2 / 'example.py'
+    generated_file = generated_dir / 'example.py'
+    ignored_file = source_dir2 / 'ignored.py'
+    for path in (source_file1, source_file2, generated_file, ignored_file):
+        path.write_text(dedent(GIVEN))
+    (source_dir2 / '.gitignore').write_text('ignored.py\n')
+
+    # call the CLI
+    stream = StringIO()
+    argv = [str(source_dir1), str(source_dir2), '--exclude', 'generated/']
+    code = main(argv, stream)
+    assert code == 0
+
+    # check modifications
+    assert source_file1.read_text() == dedent(EXPECTED)
+    assert source_file2.read_text() == dedent(EXPECTED)
+    assert generated_file.read_text() == dedent(GIVEN)
+    assert ignored_file.read_text() == dedent(GIVEN)
+
+
+def test_check(tmp_path: Path):
+    # prepare files and dirs
+    source_file1 = tmp_path / 'example1.py'
+    source_file2 = tmp_path / 'example2.py'
+    annotated_file = tmp_path / 'example3.py'
+    source_file1.write_text(dedent(GIVEN))
+    source_file2.write_text(dedent(GIVEN))
+    annotated_file.write_text(dedent(EXPECTED))
+
+    # call the CLI
+    stream = StringIO()
+    code = main([str(tmp_path), '--check'], stream)
+    assert code == 1
+    assert stream.getvalue().splitlines() == [str(source_file1), str(source_file2)]
+
+    # check that files are not modified
+    assert source_file1.read_text() == dedent(GIVEN)
+    assert source_file2.read_text() == dedent(GIVEN)
+
+    # stop on the first file
+    stream = StringIO()
+    code = main([str(tmp_path), '--check', '--fail-fast'], stream)
+    assert code == 1
+    assert stream.getvalue().splitlines() == [str(source_file1)]
+
+    # nothing to annotate
+    stream = StringIO()
+    code = main([str(annotated_file), '--check'], stream)
+    assert code == 0
+    assert stream.getvalue() == ''
+
+
+def test_stdin(tmp_path: Path, monkeypatch):
+    package = tmp_path / 'stdin_pkg'
+    package.mkdir()
+    (package / '__init__.py').touch()
+    (package / 'helper.py').write_text('def g():\n    return 13\n')
+    source_file = package / 'example.py'
+    source_file.write_text('saved on disk\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    buffer = BytesIO()
+    stream = TextIOWrapper(buffer, encoding='utf8')
+    stdin = BytesIO(b'from .helper import g\r\n\r\ndef f():\r\n    return g()\r\n')
+    argv = ['-', '--stdin-filename', str(source_file)]
+    code = main(argv, stream, stdin)
+    assert code == 0
+    expected = b'from .helper import g\r\n\r\ndef f() -> int:\r\n    return g()\r\n'
+    assert buffer.getvalue() == expected
+    assert source_file.read_text() == 'saved on disk\n'
+
+
+def test_stdin_skip_tests():
+    source = dedent(GIVEN).encode()
+    stream = StringIO()
+    code = main(['-', '--skip-tests'], stream, BytesIO(source))
+    assert code == 0
+    assert stream.getvalue() == dedent(EXPECTED)
+
+    stream = StringIO()
+    argv = ['-', '--skip-tests', '--stdin-filename', 'tests/test_example.py']
+    code = main(argv, stream, BytesIO(source))
+    assert code == 0
+    assert stream.getvalue() == dedent(GIVEN)
+
+
+@pytest.mark.parametrize('argv', [
+    ['-', 'example.py'],
+    ['-', '--check'],
+    ['-', '--stubs', 'stubs'],
+    ['example.py', '--stdin-filename', 'example.py'],
+])
+def test_stdin_bad_args(argv: list):
+    with pytest.raises(SystemExit):
+        main(argv, StringIO(), BytesIO())
@@ -0,0 +1,177 @@
+from pathlib import Path
+from textwrap import dedent
+
+import astroid
+import pytest
+
+from infer_types import _extractors
+from infer_types._dedup import get_fingerprint
+from infer_types._inferno import Inferno
+
+
+def _get_func(source: str, name: str = 'f') -> astroid.FunctionDef:
+    module = astroid.parse(dedent(source))
+    for node in module.nodes_of_class(astroid.FunctionDef):
+        if node.name == name:
+            return node
+    raise LookupError(name)
+
+
+BASE = """
+    import json
+    from .utils import helper
+
+    LIMIT = 10
+
+    def f(x):
+        return json.dumps(helper(x))[:LIMIT]
+"""
+
+
+@pytest.mark.parametrize('source', [
+    # formatting and comments
+    """
+        import json
+        from .utils import helper
+
+        LIMIT = 10
+
+        def f(x):
+            # dump it
+            return json.dumps(
+                helper(x),
+            )[:LIMIT]
+    """,
+    # unrelated definitions
+    """
+        import os
+        import json
+        from .utils import helper
+
+        def g():
+            return 1
+
+        LIMIT = 10
+
+        def f(x):
+            return json.dumps(helper(x))[:LIMIT]
+    """,
+])
+def test_same(source: str):
+    assert get_fingerprint(_get_func(source)) == get_fingerprint(_get_func(BASE))
+
+
+@pytest.mark.parametrize('source', [
+    BASE.replace('return', 'x = 1\n        return'),
+    BASE.replace('import json', 'import simplejson as json'),
+    BASE.replace('from .utils', 'from .other'),
+    BASE.replace('LIMIT = 10', 'LIMIT = None'),
+])
+def test_different(source: str):
+    assert get_fingerprint(_get_func(source)) != get_fingerprint(_get_func(BASE))
+
+
+METHOD = """
+    class A(Base):
+        x = 1
+
+        def f(self):
+            return self.x
+
+        def g(self):
+            return 1
+"""
+
+
+def test_methods():
+    changed = METHOD.replace('x = 1', 'x = ""')
+    # the method uses the class
+    assert get_fingerprint(_get_func(METHOD)) != get_fingerprint(_get_func(changed))
+    # the method doesn't use the class
+    method = _get_func(METHOD, 'g')
+    assert get_fingerprint(method) == get_fingerprint(_get_func(changed, 'g'))
+    assert get_fingerprint(method) != get_fingerprint(_get_func(
+        METHOD.replace('(Base)', '(Other)'), 'g',
+    ))
+    assert get_fingerprint(method) != get_fingerprint(_get_func(
+        METHOD.replace('class A', 'class B'), 'g',
+    ))
+
+
+def test_inferno(tmp_path: Path, monkeypatch):
+    calls = []
+
+    def extract(node):
+        calls.append(node.root().file)
+        return _extractors.UNKNOWN_TYPE
+
+    extractors = [_extractors.Extractor('spy', extract, priority=0)]
+    monkeypatch.setattr(_extractors, 'extractors', extractors + _extractors.extractors)
+    source = 'def f(x):\n    return len(x)\n'
+    paths = []
+    for name in ('a', 'b', 'c'):
+        path = tmp_path / name / 'helpers.py'
+        path.parent.mkdir()
+        path.write_text(source)
+        paths.append(path)
+
+    inferno = Inferno()
+    for path in paths:
+        assert inferno.transform(path) == source.replace('(x):', '(x) -> int:')
+    assert calls == [str(paths[0])]
+    assert inferno.stats.deduplicated == 2
+    assert inferno.stats.annotations == 3
+
+    calls.clear()
+    inferno = Inferno(dedup=False)
+    for path in paths:
+        inferno.transform(path)
+    assert len(calls) == 3
+    assert inferno.stats.deduplicated == 0
+
+
+API = """from .models import helper
+
+def make():
+    return helper()
+"""
+
+
+def test_relative_imports(tmp_path: Path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    paths = []
+    for package, value in [('dedup_pkga', '1'), ('dedup_pkgb', '"a"')]:
+        root = tmp_path / package
+        root.mkdir()
+        (root / '__init__.py').write_text('')
+        (root / 'models.py').write_text(f'def helper():\n    return {value}\n')
+        path = root / 'api.py'
+        path.write_text(API)
+        paths.append(path)
+    inferno = Inferno()
+    assert 'def make() -> int:' in inferno.transform(paths[0])
+    assert 'def make() -> str:' in inferno.transform(paths[1])
+    assert inferno.stats.deduplicated == 0
+
+
+def test_local_definitions(tmp_path: Path):
+    source = """
+        from json import dumps
+
+        def helper():
+            return dumps(1)
+
+        def f():
+            return helper()
+    """
+    funcs = []
+    for name in ('a', 'b'):
+        path = tmp_path / f'{name}.py'
+        path.write_text(dedent(source))
+        module = astroid.MANAGER.ast_from_file(str(path), modname=name)
+        funcs.append(module.body[-1])
+    # helper uses other names, so it is bound to its module
+    assert get_fingerprint(funcs[0]) != get_fingerprint(funcs[1])
+    # but imports are shared
+    helpers = [func.root().body[1] for func in funcs]
+    assert get_fingerprint(helpers[0]) == get_fingerprint(helpers[1])
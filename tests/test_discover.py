@@ -0,0 +1,123 @@
+from pathlib import Path
+
+import pytest
+
+from infer_types._discover import Finder, Rule
+
+
+def _make_tree(root: Path, paths: list) -> None:
+    for path in paths:
+        path = root / path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+
+
+def _find(finder: Finder, *roots: Path) -> list:
+    result = []
+    for path in finder.iter_files(roots):
+        result.append(path.relative_to(roots[0].parent).as_posix())
+    return result
+
+
+@pytest.mark.parametrize('pattern, path, is_dir, expected', [
+    ('*.py', 'a.py', False, True),
+    ('*.py', 'sub/a.py', False, True),
+    ('*.py', 'a.pyi', False, False),
+    ('build/', 'build', True, True),
+    ('build/', 'build', False, False),
+    ('/build', 'build', True, True),
+    ('/build', 'sub/build', True, False),
+    ('sub/*.py', 'sub/a.py', False, True),
+    ('sub/*.py', 'sub/x/a.py', False, False),
+    ('sub/**/*.py', 'sub/x/y/a.py', False, True),
+    ('sub/**/*.py', 'sub/a.py', False, True),
+    ('**/gen', 'a/b/gen', True, True),
+    ('sub/**', 'sub/x/y', True, True),
+    ('a?.py', 'ab.py', False, True),
+    ('a?.py', 'a/.py', False, False),
+    ('[ab].py', 'b.py', False, True),
+    ('[!ab].py', 'b.py', False, False),
+    ('[!ab].py', 'c.py', False, True),
+    ('[ab', '[ab', False, True),
+])
+def test_rule_matches(pattern: str, path: str, is_dir: bool, expected: bool):
+    rule = Rule.parse(pattern, '/root')
+    assert rule is not None
+    name = path.rsplit('/', maxsplit=1)[-1]
+    assert rule.matches(f'/root/{path}', name, is_dir) is expected
+
+
+@pytest.mark.parametrize('line', ['', '   ', '# comment', '/', '!'])
+def test_rule_parse_empty(line: str):
+    assert Rule.parse(line, '/root') is None
+
+
+def test_default_exclude(tmp_path: Path):
+    root = tmp_path / 'root'
+    _make_tree(root, [
+        'a.py',
+        'b.txt',
+        'pkg/c.py',
+        '.git/d.py',
+        '.venv/lib/e.py',
+        'node_modules/f.py',
+        'build/g.py',
+        'pkg.egg-info/h.py',
+        'pkg/__pycache__/i.py',
+    ])
+    assert _find(Finder(), root) == ['root/a.py', 'root/pkg/c.py']
+
+
+def test_gitignore(tmp_path: Path):
+    root = tmp_path / 'root'
+    _make_tree(root, [
+        'a.py',
+        'gen_a.py',
+        'gen_keep.py',
+        'out/b.py',
+        'sub/c.py',
+        'sub/d.py',
+        'sub/out/e.py',
+    ])
+    (root / '.gitignore').write_text('# generated\ngen_*.py\n!gen_keep.py\n/out/\n')
+    (root / 'sub' / '.gitignore').write_text('d.py\n')
+    expected = ['root/a.py', 'root/gen_keep.py', 'root/sub/c.py', 'root/sub/out/e.py']
+    assert _find(Finder(), root) == expected
+    assert len(_find(Finder(gitignore=False), root)) == 7
+
+
+def test_parent_gitignore(tmp_path: Path, monkeypatch):
+    repo = tmp_path / 'repo'
+    _make_tree(repo, [
+        'src/a.py',
+        'src/gen/b.py',
+        'src/c_tmp.py',
+        'src/pkg/d.py',
+        'src/pkg/gen/e.py',
+    ])
+    (repo / '.git').mkdir()
+    (repo / '.gitignore').write_text('/src/gen/\n*_tmp.py\n')
+    (repo / 'src' / '.gitignore').write_text('!c_tmp.py\n')
+    (repo / 'src' / 'pkg' / '.gitignore').write_text('d.py\n')
+    # the .gitignore outside of the repository is not read
+    (tmp_path / '.gitignore').write_text('a.py\n')
+    expected = ['src/a.py', 'src/c_tmp.py', 'src/pkg/gen/e.py']
+    assert _find(Finder(), repo / 'src') == expected
+    assert _find(Finder(), repo / 'src' / 'pkg') == ['pkg/gen/e.py']
+    monkeypatch.chdir(repo)
+    assert _find(Finder(), Path('src')) == expected
+    assert len(_find(Finder(gitignore=False), Path('src'))) == 5
+
+    # without a repository, only the walked directories are respected
+    (repo / '.git').rmdir()
+    assert len(_find(Finder(), repo / 'src')) == 4
+
+
+def test_exclude_and_multiple_roots(tmp_path: Path):
+    root1 = tmp_path / 'root1'
+    root2 = tmp_path / 'root2'
+    _make_tree(root1, ['a.py', 'skip/b.py'])
+    _make_tree(root2, ['c.py', 'skip/d.py', 'e.txt'])
+    finder = Finder(exclude=('/skip',))
+    expected = ['root1/a.py', 'root2/c.py', 'root2/e.txt']
+    assert _find(finder, root1, root2, root2 / 'e.txt') == expected
@@ -0,0 +1,262 @@
+from dataclasses import replace
+from importlib.metadata import EntryPoint
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+import astroid
+import pytest
+from astypes import Ass, Type
+
+from infer_types import _extractors, main
+from infer_types._extractors import Extractor, get_return_type
+
+
+SOURCE = """
+    import ast
+    from typing import overload
+
+    class A:
+        def __repr__(self):
+            pass
+        def __len__(self):
+            pass
+        def is_empty(self):
+            return self.x
+        def method(self):
+            yield 1
+
+    class B(object):
+        def __hash__(self):
+            pass
+        def method(self):
+            return None
+
+    class C(ast.NodeVisitor):
+        def visit(self, node):
+            pass
+        def generic_visit(self, node):
+            pass
+
+    class D:
+        @overload
+        def conv(self, x: int) -> int: ...
+        @overload
+        def conv(self, x: str) -> int: ...
+        def conv(self, x):
+            pass
+
+    def get_size(x):
+        return x
+
+    def f(x):
+        print(x)
+"""
+
+
+def _get_functions() -> list[astroid.FunctionDef]:
+    module = astroid.parse(dedent(SOURCE))
+    return list(module.nodes_of_class(astroid.FunctionDef))
+
+
+@pytest.mark.parametrize('func_name, expected', [
+    ('__repr__', True),
+    ('__hash__', True),
+    ('is_empty', False),
+    ('visit', True),
+    ('get_size', False),
+    ('conv', True),
+])
+def test_can_inherit(func_name: str, expected: bool) -> None:
+    for func in _get_functions():
+        if func.name == func_name:
+            assert _extractors._can_inherit(func) is expected
+
+
+@pytest.mark.parametrize('allowed_types', [
+    frozenset(),
+    frozenset({'int'}),
+    frozenset({'str'}),
+    frozenset({'bool'}),
+    frozenset({'None'}),
+    frozenset({'Iterator'}),
+    frozenset({'Any'}),
+])
+def test_same_result_without_checks(monkeypatch, allowed_types) -> None:
+    """Predicates and produced types must not change the inferred types.
+    """
+    def infer(func: astroid.FunctionDef):
+        result = get_return_type(func, frozenset(), allowed_types=allowed_types)
+        if result is None:
+            return None
+        if allowed_types and result.name not in allowed_types:
+            return None
+        return result.annotation
+
+    funcs = _get_functions()
+    expected = [infer(func) for func in funcs]
+    extractors = [
+        replace(extractor, applies=None, types=None)
+        for extractor in _extractors.extractors
+    ]
+    monkeypatch.setattr(_extractors, 'extractors', extractors)
+    actual = [infer(func) for func in funcs]
+    assert actual == expected
+
+
+def test_hopeless_extractors_are_skipped(monkeypatch) -> None:
+    calls: list[str] = []
+
+    def make_extractor(name, **kwargs):
+        def extract(func):
+            calls.append(name)
+            return _extractors.UNKNOWN_TYPE
+        return Extractor(name, extract, **kwargs)
+
+    monkeypatch.setattr(_extractors, 'extractors', [
+        make_extractor('first', types=frozenset({'str'})),
+        make_extractor('never', applies=lambda func: False),
+        make_extractor('any'),
+        make_extractor('int', types=frozenset({'int'})),
+        make_extractor('str', types=frozenset({'str'})),
+    ])
+    func = _get_functions()[0]
+    get_return_type(func, frozenset())
+    assert calls == ['first', 'any', 'int', 'str']
+
+    # the first extractor still runs: if it infers `str`, the result is `str`
+    calls.clear()
+    get_return_type(func, frozenset(), allowed_types=frozenset({'int'}))
+    assert calls == ['first', 'any', 'int']
+
+
+def test_order_by_priority_and_cost(monkeypatch) -> None:
+    def extract(func):
+        return _extractors.UNKNOWN_TYPE
+
+    monkeypatch.setattr(_extractors, 'extractors', [
+        Extractor('c', extract, priority=2, cost=1),
+        Extractor('a', extract, priority=1, cost=5),
+        Extractor('b', extract, priority=2, cost=.5),
+        Extractor('d', extract, priority=2, cost=1),
+    ])
+    names = [ext.name for ext in _extractors.get_extractors(frozenset())]
+    assert names == ['a', 'b', 'c', 'd']
+    names = [ext.name for ext in _extractors.get_extractors(frozenset({'c', 'a'}))]
+    assert names == ['a', 'c']
+
+
+def _extract_from_plugin(func_node):
+    if func_node.name.startswith('plugin_'):
+        return Type.new('float')
+    return _extractors.UNKNOWN_TYPE
+
+
+PLUGIN = Extractor('', _extract_from_plugin, priority=0, types=frozenset({'float'}))
+
+
+@pytest.fixture
+def plugin(monkeypatch):
+    entry_points = (
+        EntryPoint('floats', f'{__name__}:PLUGIN', _extractors.ENTRY_POINTS_GROUP),
+    )
+    monkeypatch.setattr(_extractors, '_get_entry_points', lambda: entry_points)
+    monkeypatch.setattr(_extractors, '_plugins', {})
+
+
+def test_plugin(tmp_path: Path, plugin) -> None:
+    assert 'floats' in _extractors.get_names()
+    assert _extractors._plugins == {}
+    path = tmp_path / 'example.py'
+    path.write_text(dedent("""
+        def plugin_f():
+            return 1
+
+        def f():
+            return 1
+    """))
+
+    # plugins are not loaded if not selected
+    stream = StringIO()
+    code = main([str(path), '--dry', '--only', 'astypes', '--profile'], stream)
+    assert code == 0
+    assert _extractors._plugins == {}
+    assert 'floats' not in stream.getvalue()
+
+    stream = StringIO()
+    code = main([str(path), '--profile'], stream)
+    assert code == 0
+    assert 'def plugin_f() -> float:' in path.read_text()
+    assert 'def f() -> int:' in path.read_text()
+    extractor = _extractors._plugins['floats']
+    assert extractor.name == 'floats'
+    assert extractor.plugin
+    lines = stream.getvalue().splitlines()
+    assert lines[1] == 'time spent in extractors:'
+    assert lines[3].split()[:3] == ['floats', '(plugin)', '2']
+    assert lines[4].split()[:2] == ['astypes', '1']
+
+
+def test_plugin_must_be_extractor(monkeypatch) -> None:
+    entry_points = (
+        EntryPoint('bad', f'{__name__}:_extract_from_plugin', 'infer_types.extractors'),
+    )
+    monkeypatch.setattr(_extractors, '_get_entry_points', lambda: entry_points)
+    monkeypatch.setattr(_extractors, '_plugins', {})
+    with pytest.raises(TypeError, match='plugin bad is not an Extractor'):
+        _extractors.get_extractors(frozenset())
+
+
+def test_plugin_cannot_shadow_builtin(monkeypatch, caplog) -> None:
+    entry_points = [
+        EntryPoint('astypes', f'{__name__}:PLUGIN', _extractors.ENTRY_POINTS_GROUP),
+    ]
+
+    class FakeEntryPoints(list):
+        def select(self, group):
+            assert group == _extractors.ENTRY_POINTS_GROUP
+            return self
+
+    fake = FakeEntryPoints(entry_points)
+    monkeypatch.setattr(_extractors, 'entry_points', lambda: fake)
+    _extractors._get_entry_points.cache_clear()
+    try:
+        assert _extractors._get_entry_points() == ()
+    finally:
+        _extractors._get_entry_points.cache_clear()
+    assert 'plugin astypes shadows a built-in extractor' in caplog.text
+
+
+def test_many_returns(monkeypatch) -> None:
+    branches = ''.join(
+        f'    if x == {i}:\n        return {value}\n'
+        for i, value in enumerate(['None', 'True', '1', 'y', "'s'"] * 100)
+    )
+    node = astroid.extract_node(f'def f(x, y):\n{branches}    return None\n')
+    calls = []
+    original = _extractors.get_type
+
+    def get_type(node):
+        calls.append(node)
+        return original(node)
+
+    monkeypatch.setattr(_extractors, '_const_types', {})
+    monkeypatch.setattr(_extractors, 'get_type', get_type)
+    result = _extractors._extract_astypes(node)
+    assert result.annotation == 'str | None | int | bool'
+    assert result.assumptions == {Ass.ALL_RETURNS_SAME}
+    # literals are inferred once for each Python type
+    assert len(calls) == 100 + 4
+
+
+def test_returns_merged_in_order() -> None:
+    node = astroid.extract_node("""
+        def f(x):
+            if x:
+                return 1.5
+            if x is None:
+                return 'a'
+            return 1
+    """)
+    result = _extractors._extract_astypes(node)
+    assert result.annotation == 'int | str | float'
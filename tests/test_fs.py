@@ -0,0 +1,173 @@
+import json
+import multiprocessing
+import os
+import time
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from infer_types import _typeshed, main
+from infer_types._fs import file_lock, write_atomic
+
+
+try:
+    fork = multiprocessing.get_context('fork')
+except ValueError:  # pragma: no cover
+    fork = None
+needs_fork = pytest.mark.skipif(fork is None, reason='fork is not available')
+
+
+def _run_in_processes(target, args_list) -> None:
+    assert fork is not None
+    processes = [fork.Process(target=target, args=args) for args in args_list]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+
+def test_write_atomic(tmp_path: Path):
+    path = tmp_path / 'a.py'
+    path.write_text('old')
+    path.chmod(0o751)
+    write_atomic(path, 'new')
+    assert path.read_text() == 'new'
+    assert path.stat().st_mode & 0o777 == 0o751
+    assert list(tmp_path.iterdir()) == [path]
+
+    write_atomic(tmp_path / 'b.py', 'new')
+    assert (tmp_path / 'b.py').read_text() == 'new'
+
+
+def test_write_atomic_failure(tmp_path: Path):
+    path = tmp_path / 'a.py'
+    path.write_text('old')
+    with pytest.raises(UnicodeEncodeError):
+        write_atomic(path, '\udc80')
+    assert path.read_text() == 'old'
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def _hold_lock(lock_path: Path, log_path: Path, name: str) -> None:
+    with file_lock(lock_path):
+        with log_path.open('a') as stream:
+            stream.write(f'{name} start\n')
+        time.sleep(.05)
+        with log_path.open('a') as stream:
+            stream.write(f'{name} end\n')
+
+
+@needs_fork
+def test_file_lock(tmp_path: Path):
+    lock_path = tmp_path / 'sub' / 'lock'
+    log_path = tmp_path / 'log'
+    _run_in_processes(_hold_lock, [(lock_path, log_path, str(i)) for i in range(4)])
+    lines = log_path.read_text().splitlines()
+    assert len(lines) == 8
+    # critical sections do not overlap
+    for start, end in zip(lines[::2], lines[1::2]):
+        assert start.split()[0] == end.split()[0]
+        assert start.endswith('start') and end.endswith('end')
+
+
+def _use_index(path: Path) -> None:
+    _typeshed.use_index(path)
+    _typeshed.reset_index()
+
+
+@needs_fork
+def test_concurrent_index_build(tmp_path: Path, monkeypatch):
+    log_path = tmp_path / 'builds'
+    original = _typeshed.build_index
+
+    def build_index(path, progress=None):
+        with log_path.open('a') as stream:
+            stream.write('build\n')
+        time.sleep(.05)
+        return original(path, modules=['json.encoder'])
+
+    monkeypatch.setattr(_typeshed, 'build_index', build_index)
+    index_path = tmp_path / 'typeshed.idx'
+    _run_in_processes(_use_index, [(index_path,)] * 4)
+    assert log_path.read_text() == 'build\n'
+    index = _typeshed.TypeshedIndex(index_path)
+    assert index.get('json.encoder', 'JSONEncoder', 'encode')
+    index.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        'builds', 'typeshed.idx', 'typeshed.idx.lock',
+    ]
+
+
+SOURCE = """
+    import json
+
+    class E{i}(json.JSONEncoder):
+        def encode(self, o):
+            return o
+
+    class D{i}(json.JSONDecoder):
+        def decode(self, s):
+            return s
+
+    def f{i}():
+        return {i}
+"""
+
+
+def _annotate(source_dir: Path, cache_dir: Path) -> None:
+    argv = [
+        str(source_dir), '--dry',
+        '--cache-dir', str(cache_dir),
+        '--snapshot', str(cache_dir / 'snapshot.json'),
+    ]
+    assert main(argv, StringIO()) == 0
+
+
+@needs_fork
+def test_concurrent_runs(tmp_path: Path):
+    cache_dir = tmp_path / 'cache'
+    source_dirs = []
+    for i in range(4):
+        source_dir = tmp_path / f'source{i}'
+        source_dir.mkdir()
+        (source_dir / f'example{i}.py').write_text(dedent(SOURCE.format(i=i)))
+        source_dirs.append(source_dir)
+    _run_in_processes(_annotate, [(path, cache_dir) for path in source_dirs * 2])
+
+    # no temporary files are left, all entries are complete
+    entries = list((cache_dir / 'functions').glob('*/*'))
+    assert len(entries) == 12
+    for path in entries:
+        assert path.suffix == '.json'
+        json.loads(path.read_text())
+    # snapshot updates from all processes are merged
+    snapshot = json.loads((cache_dir / 'snapshot.json').read_text())
+    assert set(snapshot['bases']) >= {'json.JSONEncoder', 'json.JSONDecoder'}
+    classes = snapshot['classes']
+    assert classes['json.encoder.JSONEncoder']['returns']['encode'] is not None
+    assert classes['json.decoder.JSONDecoder']['returns']['decode'] is not None
+    assert not list(cache_dir.glob('.*.tmp'))
+
+
+def test_write_atomic_symlink(tmp_path: Path):
+    real = tmp_path / 'real.py'
+    real.write_text('old')
+    link = tmp_path / 'link.py'
+    link.symlink_to(real)
+    write_atomic(link, 'new')
+    assert link.is_symlink()
+    assert real.read_text() == 'new'
+
+
+def test_write_atomic_unchanged(tmp_path: Path):
+    path = tmp_path / 'a.py'
+    path.write_text('same')
+    hardlink = tmp_path / 'b.py'
+    os.link(path, hardlink)
+    inode = path.stat().st_ino
+    write_atomic(path, 'same')
+    assert path.stat().st_ino == inode
+    assert path.stat().st_nlink == 2
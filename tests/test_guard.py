@@ -0,0 +1,146 @@
+import json
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from infer_types import main
+from infer_types._guard import Limits, SkippedFile
+from infer_types._inferno import Inferno
+
+
+SOURCE = b"""
+def f():
+    return 1
+
+class A:
+    async def g(self):
+        return 2
+"""
+
+HUMAN_COMMENT = b'# The API token is generated by the server, do not edit it by hand.\n'
+
+
+@pytest.mark.parametrize('limits, reason', [
+    (Limits(), None),
+    (Limits(max_bytes=len(SOURCE)), None),
+    (Limits(max_bytes=10), f'{len(SOURCE)} bytes, the limit is 10'),
+    (Limits(max_lines=8), None),
+    (Limits(max_lines=7), '8 lines, the limit is 7'),
+    (Limits(max_functions=2), None),
+    (Limits(max_functions=1), '2 functions, the limit is 1'),
+    (Limits(skip_generated=True), None),
+])
+def test_limits(limits: Limits, reason):
+    assert limits.get_reason(Path('example.py'), SOURCE) == reason
+
+
+@pytest.mark.parametrize('name, source, reason', [
+    ('example_pb2.py', SOURCE, 'generated file name'),
+    ('example_pb2_grpc.py', SOURCE, 'generated file name'),
+    ('pb2.py', SOURCE, None),
+    (
+        'example.py',
+        b'# Generated by the protocol buffer compiler.  DO NOT EDIT!\n' + SOURCE,
+        'generated file marker "do not edit"',
+    ),
+    (
+        'example.py',
+        b'#!/usr/bin/env python\n\n# Code generated by tool. DO NOT EDIT.\n' + SOURCE,
+        'generated file marker "do not edit"',
+    ),
+    (
+        'example.py',
+        b'"""Module docs.\n\n@generated\n"""\n' + SOURCE,
+        'generated file marker "@generated"',
+    ),
+    ('example.py', b'# This file is autogenerated\n' + SOURCE, None),
+    ('example.py', HUMAN_COMMENT + SOURCE, None),
+    ('example.py', b'import os\n# DO NOT EDIT\n' + SOURCE, None),
+    (
+        'example.py',
+        b'"""Values generated by the RNG, do not edit.\n"""\n' + SOURCE,
+        None,
+    ),
+    ('example.py', b'\n' * 4096 + b'# @generated\n' + SOURCE, None),
+    ('example.py', SOURCE + b'x = [' + b'1, ' * 1000 + b']\n', 'minified code'),
+    ('example.py', SOURCE * 40 + b"BLOB = '" + b'a' * 2100 + b"'\n", None),
+])
+def test_generated(name: str, source: bytes, reason):
+    limits = Limits(skip_generated=True)
+    assert limits.get_reason(Path(name), source) == reason
+
+
+@pytest.mark.parametrize('source, reason', [
+    (b'# This file is autogenerated\n', 'generated file marker "autogenerated"'),
+    (HUMAN_COMMENT, 'generated file marker "generated by"'),
+    (b'import os\n# DO NOT EDIT\n', 'generated file marker "do not edit"'),
+    (b'"""Values generated by the RNG, do not edit.\n"""\n', None),
+])
+def test_generated_loose(source: bytes, reason):
+    limits = Limits(skip_generated=True, loose_markers=True)
+    assert limits.get_reason(Path('example.py'), source + SOURCE) == reason
+
+
+def test_inferno_skips(tmp_path: Path):
+    path = tmp_path / 'example.py'
+    path.write_bytes(SOURCE)
+    inferno = Inferno(limits=Limits(max_lines=3))
+    with pytest.raises(SkippedFile):
+        inferno.rewrite(path)
+    with pytest.raises(SkippedFile):
+        inferno.make_stub(path)
+    assert inferno.stats.skipped == {path: '8 lines, the limit is 3'}
+    assert inferno.stats.files == 0
+    assert inferno.stats.parses == {}
+
+
+def test_cli(tmp_path: Path):
+    given = dedent("""
+        def f(x):
+            return len(x)
+    """)
+    example = tmp_path / 'example.py'
+    example.write_text(given)
+    generated = tmp_path / 'example_pb2.py'
+    generated.write_text(given)
+    big = tmp_path / 'big.py'
+    big.write_text(given * 3)
+
+    stream = StringIO()
+    report_path = tmp_path / 'report.json'
+    argv = [str(tmp_path), '--max-file-functions', '2', '--report', str(report_path)]
+    code = main(argv, stream)
+    assert code == 0
+    assert stream.getvalue().splitlines() == [
+        str(example),
+        'skipped 2 files:',
+        f'  {big}: 3 functions, the limit is 2',
+        f'  {generated}: generated file name',
+    ]
+    assert 'def f(x) -> int:' in example.read_text()
+    assert big.read_text() == given * 3
+    assert generated.read_text() == given
+    report = json.loads(report_path.read_text())
+    assert report['totals']['skipped'] == 2
+    assert report['skipped'] == [
+        dict(path=str(big), reason='3 functions, the limit is 2'),
+        dict(path=str(generated), reason='generated file name'),
+    ]
+
+    manual = tmp_path / 'manual.py'
+    manual.write_text('# generated by hand\n' + given)
+    stream = StringIO()
+    code = main([str(manual), '--dry'], stream)
+    assert code == 0
+    assert stream.getvalue() == f'{manual}\n'
+    stream = StringIO()
+    code = main([str(manual), '--dry', '--loose-generated-markers'], stream)
+    assert code == 0
+    assert stream.getvalue().splitlines()[0] == 'skipped 1 files:'
+
+    stream = StringIO()
+    code = main([str(generated), '--include-generated', '--dry'], stream)
+    assert code == 0
+    assert stream.getvalue() == f'{generated}\n'
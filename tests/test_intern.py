@@ -0,0 +1,104 @@
+import pytest
+from astypes import Ass, Type
+
+from infer_types import _intern
+from infer_types._intern import get_key, intern, merge, new_type, union
+
+
+def test_intern():
+    a = Type.new('list', args=[Type.new('int')])
+    b = Type.new('list', args=[Type.new('int')])
+    assert a is not b
+    assert intern(a) is intern(b)
+    assert intern(a) is new_type('list', args=[new_type('int')])
+    assert intern(Type.new('list')) is not intern(a)
+    assert new_type('int', ass={Ass.NO_SHADOWING}) is not new_type('int')
+    assert new_type('int', module='x') is not new_type('int')
+
+
+def test_get_key():
+    a = Type.new('dict', args=[Type.new('str'), Type.new('int')])
+    b = Type.new('dict', args=[Type.new('int'), Type.new('str')])
+    assert get_key(a) == get_key(intern(a))
+    assert get_key(a) != get_key(b)
+    assert hash(get_key(a))
+
+
+def test_merge():
+    int_type = new_type('int')
+    none_type = new_type('None')
+    result = merge(int_type, none_type)
+    assert result == int_type.merge(none_type)
+    assert result.annotation == 'int | None'
+    assert merge(Type.new('int'), Type.new('None')) is result
+    assert merge(result, int_type) is result
+    assert merge(none_type, new_type('')) is none_type
+
+
+@pytest.mark.parametrize('names, expected', [
+    ([], ''),
+    (['', ''], ''),
+    (['int', 'int', ''], 'int'),
+    (['None', 'int', 'str', 'int', 'None'], 'int | None | str'),
+    (['int', 'str', 'float'], 'int | str | float'),
+    (['float', 'str', 'int'], 'float | str'),
+    (['int', 'float', 'int'], 'float'),
+    (['int', 'Any', 'str'], 'Any'),
+    (['str', 'object', 'Any'], 'object'),
+])
+def test_union(names: list, expected: str):
+    values = [Type.new(name) for name in names]
+    assert union(values).annotation == (expected or 'Any')
+    assert union(values).unknown == (not expected)
+
+
+@pytest.mark.parametrize('names', [
+    ['int', 'str', 'float', 'None'],
+    ['None', 'bytes', 'int | str', 'float'],
+    ['int | str', 'bytes', 'int | str', 'str | int'],
+    ['int | None', 'str | float', 'Any', 'str'],
+    ['str', 'int | object', 'bytes'],
+    ['list[int]', 'int', 'list[int]', 'list[str]'],
+])
+def test_union_same_as_merge(names: list):
+    values = [_parse(name) for name in names]
+    expected = Type.new('')
+    for value in values:
+        expected = expected.merge(value)
+    assert union(values) is intern(expected)
+
+
+def _parse(annotation: str) -> Type:
+    result = Type.new('')
+    for name in annotation.split(' | '):
+        if name.startswith('list['):
+            value = Type.new('list', args=[Type.new(name[5:-1])])
+        else:
+            value = Type.new(name)
+        result = result.merge(value)
+    return result
+
+
+def test_union_assumptions():
+    int_type = new_type('int')
+    assert union([int_type]) is int_type
+    same = Ass.ALL_RETURNS_SAME
+    result = union([int_type, int_type.add_ass(Ass.NO_SHADOWING)], ass=[same])
+    assert result.annotation == 'int'
+    assert result.assumptions == {same}
+    result = union([int_type, new_type('str')], ass=[same])
+    assert result.assumptions == {same}
+    assert union([new_type('')], ass=[same]).unknown
+
+
+def test_max_size(monkeypatch):
+    monkeypatch.setattr(_intern, 'MAX_SIZE', 0)
+    monkeypatch.setattr(_intern, '_interned', {})
+    monkeypatch.setattr(_intern, '_keys', {})
+    monkeypatch.setattr(_intern, '_merged', {})
+    a = Type.new('int')
+    assert intern(a) is a
+    assert intern(Type.new('int')) is not a
+    assert merge(a, Type.new('str')).annotation == 'int | str'
+    assert _intern._merged == {}
+    _intern.clear()
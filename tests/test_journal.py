@@ -0,0 +1,84 @@
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+from infer_types import main
+from infer_types._journal import Journal, get_digest
+
+
+GIVEN = """
+    def f(x):
+        return len(x)
+"""
+
+
+def test_journal(tmp_path: Path):
+    journal_path = tmp_path / 'journal'
+    path1 = tmp_path / 'a.py'
+    path2 = tmp_path / 'b.py'
+    path1.write_text('a = 1')
+    path2.write_text('b = 1')
+
+    journal = Journal.open(journal_path, resume=False)
+    assert not journal.is_done(path1)
+    journal.record(path1, b'a = 1')
+    journal.record(path2, b'b = 1')
+    assert journal.is_done(path1)
+    journal.close()
+    journal.close()
+
+    # simulate the process killed when writing a record
+    with journal_path.open('a') as stream:
+        stream.write('0123')
+    path2.write_text('b = 2')
+    journal = Journal.open(journal_path, resume=True)
+    assert journal.is_done(path1)
+    assert not journal.is_done(path2)
+    journal.close()
+
+    journal = Journal.open(journal_path, resume=False)
+    assert not journal.is_done(path1)
+    journal.close()
+    assert journal_path.read_text() == ''
+
+
+def test_resume(tmp_path: Path):
+    source_dir = tmp_path / 'source'
+    source_dir.mkdir()
+    paths = []
+    for name in ('a', 'b', 'c'):
+        path = source_dir / f'{name}.py'
+        path.write_text(dedent(GIVEN))
+        paths.append(path)
+    journal_path = tmp_path / 'journal'
+
+    stream = StringIO()
+    code = main([str(source_dir), '--journal', str(journal_path)], stream)
+    assert code == 0
+    assert len(stream.getvalue().splitlines()) == 3
+    assert len(journal_path.read_text().splitlines()) == 3
+    digest = get_digest(paths[0].read_bytes())
+    assert f'{digest} {paths[0]}\n' in journal_path.read_text()
+
+    # modified and new files are processed again
+    paths[1].write_text(dedent(GIVEN))
+    (source_dir / 'd.py').write_text(dedent(GIVEN))
+    stream = StringIO()
+    argv = [str(source_dir), '--journal', str(journal_path), '--resume', '--dry']
+    code = main(argv, stream)
+    assert code == 0
+    expected = [str(paths[1]), str(source_dir / 'd.py')]
+    assert stream.getvalue().splitlines() == expected
+    # dry runs are not recorded
+    assert len(journal_path.read_text().splitlines()) == 3
+
+    stream = StringIO()
+    code = main(argv[:-1], stream)
+    assert code == 0
+    assert stream.getvalue().splitlines() == expected
+    assert len(journal_path.read_text().splitlines()) == 5
+
+    stream = StringIO()
+    code = main(argv, stream)
+    assert code == 0
+    assert stream.getvalue() == ''
@@ -0,0 +1,94 @@
+from pathlib import Path
+from textwrap import dedent
+
+import astroid
+import pytest
+
+from infer_types._inferno import Inferno
+from infer_types._modules import get_module_name, parse_module
+
+
+@pytest.fixture
+def package(tmp_path: Path) -> Path:
+    pkg = tmp_path / 'src' / 'itpkg'
+    (pkg / 'sub').mkdir(parents=True)
+    (pkg / '__init__.py').write_text('')
+    (pkg / 'sub' / '__init__.py').write_text('')
+    (pkg / 'sub' / 'base.py').write_text(dedent("""
+        class Base:
+            def get(self) -> str:
+                return ''
+    """))
+    (pkg / 'own.py').write_text(dedent("""
+        class X:
+            pass
+
+        class A:
+            def f(self):
+                return X()
+
+        def make():
+            return X()
+    """))
+    (pkg / 'child.py').write_text(dedent("""
+        from itpkg.sub.base import Base
+
+        class Child(Base):
+            def get(self):
+                return self.x
+    """))
+    yield pkg
+    for name in ('itpkg', 'itpkg.sub', 'itpkg.sub.base', 'itpkg.child', 'itpkg.own'):
+        astroid.MANAGER.astroid_cache.pop(name, None)
+
+
+def test_get_module_name(package: Path):
+    src = package.parent
+    assert get_module_name(package / 'child.py') == 'itpkg.child'
+    assert get_module_name(package / 'sub' / 'base.py') == 'itpkg.sub.base'
+    assert get_module_name(package / '__init__.py') == 'itpkg'
+    assert get_module_name(package / 'sub' / '__init__.py') == 'itpkg.sub'
+    assert get_module_name(src / 'script.py') is None
+    assert get_module_name(src / 'script.py', src) == 'script'
+    assert get_module_name(package / 'child.py', src) == 'itpkg.child'
+    assert get_module_name(package / '__init__.py', src) == 'itpkg'
+    assert get_module_name(src / '__init__.py', src) is None
+    assert get_module_name(src / 'my-script.py', src) is None
+    assert get_module_name(package / 'child.py', src / 'other') is None
+
+
+def test_parse_module(package: Path):
+    path = package / 'sub' / 'base.py'
+    source = path.read_text()
+    module, reused = parse_module(source, path)
+    assert not reused
+    assert module.name == 'itpkg.sub.base'
+    assert astroid.MANAGER.astroid_cache['itpkg.sub.base'] is module
+    assert parse_module(source, path) == (module, True)
+
+    script = package.parent / 'script.py'
+    script.write_text(source)
+    module, reused = parse_module(source, script)
+    assert not reused
+    assert module.name == ''
+
+
+def test_no_double_parsing(package: Path, monkeypatch):
+    monkeypatch.syspath_prepend(str(package.parent))
+    inferno = Inferno()
+    result = inferno.transform(package / 'child.py')
+    assert 'def get(self) -> str:' in result
+    assert inferno.transform(package / 'sub' / 'base.py')
+    assert inferno.stats.reused == 1
+    assert inferno.stats.parses[str(package / 'child.py')] == 1
+    assert inferno.stats.parses[str(package / 'sub' / 'base.py')] == 1
+    assert inferno.stats.duplicate_parses == {}
+
+
+def test_no_import_from_itself(package: Path, monkeypatch):
+    monkeypatch.syspath_prepend(str(package.parent))
+    path = package / 'own.py'
+    result = Inferno().transform(path)
+    expected = path.read_text().replace('f(self):', 'f(self) -> X:')
+    assert result == expected.replace('make():', 'make() -> X:')
+    assert 'import' not in Inferno().make_stub(path)
@@ -0,0 +1,77 @@
+from textwrap import dedent
+
+import astroid
+
+from infer_types import _mro
+
+
+SOURCE = """
+    class A:
+        def f(self) -> int:
+            return 1
+
+    class B(A):
+        def g(self):
+            pass
+
+    class C(A):
+        def f(self) -> str:
+            return ''
+
+    class D(B, C):
+        def f(self):
+            pass
+
+    class E(D):
+        pass
+"""
+
+
+def test_same_as_astroid():
+    module = astroid.parse(dedent(SOURCE))
+    for cls_node in module.body:
+        info = _mro.get_class_info(cls_node)
+        assert list(info.ancestors) == list(cls_node.ancestors())
+        for name in ('f', 'g', '__init__'):
+            expected = []
+            if name in cls_node.locals or any(name in a.locals for a in info.ancestors):
+                expected = cls_node.getattr(name, class_context=False)
+            assert info.members.get(name, []) == expected
+
+
+def test_ancestors_resolved_once(monkeypatch):
+    module = astroid.parse(dedent(SOURCE))
+    calls = []
+    ancestors = astroid.ClassDef.ancestors
+
+    def counted(self, recurs=True, context=None):
+        calls.append(self.name)
+        return ancestors(self, recurs=recurs, context=context)
+
+    monkeypatch.setattr(astroid.ClassDef, 'ancestors', counted)
+    for cls_node in reversed(module.body):
+        _mro.get_class_info(cls_node)
+        _mro.get_class_info(cls_node)
+    assert sorted(set(calls)) == sorted(calls)
+    assert {'A', 'B', 'C', 'D', 'E'} <= set(calls)
+
+
+def test_inheritance_cycle():
+    module = astroid.parse(dedent("""
+        class A(B):
+            pass
+
+        class B(A):
+            pass
+    """))
+    for cls_node in module.body:
+        info = _mro.get_class_info(cls_node)
+        assert list(info.ancestors) == list(cls_node.ancestors())
+
+
+def test_clear_cache():
+    module = astroid.parse(dedent(SOURCE))
+    info = _mro.get_class_info(module.body[0])
+    assert _mro.get_class_info(module.body[0]) is info
+    _mro.clear_cache()
+    assert _mro.get_class_info(module.body[0]) is not info
@@ -0,0 +1,146 @@
+import json
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from infer_types import _extractors, main
+from infer_types._extractors import Extractor
+from infer_types._inferno import Inferno
+from infer_types._report import merge_reports, parse_shard, select_shard
+
+
+GIVEN = """
+    def f(x):
+        return len(x)
+"""
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1/1', (1, 1)),
+    ('2/3', (2, 3)),
+    ('10/10', (10, 10)),
+])
+def test_parse_shard(value, expected):
+    assert parse_shard(value) == expected
+
+
+@pytest.mark.parametrize('value', ['', '1', '1/', '/2', '0/2', '3/2', 'a/b', '-1/2'])
+def test_parse_shard_invalid(value):
+    with pytest.raises(ValueError):
+        parse_shard(value)
+
+
+def test_select_shard(tmp_path: Path):
+    sizes = dict(a=100, b=60, c=50, d=10, e=10)
+    paths = []
+    for name, size in sizes.items():
+        path = tmp_path / f'{name}.py'
+        path.write_text('x' * size)
+        paths.append(path)
+    shard1 = select_shard(paths, 1, 2)
+    shard2 = select_shard(reversed(paths), 2, 2)
+    assert [p.stem for p in shard1] == ['a', 'd', 'e']
+    assert [p.stem for p in shard2] == ['b', 'c']
+    assert select_shard(paths, 1, 1) == sorted(paths)
+
+
+def _failing_extractor(func_node):
+    if func_node.name == 'boom':
+        raise ZeroDivisionError
+    return _extractors.UNKNOWN_TYPE
+
+
+FAILING = Extractor('fail', _failing_extractor, priority=0)
+
+
+def test_sharded_run_and_merge(tmp_path: Path, monkeypatch):
+    extractors = [FAILING] + _extractors.extractors
+    monkeypatch.setattr(_extractors, 'extractors', extractors)
+    source_dir = tmp_path / 'source'
+    source_dir.mkdir()
+    for i in range(4):
+        (source_dir / f'example{i}.py').write_text(dedent(GIVEN) * (i + 1))
+    (source_dir / 'broken.py').write_text('def boom():\n    return 1\n')
+
+    report_paths = []
+    annotated = 0
+    for shard in ('1/2', '2/2'):
+        report_path = tmp_path / f'report{shard[0]}.json'
+        report_paths.append(report_path)
+        stream = StringIO()
+        argv = [str(source_dir), '--dry', '--shard', shard, '--report', str(report_path)]
+        code = main(argv, stream)
+        assert code == 0
+        annotated += stream.getvalue().count('.py\n')
+        report = json.loads(report_path.read_text())
+        assert report['shard'] == shard
+    assert annotated == 5
+
+    merged = merge_reports(report_paths)
+    assert merged['shard'] == '1/2,2/2'
+    assert merged['totals'] == dict(
+        files=5,
+        annotations=10,
+        failures=1,
+        budget_hits=0,
+        parses=5,
+        duplicate_parses=0,
+        skipped=0,
+        deduplicated=8,
+    )
+    broken = str(source_dir / 'broken.py')
+    origin = f'tests.test_report:{_failing_extractor.__code__.co_firstlineno + 2}'
+    assert merged['failures'] == [dict(
+        path=broken,
+        lineno=1,
+        error='',
+        error_type='ZeroDivisionError',
+        origin=origin,
+    )]
+    assert merged['failure_groups'] == [dict(
+        error_type='ZeroDivisionError',
+        origin=origin,
+        count=1,
+        example=f'{broken}:1',
+    )]
+
+    stream = StringIO()
+    output = tmp_path / 'merged.json'
+    code = main(['merge', *map(str, report_paths), '--output', str(output)], stream)
+    assert code == 0
+    assert json.loads(output.read_text()) == merged
+
+    stream = StringIO()
+    code = main(['merge', *map(str, report_paths)], stream)
+    assert code == 0
+    assert json.loads(stream.getvalue()) == merged
+
+
+@pytest.mark.parametrize('rate, logged', [(1, 10), (.5, 5), (.2, 2), (0, 0)])
+def test_traceback_rate(tmp_path: Path, monkeypatch, caplog, rate, logged):
+    extractors = [FAILING] + _extractors.extractors
+    monkeypatch.setattr(_extractors, 'extractors', extractors)
+    path = tmp_path / 'example.py'
+    path.write_text('def boom():\n    pass\n' * 10)
+    inferno = Inferno(safe=True, traceback_rate=rate)
+    with caplog.at_level('DEBUG', logger='infer_types'):
+        inferno.transform(path)
+    assert len(inferno.stats.failures) == 10
+    assert len([r for r in caplog.records if r.exc_info]) == logged
+    assert len(caplog.records) == 10
+    assert list(inferno.stats.failure_groups.values()) == [10]
+
+
+def test_failures_summary(tmp_path: Path, monkeypatch):
+    extractors = [FAILING] + _extractors.extractors
+    monkeypatch.setattr(_extractors, 'extractors', extractors)
+    (tmp_path / 'example.py').write_text('def boom():\n    pass\n' * 3)
+    stream = StringIO()
+    code = main([str(tmp_path), '--dry', '--traceback-rate', '0'], stream)
+    assert code == 0
+    lines = stream.getvalue().splitlines()
+    assert lines[1] == 'inference failed 3 times, 1 unique errors:'
+    origin = f'tests.test_report:{_failing_extractor.__code__.co_firstlineno + 2}'
+    assert lines[3].split() == ['3', 'ZeroDivisionError', origin]
@@ -0,0 +1,82 @@
+import re
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from infer_types._inferno import Inferno
+from infer_types._scope import Scope
+
+
+@pytest.fixture
+def package(tmp_path: Path, monkeypatch) -> str:
+    """Create a unique package: `a` imports `b` which imports `c`.
+    """
+    name = 'pkg_' + re.sub(r'\W', '_', tmp_path.name)
+    root = tmp_path / name
+    root.mkdir()
+    (root / '__init__.py').touch()
+    (root / 'a.py').write_text(dedent(f"""
+        from {name} import b
+
+        def f():
+            return b.g()
+
+        def h():
+            return b.i()
+    """))
+    (root / 'b.py').write_text(dedent(f"""
+        from {name} import c
+
+        def g():
+            return 1
+
+        def i():
+            return c.j()
+    """))
+    (root / 'c.py').write_text(dedent("""
+        def j():
+            return ''
+    """))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    return name
+
+
+def _annotations(package: str, tmp_path: Path, scope: Scope) -> list[str]:
+    inferno = Inferno(scope=scope, only=frozenset({'astypes'}))
+    result = inferno.transform(tmp_path / package / 'a.py')
+    return re.findall(r'def (\w+)\(\) -> (\w+)', result)
+
+
+def test_no_limits(package: str, tmp_path: Path):
+    result = _annotations(package, tmp_path, Scope())
+    assert result == [('f', 'int'), ('h', 'str')]
+
+
+def test_max_depth(package: str, tmp_path: Path):
+    result = _annotations(package, tmp_path, Scope(max_depth=1))
+    assert result == [('f', 'int')]
+
+
+def test_deny(package: str, tmp_path: Path):
+    result = _annotations(package, tmp_path, Scope(deny=(f'{package}.c',)))
+    assert result == [('f', 'int')]
+
+
+def test_allow(package: str, tmp_path: Path):
+    result = _annotations(package, tmp_path, Scope(allow=('builtins',)))
+    assert result == []
+
+
+@pytest.mark.parametrize('scope, mod_name, expected', [
+    (Scope(), 'django.db', True),
+    (Scope(deny=('django',)), 'django.db', False),
+    (Scope(deny=('django',)), 'django', False),
+    (Scope(deny=('django',)), 'djangorestframework', True),
+    (Scope(allow=('app',)), 'django', False),
+    (Scope(allow=('app',)), 'app.models', True),
+    (Scope(allow=('app',), deny=('app.models',)), 'app.models', False),
+    (Scope(allow=('app',)), 'builtins', True),
+])
+def test_allows(scope: Scope, mod_name: str, expected: bool):
+    assert scope.allows(mod_name) is expected
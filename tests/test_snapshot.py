@@ -0,0 +1,156 @@
+import json
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+import astroid
+import pytest
+
+from infer_types import _extractors, main
+from infer_types._snapshot import Snapshot, _get_import_name
+
+
+GIVEN = """
+    import json
+    from json import encoder as enc
+
+    class A(json.JSONEncoder):
+        def encode(self, o):
+            return o
+
+    class B(enc.JSONEncoder):
+        def iterencode(self, o):
+            return o
+
+    class C:
+        def __repr__(self):
+            return self.x
+
+    class D(A):
+        def encode(self, o):
+            return o
+"""
+
+EXPECTED = """
+    import json
+    from json import encoder as enc
+
+    class A(json.JSONEncoder):
+        def encode(self, o) -> str:
+            return o
+
+    class B(enc.JSONEncoder):
+        def iterencode(self, o) -> Iterator[str]:
+            return o
+
+    class C:
+        def __repr__(self) -> str:
+            return self.x
+
+    class D(A):
+        def encode(self, o) -> str:
+            return o
+"""
+
+
+def _run(tmp_path: Path, snapshot_path: Path) -> str:
+    path = tmp_path / 'example.py'
+    path.write_text(dedent(GIVEN))
+    args = ['--only', 'inherit', '--no-imports', '--snapshot', str(snapshot_path)]
+    code = main([str(path), *args], StringIO())
+    assert code == 0
+    return path.read_text()
+
+
+def test_snapshot(tmp_path: Path, monkeypatch):
+    snapshot_path = tmp_path / 'snapshot.json'
+    expected = dedent(EXPECTED).replace(' -> Iterator[str]', '')
+    assert _run(tmp_path, snapshot_path) == expected
+    data = json.loads(snapshot_path.read_text())
+    assert data['bases'] == {
+        'builtins.object': 'builtins.object',
+        'json.JSONEncoder': 'json.encoder.JSONEncoder',
+        'json.encoder.JSONEncoder': 'json.encoder.JSONEncoder',
+    }
+    returns = data['classes']['json.encoder.JSONEncoder']['returns']
+    assert returns['encode']['name'] == 'str'
+    assert returns['iterencode']['name'] == 'Iterator'
+    assert 'default' not in returns
+
+    # the second run resolves only local classes
+    mtime = snapshot_path.stat().st_mtime_ns
+    calls = []
+
+    def get_class_info(cls_node):
+        calls.append(cls_node.name)
+        return original(cls_node)
+
+    original = _extractors.get_class_info
+    monkeypatch.setattr(_extractors, 'get_class_info', get_class_info)
+    assert _run(tmp_path, snapshot_path) == expected
+    assert calls == ['D']
+    # the snapshot is not written if nothing has changed
+    assert snapshot_path.stat().st_mtime_ns == mtime
+
+
+def test_snapshot_invalidation(tmp_path: Path, monkeypatch):
+    snapshot_path = tmp_path / 'snapshot.json'
+    _run(tmp_path, snapshot_path)
+    data = json.loads(snapshot_path.read_text())
+    data['modules']['json.encoder']['mtime'] = 1
+    data['classes']['json.encoder.JSONEncoder']['returns']['encode'] = None
+    snapshot_path.write_text(json.dumps(data))
+
+    calls = []
+    original = _extractors.get_class_info
+
+    def get_class_info(cls_node):
+        calls.append(cls_node.name)
+        return original(cls_node)
+
+    monkeypatch.setattr(_extractors, 'get_class_info', get_class_info)
+    expected = dedent(EXPECTED).replace(' -> Iterator[str]', '')
+    assert _run(tmp_path, snapshot_path) == expected
+    assert 'A' in calls
+    data = json.loads(snapshot_path.read_text())
+    assert data['modules']['json.encoder']['mtime'] != 1
+    encode = data['classes']['json.encoder.JSONEncoder']['returns']['encode']
+    assert encode['name'] == 'str'
+
+
+def test_broken_snapshot(tmp_path: Path):
+    path = tmp_path / 'snapshot.json'
+    path.write_text('{')
+    snapshot = Snapshot(path)
+    assert not snapshot.changed
+    path.write_text(json.dumps(dict(version=0)))
+    snapshot = Snapshot(path)
+    snapshot.save()
+    assert json.loads(path.read_text()) == dict(version=0)
+
+
+@pytest.mark.parametrize('base, expected', [
+    ('json.JSONEncoder', 'json.JSONEncoder'),
+    ('JSONEncoder', 'json.JSONEncoder'),
+    ('E', 'json.JSONEncoder'),
+    ('j.JSONEncoder', 'json.JSONEncoder'),
+    ('os.path.X', 'os.path.X'),
+    ('dict', 'builtins.dict'),
+    ('Local', None),
+    ('Rel', None),
+    ('Unknown', None),
+    ('f().x', None),
+])
+def test_get_import_name(base, expected):
+    module = astroid.parse(dedent(f"""
+        import json
+        import json as j
+        import os.path
+        from json import JSONEncoder
+        from json import JSONEncoder as E
+        from .rel import Rel
+        class Local: pass
+        class A({base}): pass
+    """))
+    cls_node = module.body[-1]
+    assert _get_import_name(cls_node.bases[0]) == expected
@@ -0,0 +1,119 @@
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from infer_types import main
+from infer_types._stubs import get_stub_path
+
+
+GIVEN = """
+    from __future__ import annotations
+    import os
+    from typing import List
+
+    X = 1
+    Y: int = 2
+
+    def f(x, y=3):
+        return len(x)
+
+    def g():
+        yield 1
+
+    def h(a: int) -> str:
+        return str(a)
+
+    def unknown(a):
+        return a
+
+    @decorator
+    class A(os.PathLike, metaclass=Meta):
+        z = 3
+
+        @property
+        def p(self):
+            return 1
+
+        def created_at(self):
+            return self.x
+
+    class B:
+        pass
+"""
+
+EXPECTED = """
+    import os
+    from datetime import datetime
+    from typing import Any, Iterator, List
+
+    X: Any
+    Y: int
+    def f(x, y=3) -> int: ...
+    def g() -> Iterator: ...
+    def h(a: int) -> str: ...
+    def unknown(a): ...
+
+    @decorator
+    class A(os.PathLike, metaclass=Meta):
+        z: Any
+        @property
+        def p(self) -> int: ...
+        def created_at(self) -> datetime: ...
+
+    class B: ...
+"""
+
+
+def test_stubs(tmp_path: Path):
+    source_dir = tmp_path / 'source'
+    (source_dir / 'pkg').mkdir(parents=True)
+    source_path = source_dir / 'pkg' / 'example.py'
+    source_path.write_text(dedent(GIVEN))
+    stubs_dir = tmp_path / 'stubs'
+    stub_path = stubs_dir / 'pkg' / 'example.pyi'
+
+    stream = StringIO()
+    code = main([str(source_dir), '--stubs', str(stubs_dir)], stream)
+    assert code == 0
+    assert stream.getvalue() == f'{stub_path}\n'
+    assert stub_path.read_text() == dedent(EXPECTED).lstrip()
+    # the source file is not modified
+    assert source_path.read_text() == dedent(GIVEN)
+
+    # stubs that did not change are not written again
+    mtime = stub_path.stat().st_mtime_ns
+    stream = StringIO()
+    code = main([str(source_dir), '--stubs', str(stubs_dir)], stream)
+    assert code == 0
+    assert stream.getvalue() == ''
+    assert stub_path.stat().st_mtime_ns == mtime
+
+
+def test_stubs_check(tmp_path: Path, capsys):
+    source_path = tmp_path / 'example.py'
+    source_path.write_text('def f():\n    return 1\n')
+    stubs_dir = tmp_path / 'stubs'
+    with pytest.raises(SystemExit):
+        main([str(source_path), '--check', '--stubs', str(stubs_dir)], StringIO())
+    assert '--check cannot be combined with --stubs' in capsys.readouterr().err
+    assert not stubs_dir.exists()
+
+
+def test_stubs_without_imports(tmp_path: Path):
+    source_path = tmp_path / 'example.py'
+    source_path.write_text('def f():\n    return 1\n')
+    stubs_dir = tmp_path / 'stubs'
+    code = main([str(source_path), '--stubs', str(stubs_dir)], StringIO())
+    assert code == 0
+    assert (stubs_dir / 'example.pyi').read_text() == 'def f() -> int: ...\n'
+
+
+def test_get_stub_path(tmp_path: Path):
+    path = tmp_path / 'a' / 'b.py'
+    path.parent.mkdir()
+    out = Path('out')
+    assert get_stub_path(path, [tmp_path], out) == out / 'a' / 'b.pyi'
+    assert get_stub_path(path, [path.parent], out) == out / 'b.pyi'
+    assert get_stub_path(path, [path], out) == out / 'b.pyi'
@@ -0,0 +1,222 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+import astroid
+import pytest
+
+from infer_types import _mro, main
+from infer_types._cli import Config, add_annotations
+from infer_types._inferno import Inferno
+from infer_types._scope import Scope
+from infer_types._watch import forget_module
+
+
+MODULES = {
+    '__init__.py': '',
+    'base.py': """
+        import json
+
+        class Base:
+            def name(self) -> str:
+                return 'base'
+
+            def size(self):
+                return len(self.name())
+
+        class Encoder(json.JSONEncoder):
+            def encode(self, o):
+                return super().encode(o)
+    """,
+    'child.py': """
+        from .base import Base
+
+        class Child(Base):
+            def name(self):
+                return 'child'
+
+            def flag(self, x):
+                if x:
+                    return True
+                return None
+    """,
+    'funcs.py': """
+        from .child import Child
+
+        def make():
+            return Child()
+
+        def items():
+            yield 1
+
+        def ratio(a, b):
+            if b:
+                return a / b
+            return 0.5
+
+        def check(x):
+            return x is None
+
+        async def fetch():
+            return [1, 2]
+    """,
+}
+
+
+def _make_package(root: Path, name: str) -> list[Path]:
+    package = root / name
+    package.mkdir()
+    paths = []
+    for file_name, source in MODULES.items():
+        path = package / file_name
+        path.write_text(dedent(source))
+        paths.append(path)
+    # copies of the same modules, to exercise deduplication
+    for i in range(3):
+        path = package / f'copy{i}.py'
+        path.write_text(dedent(MODULES['funcs.py']))
+        paths.append(path)
+    return paths
+
+
+def _forget(paths: list[Path]) -> None:
+    for path in paths:
+        forget_module(path)
+
+
+@pytest.mark.parametrize('scope', [Scope(), Scope(deny=('json',))])
+def test_concurrent_transform_is_deterministic(tmp_path: Path, monkeypatch, scope):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    paths = _make_package(tmp_path, f'threads_pkg_{len(scope.deny)}')
+    expected = {path: Inferno(scope=scope).transform(path) for path in paths}
+    assert 'def name(self) -> str:' in expected[paths[2]]
+    assert 'def make() -> Child:' in expected[paths[3]]
+
+    rng = random.Random(13)
+    barrier = threading.Barrier(8)
+    for _ in range(5):
+        _forget(paths)
+        inferno = Inferno(scope=scope)
+        jobs = paths * 4
+        rng.shuffle(jobs)
+
+        def run(path: Path) -> tuple[Path, str]:
+            try:
+                barrier.wait(timeout=.1)
+            except threading.BrokenBarrierError:
+                pass
+            return path, inferno.transform(path)
+
+        with ThreadPoolExecutor(8) as executor:
+            for path, result in executor.map(run, jobs):
+                assert result == expected[path]
+        assert inferno.stats.files == len(jobs)
+        annotations = sum(
+            source.count(' -> ') - path.read_text().count(' -> ')
+            for path, source in expected.items()
+        )
+        assert inferno.stats.annotations == annotations * 4
+        assert not inferno.stats.failures
+
+
+def test_cli_threads(tmp_path: Path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    paths = _make_package(tmp_path, 'threads_cli_pkg')
+    sources = {path: path.read_text() for path in paths}
+    stream = StringIO()
+    assert main([str(tmp_path), '--check'], stream) == 1
+    sequential = stream.getvalue()
+
+    _forget(paths)
+    stream = StringIO()
+    assert main([str(tmp_path), '--check', '--threads', '4'], stream) == 1
+    assert stream.getvalue() == sequential
+
+    stream = StringIO()
+    argv = [str(tmp_path), '--check', '--fail-fast', '--threads', '4']
+    assert main(argv, stream) == 1
+    assert stream.getvalue() == sequential.splitlines(keepends=True)[0]
+
+    _forget(paths)
+    stream = StringIO()
+    assert main([str(tmp_path), '--threads', '4'], stream) == 0
+    annotated = {path: path.read_text() for path in paths}
+    assert annotated != sources
+    for path, source in sources.items():
+        path.write_text(source)
+    _forget(paths)
+    assert main([str(tmp_path)], StringIO()) == 0
+    assert {path: path.read_text() for path in paths} == annotated
+
+
+SHARED_BASE = """
+    import json
+
+    class Base(json.JSONEncoder):
+        def name(self) -> str:
+            return 'base'
+"""
+
+
+def test_concurrent_class_resolution(monkeypatch):
+    source = dedent(SHARED_BASE) + ''.join(
+        f'\nclass C{i}(Base):\n    def name(self):\n        return 1\n'
+        for i in range(8)
+    )
+    module = astroid.parse(source)
+    children = module.body[2:]
+    original = _mro._resolve
+
+    def resolve(cls_node):
+        # keep the shared base in resolution while other threads ask for it
+        if cls_node.name == 'Base':
+            time.sleep(.05)
+        return original(cls_node)
+
+    monkeypatch.setattr(_mro, '_resolve', resolve)
+    barrier = threading.Barrier(len(children))
+
+    def run(cls_node):
+        barrier.wait(timeout=5)
+        return _mro.get_class_info(cls_node)
+
+    with ThreadPoolExecutor(len(children)) as executor:
+        infos = list(executor.map(run, children))
+    for info in infos:
+        names = [ancestor.name for ancestor in info.ancestors]
+        assert names[:2] == ['Base', 'JSONEncoder']
+        # the own method and the inherited one
+        assert len(info.members['name']) == 2
+
+
+def test_threads_consume_paths_lazily(tmp_path: Path):
+    paths = []
+    for i in range(20):
+        path = tmp_path / f'mod{i}.py'
+        path.write_text('def f():\n    return 1\n')
+        paths.append(path)
+    consumed = []
+
+    def iter_paths():
+        for path in paths:
+            consumed.append(path)
+            yield path
+
+    config = Config(
+        format=False,
+        skip_tests=False,
+        skip_migrations=False,
+        exit_on_failure=False,
+        dry=False,
+        stream=StringIO(),
+        check=True,
+        fail_fast=True,
+    )
+    add_annotations(iter_paths(), config, Inferno(), threads=2)
+    assert config.stream.getvalue() == f'{paths[0]}\n'
+    # only the window of 2 files per thread was submitted
+    assert consumed == paths[:4]
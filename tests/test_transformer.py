@@ -1,16 +1,18 @@
 from textwrap import dedent
 
 import astroid
+import pytest
 
+from infer_types._inferno import Inferno
 from infer_types._transformer import InsertReturnType, Transformer
 
 
 def add_ret_ann(given: str, annotation: str) -> str:
-    tr = Transformer(dedent(given))
+    tr = Transformer(dedent(given).encode())
     tree = astroid.parse(given)
     patch = InsertReturnType(tree.body[0], annotation)
     tr.add(patch)
-    return tr.apply()
+    return tr.apply().decode()
 
 
 def test_simple() -> None:
@@ -69,3 +71,29 @@ def test_empty_body() -> None:
     """
     actual = add_ret_ann(given, 'int')
     assert actual == dedent(expected)
+
+
+@pytest.mark.parametrize('given, expected', [
+    # CRLF line endings are preserved, including in inserted imports
+    (
+        b'class A:\r\n    def f(self):\r\n        yield 1\r\n',
+        b'from typing import Iterator\r\nclass A:\r\n'
+        b'    def f(self) -> Iterator:\r\n        yield 1\r\n',
+    ),
+    # PEP 263 encoding cookie
+    (
+        '# coding: latin-1\ndef f(\xe9=\'\xe9\'):\n    yield 1\n'.encode('latin-1'),
+        '# coding: latin-1\nfrom typing import Iterator\n'
+        'def f(\xe9=\'\xe9\') -> Iterator:\n    yield 1\n'.encode('latin-1'),
+    ),
+    # UTF-8 with BOM and non-ASCII characters before the colon
+    (
+        'def f(\u0444):\n    yield 1\n'.encode('utf-8-sig'),
+        'from typing import Iterator\n'
+        'def f(\u0444) -> Iterator:\n    yield 1\n'.encode('utf-8-sig'),
+    ),
+])
+def test_preserve_encoding_and_line_endings(tmp_path, given: bytes, expected: bytes):
+    path = tmp_path / 'example.py'
+    path.write_bytes(given)
+    assert Inferno().rewrite(path) == expected
@@ -0,0 +1,141 @@
+from io import StringIO
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from infer_types import _cli, _typeshed, main
+from infer_types._inferno import Inferno
+
+
+@pytest.fixture
+def index_path(tmp_path: Path):
+    path = tmp_path / 'typeshed.idx'
+    _typeshed.build_index(path, modules=['json.encoder', 'datetime'])
+    yield path
+    _typeshed.reset_index()
+
+
+def test_build_and_get(index_path: Path):
+    index = _typeshed.TypeshedIndex(index_path)
+    assert index.get('json.encoder', 'JSONEncoder', 'encode') == 'str'
+    assert index.get('datetime', 'date', 'isoformat') == 'str'
+    assert index.get('json.encoder', 'JSONEncoder', 'unknown') is None
+    assert index.get('json.encoder', 'Unknown', 'encode') is None
+    assert index.get('unknown', 'JSONEncoder', 'encode') is None
+    index.close()
+
+
+def test_build_empty(tmp_path: Path):
+    path = tmp_path / 'typeshed.idx'
+    assert _typeshed.build_index(path, modules=['not_a_module']) == 0
+    index = _typeshed.TypeshedIndex(path)
+    assert index.get('json.encoder', 'JSONEncoder', 'encode') is None
+    index.close()
+
+
+def test_not_an_index(tmp_path: Path):
+    path = tmp_path / 'typeshed.idx'
+    path.write_bytes(b'garbage')
+    with pytest.raises(ValueError):
+        _typeshed.TypeshedIndex(path)
+
+
+def test_not_indexed_module(tmp_path: Path):
+    path = tmp_path / 'typeshed.idx'
+    _typeshed.build_index(path, modules=['json.encoder'])
+    index = _typeshed.use_index(path)
+    assert index.has_module('json.encoder')
+    assert not index.has_module('datetime')
+    # modules missing in the index are resolved from stubs
+    return_type = _typeshed.get_return_type('datetime', 'date', 'isoformat')
+    assert return_type is not None and return_type.annotation == 'str'
+    return_type = _typeshed.get_return_type('json.encoder', 'JSONEncoder', 'encode')
+    assert return_type is not None and return_type.annotation == 'str'
+    assert _typeshed.get_return_type('json.encoder', 'JSONEncoder', 'unknown') is None
+    _typeshed.reset_index()
+
+
+def test_get_modules():
+    stdlib = _typeshed.get_modules()
+    assert {'json', 'json.encoder', 'datetime'} <= set(stdlib)
+    assert set(stdlib) <= set(_typeshed.get_modules(stdlib=False))
+
+
+def test_cli_index(tmp_path: Path, monkeypatch):
+    def get_modules(stdlib=True):
+        return ['json.encoder'] if stdlib else ['json.encoder', 'datetime']
+
+    monkeypatch.setattr(_cli, 'get_modules', get_modules)
+    path = tmp_path / 'typeshed.idx'
+    stream = StringIO()
+    assert main(['index', str(path)], stream) == 0
+    lines = stream.getvalue().splitlines()
+    assert lines[0] == 'indexing typeshed stubs: 0/1 modules'
+    assert lines[-1].startswith('indexed ')
+    assert lines[-1].endswith(' methods from 1 modules')
+    index = _typeshed.TypeshedIndex(path)
+    assert index.get('json.encoder', 'JSONEncoder', 'encode') == 'str'
+    index.close()
+
+    stream = StringIO()
+    assert main(['index', str(path), '--all'], stream) == 0
+    assert stream.getvalue().splitlines()[-1].endswith(' methods from 2 modules')
+
+
+def test_rebuild_outdated(tmp_path: Path, monkeypatch):
+    builds = []
+    original = _typeshed.build_index
+
+    def build_index(path, progress=None):
+        builds.append(path)
+        return original(path, modules=['json.encoder'])
+
+    monkeypatch.setattr(_typeshed, 'build_index', build_index)
+    path = tmp_path / 'typeshed.idx'
+    _typeshed.use_index(path)
+    _typeshed.use_index(path)
+    assert builds == [path]
+
+    # another version of typeshed_client
+    monkeypatch.setattr(_typeshed.typeshed_client, '__version__', '0.0.1')
+    _typeshed.use_index(path)
+    assert builds == [path] * 2
+    assert _typeshed.get_version().startswith(b'0.0.1 py')
+    assert path.read_bytes()[8:40] == _typeshed.get_version()
+
+    # the old format of the index
+    path.write_bytes(b'ITTSIDX1' + path.read_bytes()[40:])
+    index = _typeshed.use_index(path)
+    assert builds == [path] * 3
+    assert index.get('json.encoder', 'JSONEncoder', 'encode') == 'str'
+    _typeshed.reset_index()
+
+    path.write_bytes(b'garbage')
+    with pytest.raises(ValueError):
+        _typeshed.use_index(path)
+    assert len(builds) == 3
+
+
+@pytest.mark.parametrize('use_index', [True, False])
+def test_inherit_from_typeshed(tmp_path: Path, index_path: Path, use_index: bool):
+    if use_index:
+        _typeshed.use_index(index_path)
+    given = """
+        import json
+
+        class Encoder(json.JSONEncoder):
+            def encode(self, o):
+                return o
+    """
+    expected = """
+        import json
+
+        class Encoder(json.JSONEncoder):
+            def encode(self, o) -> str:
+                return o
+    """
+    path = tmp_path / 'example.py'
+    path.write_text(dedent(given))
+    result = Inferno(only=frozenset({'inherit'})).transform(path)
+    assert result == dedent(expected)
@@ -0,0 +1,120 @@
+import os
+from io import StringIO
+from itertools import islice
+from pathlib import Path
+from textwrap import dedent
+
+import astroid
+
+from infer_types import main
+from infer_types._cli import Config, watch_annotations
+from infer_types._inferno import Inferno
+from infer_types._watch import Watcher, forget_module
+
+
+GIVEN = """
+    def f(x):
+        return len(x)
+"""
+
+EXPECTED = """
+    def f(x) -> int:
+        return len(x)
+"""
+
+
+def _touch(path: Path, source: str) -> None:
+    path.write_text(source)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_changes(tmp_path: Path):
+    (tmp_path / 'sub').mkdir()
+    path1 = tmp_path / 'a.py'
+    path2 = tmp_path / 'sub' / 'b.py'
+    path1.write_text('')
+    (tmp_path / 'c.txt').write_text('')
+    watcher = Watcher([tmp_path])
+    assert watcher.changes() == []
+
+    _touch(path1, 'x = 1')
+    path2.write_text('')
+    assert sorted(watcher.changes()) == [path1, path2]
+    assert watcher.changes() == []
+
+    _touch(path1, 'x = 2')
+    watcher.mark(path1)
+    assert watcher.changes() == []
+
+
+def test_watch_file(tmp_path: Path):
+    path = tmp_path / 'a.py'
+    path.write_text('')
+    watcher = Watcher([path], interval=0, debounce=0)
+    _touch(path, 'x = 1')
+    assert next(iter(watcher)) == [path]
+
+
+def test_watch_annotations(tmp_path: Path):
+    path = tmp_path / 'example.py'
+    path.write_text('')
+    watcher = Watcher([tmp_path], interval=0, debounce=0)
+    _touch(path, dedent(GIVEN))
+    stream = StringIO()
+    config = Config(
+        format=False,
+        skip_tests=False,
+        skip_migrations=True,
+        exit_on_failure=True,
+        dry=False,
+        stream=stream,
+    )
+    inferno = Inferno(cache={})
+    watch_annotations(watcher, islice(watcher, 1), config, inferno)
+    assert path.read_text() == dedent(EXPECTED)
+    assert stream.getvalue() == f'{path}\n'
+    assert watcher.changes() == []
+
+
+def test_inferno_cache(tmp_path: Path):
+    path = tmp_path / 'example.py'
+    path.write_text(dedent("""
+        def f(x):
+            return len(x)
+
+        class A:
+            def f(self):
+                return 1
+    """))
+    inferno = Inferno(cache={}, only=frozenset({'astypes'}))
+    first = inferno.transform(path)
+    assert len(inferno.cache) == 2
+    assert inferno.transform(path) == first
+    assert len(inferno.cache) == 2
+
+    path.write_text(path.read_text().replace('1', '"1"'))
+    assert 'def f(self) -> str' in inferno.transform(path)
+    assert len(inferno.cache) == 3
+
+
+def test_forget_module(tmp_path: Path):
+    path = tmp_path / 'example.py'
+    path.write_text(dedent(GIVEN))
+    module = astroid.MANAGER.ast_from_file(str(path), 'example_for_forget')
+    assert astroid.MANAGER.astroid_cache['example_for_forget'] is module
+    forget_module(path)
+    assert 'example_for_forget' not in astroid.MANAGER.astroid_cache
+
+
+def test_cli_watch(tmp_path: Path, monkeypatch):
+    def interrupt(self):
+        raise KeyboardInterrupt
+        yield
+
+    monkeypatch.setattr(Watcher, '__iter__', interrupt)
+    path = tmp_path / 'example.py'
+    path.write_text(dedent(GIVEN))
+    code = main([str(tmp_path), '--watch'], StringIO())
+    assert code == 0
+    assert path.read_text() == dedent(EXPECTED)
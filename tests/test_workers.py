@@ -0,0 +1,224 @@
+import os
+import time
+from contextlib import contextmanager
+from functools import partial
+from io import StringIO
+from pathlib import Path
+
+import pytest
+
+from infer_types import _workers, main
+from infer_types._stats import Stats
+from infer_types._workers import WorkerPool, get_rss, parse_size
+
+from .test_fs import needs_fork
+from .test_threads import _forget, _make_package
+
+
+@pytest.mark.parametrize('given, expected', [
+    ('100', 100),
+    ('2K', 2048),
+    ('1.5kb', 1536),
+    (' 512M ', 512 * 1024 ** 2),
+    ('8G', 8 * 1024 ** 3),
+])
+def test_parse_size(given: str, expected: int):
+    assert parse_size(given) == expected
+
+
+@pytest.mark.parametrize('given', ['', 'G', 'lots', '-1G', '0'])
+def test_parse_size_invalid(given: str):
+    with pytest.raises(ValueError):
+        parse_size(given)
+
+
+def test_get_rss():
+    rss = get_rss()
+    assert rss is not None and rss > 0
+    assert get_rss(os.getpid()) is not None
+
+
+@contextmanager
+def _session(fail_on: str = ''):
+    def task(path: Path):
+        if path.name == fail_on:
+            raise ValueError(f'cannot process {path.name}')
+        if path.name == 'die.py':
+            os._exit(1)
+        if path.name.startswith('slow'):
+            time.sleep(2)
+        stats = Stats()
+        stats.files += 1
+        return (path.name, os.getpid()), stats
+    yield task
+
+
+def _make_files(root: Path, count: int) -> list[Path]:
+    paths = []
+    for i in range(count):
+        path = root / f'{i}.py'
+        path.write_text('x = 1\n' * (i % 4 + 1))
+        paths.append(path)
+    return paths
+
+
+@needs_fork
+def test_pool_keeps_order(tmp_path: Path):
+    paths = _make_files(tmp_path, 12)
+    pool = WorkerPool(_session, workers=3)
+    results = list(pool.map(paths))
+    assert [path for path, _, _ in results] == paths
+    assert [result[0] for _, result, _ in results] == [path.name for path in paths]
+    assert all(stats.files == 1 for _, _, stats in results)
+    assert len({result[1] for _, result, _ in results}) > 1
+    assert not pool.workers
+    assert pool.recycled == pool.killed == 0
+
+
+@needs_fork
+def test_pool_recycles_workers(tmp_path: Path):
+    paths = _make_files(tmp_path, 6)
+    pool = WorkerPool(_session, workers=4, max_memory=1)
+    results = list(pool.map(paths))
+    assert [path for path, _, _ in results] == paths
+    # every worker is over the limit after its first file,
+    # so the pool never grows and each file gets a fresh worker
+    pids = [result[1] for _, result, _ in results]
+    assert len(set(pids)) == len(paths)
+    assert pool.recycled == len(paths)
+    assert pool.killed == 0
+
+
+@needs_fork
+def test_pool_biggest_first(tmp_path: Path):
+    paths = _make_files(tmp_path, 8)
+    pool = WorkerPool(_session, workers=1, max_memory=1)
+    pids = {path: result[1] for path, result, _ in pool.map(paths)}
+    order = sorted(paths, key=lambda path: pids[path])
+    sizes = [path.stat().st_size for path in order]
+    assert sizes == sorted(sizes, reverse=True)
+
+
+@contextmanager
+def _logging_session(log_path: Path):
+    def task(path: Path):
+        with log_path.open('a') as stream:
+            stream.write(f'{path.name}\n')
+        return path.name, Stats()
+    yield task
+
+
+@needs_fork
+@pytest.mark.parametrize('max_waiting, expected', [
+    (64, ['3.py', '0.py', '2.py', '1.py']),
+    # the earliest file is started first when too many results are waiting
+    (1, ['3.py', '0.py', '1.py', '2.py']),
+])
+def test_pool_limits_waiting(tmp_path: Path, monkeypatch, max_waiting, expected):
+    monkeypatch.setattr(_workers, 'MAX_WAITING', max_waiting)
+    source_dir = tmp_path / 'source'
+    source_dir.mkdir()
+    paths = []
+    for i, lines in enumerate([1, 3, 2, 4]):
+        path = source_dir / f'{i}.py'
+        path.write_text('x = 1\n' * lines)
+        paths.append(path)
+    log_path = tmp_path / 'log'
+    pool = WorkerPool(partial(_logging_session, log_path), workers=1)
+    results = [result for _, result, _ in pool.map(paths)]
+    assert results == [path.name for path in paths]
+    assert log_path.read_text().splitlines() == expected
+
+
+@needs_fork
+def test_pool_single_worker_share(tmp_path: Path):
+    paths = _make_files(tmp_path, 4)
+    rss = get_rss()
+    assert rss is not None
+    # there is room only for one worker, it can use the whole budget
+    pool = WorkerPool(_session, workers=64, max_memory=rss * 3 // 2)
+    pids = {result[1] for _, result, _ in pool.map(paths)}
+    assert len(pids) == 1
+    assert pool.recycled == 0
+
+
+@needs_fork
+def test_pool_error(tmp_path: Path):
+    paths = _make_files(tmp_path, 4)
+    pool = WorkerPool(partial(_session, fail_on='2.py'), workers=2)
+    with pytest.raises(ValueError, match='cannot process 2.py'):
+        list(pool.map(paths))
+    assert not pool.workers
+
+
+@needs_fork
+def test_pool_worker_dies(tmp_path: Path):
+    paths = _make_files(tmp_path, 3)
+    dead = tmp_path / 'die.py'
+    dead.write_text('')
+    paths.insert(1, dead)
+    pool = WorkerPool(_session, workers=2)
+    results = list(pool.map(paths))
+    assert [path for path, _, _ in results] == paths
+    _, result, stats = results[1]
+    assert result is None
+    assert stats.skipped == {dead: 'the worker exceeded the memory limit'}
+    assert all(result is not None for _, result, _ in results[:1] + results[2:])
+
+
+@needs_fork
+def test_pool_kills_biggest_worker(tmp_path: Path, monkeypatch):
+    original = _workers.get_rss
+
+    def get_rss(pid=None):
+        # busy workers look huge, idle ones report the real memory
+        return original() if pid is None else 10 ** 12
+
+    monkeypatch.setattr(_workers, 'get_rss', get_rss)
+    monkeypatch.setattr(_workers, 'POLL_INTERVAL', .05)
+    paths = _make_files(tmp_path, 3)
+    for i in range(2):
+        path = tmp_path / f'slow{i}.py'
+        path.write_text('')
+        paths.append(path)
+    pool = WorkerPool(_session, workers=2, max_memory=10 ** 11)
+    results = list(pool.map(paths))
+    assert [path for path, _, _ in results] == paths
+    assert pool.killed >= 1
+    skipped = [path for path, result, _ in results if result is None]
+    assert all(path.name.startswith('slow') for path in skipped)
+
+
+@needs_fork
+def test_cli_workers(tmp_path: Path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    paths = _make_package(tmp_path, 'workers_cli_pkg')
+    stream = StringIO()
+    assert main([str(tmp_path), '--check'], stream) == 1
+    sequential = stream.getvalue()
+
+    for argv in (['--workers', '3'], ['--workers', '2', '--max-memory', '1']):
+        _forget(paths)
+        stream = StringIO()
+        assert main([str(tmp_path), '--check', *argv], stream) == 1
+        output = stream.getvalue()
+        if '--max-memory' in argv:
+            lines = output.splitlines(keepends=True)
+            assert lines[-1].startswith('restarted ')
+            output = ''.join(lines[:-1])
+        assert output == sequential
+
+    stream = StringIO()
+    argv = [str(tmp_path), '--check', '--fail-fast', '--workers', '2']
+    assert main(argv, stream) == 1
+    assert stream.getvalue() == sequential.splitlines(keepends=True)[0]
+
+
+@pytest.mark.parametrize('argv, error', [
+    (['--max-memory', 'lots'], 'invalid memory size'),
+    (['--workers', '2', '--threads', '2'], 'cannot be combined'),
+])
+def test_cli_workers_errors(tmp_path: Path, capsys, argv, error):
+    with pytest.raises(SystemExit):
+        main([str(tmp_path), *argv], StringIO())
+    assert error in capsys.readouterr().err